@@ -5,7 +5,7 @@ echo "Frontend: Opening http://localhost:8000"
 echo "Backend: Flask server should be running on http://localhost:5000"
 echo ""
 echo "IMPORTANT: Make sure your Flask server is running in another terminal with:"
-echo "cd server && python app.py"
+echo "cd server && python manage.py migrate && python app.py"
 echo ""
 echo "Press Ctrl+C to stop the server"
 
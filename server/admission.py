@@ -0,0 +1,298 @@
+"""
+Admission control: per-client token-bucket rate limits and a cap on
+concurrent DB-touching requests.
+
+Rate limits are token buckets keyed by client IP or survey id, applied to the
+public survey endpoints with @rate_limited. Buckets live in process memory by
+default; RATE_LIMIT_BACKEND=sqlite:<path> shares them between the worker
+processes of a host through a SQLite file (a stand-in for Redis or similar,
+behind the same take() interface).
+
+The concurrency limiter lets at most ADMISSION_MAX_CONCURRENT requests run at
+once and at most ADMISSION_MAX_WAITING wait for a slot, each for up to
+ADMISSION_TIMEOUT seconds. Anything beyond that is shed with a 503 instead of
+piling up threads in front of the connection pool.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import g, request
+
+from cache import TTLCache
+from database import pool_config
+from keys import parse_id, to_str
+from metrics import admission_rejected, rate_limited as rate_limited_requests
+
+# Token bucket: `rate` tokens added per second, holding at most `burst`
+Limit = namedtuple('Limit', ['rate', 'burst'])
+
+def parse_limit(value):
+    """'<tokens per second>,<burst>' -> Limit, or None when empty or 0 (no limit)"""
+    if not value or value.strip() == '0':
+        return None
+    rate, burst = (float(part) for part in value.split(','))
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Invalid rate limit {value!r}: the rate must be above 0 and the burst at least 1")
+    return Limit(rate, burst)
+
+# 'memory', or 'sqlite:<path>' to share buckets between processes on one host
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+# Buckets kept in memory; the least recently used are dropped (and start full again)
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+
+# Behind N reverse proxies, take the client address from the last N
+# X-Forwarded-For entries instead of the proxy's own
+PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
+
+# Per-IP limits are off unless configured: behind a proxy without PROXY_FIX_X_FOR
+# every respondent has the proxy's address, and respondents behind one NAT
+# (a classroom, an office) share theirs, so a default would throttle them together
+SUBMIT_PER_IP = parse_limit(os.getenv('RATE_LIMIT_SUBMIT_PER_IP', ''))
+SUBMIT_PER_SURVEY = parse_limit(os.getenv('RATE_LIMIT_SUBMIT_PER_SURVEY', '50,200'))
+READ_PER_IP = parse_limit(os.getenv('RATE_LIMIT_READ_PER_IP', ''))
+READ_PER_SURVEY = parse_limit(os.getenv('RATE_LIMIT_READ_PER_SURVEY', '200,1000'))
+
+# Requests handled at once per process (0 disables), and how many may queue for a slot
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', pool_config['size']))
+ADMISSION_MAX_WAITING = int(os.getenv('ADMISSION_MAX_WAITING', 2 * ADMISSION_MAX_CONCURRENT))
+ADMISSION_TIMEOUT = float(os.getenv('ADMISSION_TIMEOUT', 1.0))
+
+# Endpoints that don't touch the database, or hold a request open for a
+# client-paced transfer (audio chunks), run outside the concurrency limit
+ADMISSION_EXEMPT_ENDPOINTS = {'static', 'prometheus_metrics', 'auth.login', 'audio.upload_chunk'}
+
+
+class RateLimited(Exception):
+    """A token bucket for this client or survey is empty"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """No request slot became free in time, or too many requests are already waiting"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def refill(tokens, updated_at, limit, now):
+    """Tokens in a bucket at `now`"""
+    return min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+
+def consume(tokens, limit, cost=1):
+    """(tokens left, seconds to wait before retrying) after trying to take `cost` tokens"""
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / limit.rate
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, dropped once they would be full again"""
+
+    def __init__(self, max_keys):
+        self._buckets = TTLCache(maxsize=max_keys)
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """Take a token from key's bucket; returns 0 if allowed, else seconds until one is available"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+            tokens, retry_after = consume(refill(tokens, updated_at, limit, now), limit)
+            # After this long the bucket is full again, the same as a missing one
+            self._buckets.set(key, (tokens, now), expires_at=now + (limit.burst - tokens) / limit.rate)
+        return retry_after
+
+    def stats(self):
+        return {"keys": len(self._buckets)}
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by every process that opens it.
+    Each take() is one short IMMEDIATE transaction, so concurrent workers
+    never lose an update.
+    """
+
+    # Expired buckets are swept every this many takes
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Losing the last few updates in a crash only refills some buckets early
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                full_at REAL NOT NULL
+            )
+            """
+        )
+        self._takes = 0
+
+    def take(self, key, limit):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated_at = row if row else (limit.burst, now)
+                tokens, retry_after = consume(refill(tokens, updated_at, limit, now), limit)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (limit.burst - tokens) / limit.rate)
+                )
+                self._takes += 1
+                if self._takes % self.SWEEP_EVERY == 0:
+                    self._db.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return retry_after
+
+    def stats(self):
+        with self._lock:
+            return {"keys": self._db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]}
+
+
+def open_bucket_store(backend):
+    if backend == 'memory':
+        return MemoryBucketStore(RATE_LIMIT_MAX_KEYS)
+    if backend.startswith('sqlite:'):
+        return SQLiteBucketStore(backend[len('sqlite:'):])
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+bucket_store = open_bucket_store(RATE_LIMIT_BACKEND)
+
+
+def forwarded_client_ip(remote_addr, forwarded_for, trusted_hops=PROXY_FIX_X_FOR):
+    """
+    Client address as werkzeug's ProxyFix(x_for=trusted_hops) sees it: the
+    entry trusted_hops from the end of X-Forwarded-For, else remote_addr
+    """
+    if not (trusted_hops and forwarded_for):
+        return remote_addr
+    addresses = [address.strip() for address in forwarded_for.split(',')]
+    return addresses[-trusted_hops] if len(addresses) >= trusted_hops else remote_addr
+
+
+def survey_subject(survey_id):
+    """
+    Canonical form of a survey id from the URL, so every spelling of an id
+    (case, braces, urn:uuid:) shares one bucket; ids that don't parse share one too
+    """
+    return to_str(parse_id(survey_id)) or 'invalid'
+
+
+def check_rate_limits(endpoint, rules, client_ip, view_args):
+    """
+    Take a token from every bucket that applies to the request.
+    rules are (scope, Limit) with scope 'ip' or 'survey'; raises RateLimited
+    with the longest wait of the buckets that were empty.
+    """
+    retry_after = 0.0
+    for scope, limit in rules:
+        if limit is None:
+            continue
+        subject = client_ip if scope == 'ip' else survey_subject(view_args.get('survey_id'))
+        wait = bucket_store.take(f'{endpoint}:{scope}:{subject}', limit)
+        if wait:
+            rate_limited_requests.inc(1, endpoint, scope)
+            retry_after = max(retry_after, wait)
+    if retry_after:
+        raise RateLimited("Too many requests, please slow down", math.ceil(retry_after))
+
+
+def rate_limited(*rules):
+    """Apply token-bucket limits, e.g. @rate_limited(('ip', SUBMIT_PER_IP), ('survey', SUBMIT_PER_SURVEY))"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            check_rate_limits(request.endpoint, rules, request.remote_addr, request.view_args or {})
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def release_slot_on_close(response):
+    """
+    Hold the request's concurrency slot until the WSGI server closes response,
+    for streamed bodies that keep a DB connection (export, import). Teardown,
+    which otherwise releases it, runs before a streamed body is sent.
+    """
+    if g.pop('admitted', False):
+        response.call_on_close(limiter.release)
+    return response
+
+
+class ConcurrencyLimiter:
+    """Bounded number of requests in flight, with a bounded, time-limited wait for a slot"""
+
+    def __init__(self, max_concurrent, max_waiting, timeout):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def acquire(self):
+        """Take a slot or raise Overloaded"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_waiting:
+                    admission_rejected.inc(1, 'queue_full')
+                    raise Overloaded("Server is at capacity, please retry")
+                self.waiting += 1
+            try:
+                admitted = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not admitted:
+                admission_rejected.inc(1, 'timeout')
+                raise Overloaded(f"No request slot free within {self.timeout}s, please retry")
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting
+            }
+
+
+limiter = ConcurrencyLimiter(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_WAITING, ADMISSION_TIMEOUT) \
+    if ADMISSION_MAX_CONCURRENT > 0 else None
+
+def stats():
+    return {
+        **(limiter.stats() if limiter else {}),
+        **{f'rate_limit_{name}': value for name, value in bucket_store.stats().items()}
+    }
@@ -0,0 +1 @@
+# Asyncio serving mode package
@@ -0,0 +1,98 @@
+"""
+Admission control for the asyncio serving mode: the same token-bucket limits
+and bucket store as admission.py, and a concurrency limiter on an asyncio
+semaphore so a waiting request holds no thread.
+"""
+import asyncio
+from functools import wraps
+
+from quart import g, request
+
+from admission import (
+    ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_WAITING, ADMISSION_TIMEOUT, Overloaded, check_rate_limits,
+    forwarded_client_ip
+)
+from metrics import admission_rejected
+
+
+def rate_limited(*rules):
+    """admission.rate_limited for Quart views, honouring PROXY_FIX_X_FOR like the threaded app's ProxyFix"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(*args, **kwargs):
+            client_ip = forwarded_client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))
+            check_rate_limits(request.endpoint, rules, client_ip, request.view_args or {})
+            return await f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+class SlotReleasingBody:
+    """A streamed Quart response body that frees the request's concurrency slot once sent or abandoned"""
+
+    def __init__(self, body):
+        self.body = body
+
+    async def __aenter__(self):
+        return await self.body.__aenter__()
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        try:
+            return await self.body.__aexit__(exc_type, exc_value, tb)
+        finally:
+            limiter.release()
+
+
+def release_slot_on_close(response):
+    """admission.release_slot_on_close for Quart, whose teardown also runs before the body is sent"""
+    if g.pop('admitted', False):
+        response.response = SlotReleasingBody(response.response)
+    return response
+
+
+class ConcurrencyLimiter:
+    """admission.ConcurrencyLimiter for coroutines on one event loop"""
+
+    def __init__(self, max_concurrent, max_waiting, timeout):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def acquire(self):
+        """Take a slot or raise Overloaded"""
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                admission_rejected.inc(1, 'queue_full')
+                raise Overloaded("Server is at capacity, please retry")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                admission_rejected.inc(1, 'timeout')
+                raise Overloaded(f"No request slot free within {self.timeout}s, please retry")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting
+        }
+
+
+limiter = ConcurrencyLimiter(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_WAITING, ADMISSION_TIMEOUT) \
+    if ADMISSION_MAX_CONCURRENT > 0 else None
+
+def stats():
+    return limiter.stats() if limiter else {}
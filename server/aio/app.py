@@ -0,0 +1,181 @@
+"""
+Asyncio serving mode: the auth, survey and user APIs on Quart, with aiomysql
+for MySQL and httpx for Google. Routes, status codes and JSON bodies match
+the threaded Flask app in app.py; a request waiting on I/O holds no thread.
+
+Run with an ASGI server from the server directory, e.g.:
+    hypercorn aio.app:app --bind 0.0.0.0:5000
+"""
+from quart import Quart, request, jsonify, g, Response
+from quart.json.provider import DefaultJSONProvider
+from quart.wrappers.response import DataBody, IterableBody
+from quart_cors import cors
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
+import compression
+import metrics
+from database import init_db, PoolTimeout
+from admission import ADMISSION_EXEMPT_ENDPOINTS, RateLimited, Overloaded
+from aio import admission as aio_admission, database as aio_database, google_auth as aio_google_auth
+from aio import idempotency as aio_idempotency
+from serialization import FastJSONProviderMixin
+
+
+class FastJSONProvider(FastJSONProviderMixin, DefaultJSONProvider):
+    """Quart JSON provider using orjson when enabled"""
+
+
+app = Quart(__name__)
+app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'default-secret-key')
+app.json = FastJSONProvider(app)
+
+# Schema version check (and the spool flusher, in spool mode) use the threaded pool
+init_db()
+
+app = cors(app, allow_origin=["http://localhost:3000", "http://localhost:5000", "http://localhost:8000", "http://localhost:8080"])
+
+@app.before_serving
+async def startup():
+    await aio_database.init_pool()
+    await aio_google_auth.open_client()
+
+@app.after_serving
+async def shutdown():
+    await aio_google_auth.close_client()
+    await aio_database.close_pool()
+
+@app.errorhandler(PoolTimeout)
+async def database_busy(err):
+    """All pooled connections stayed busy for the whole checkout timeout"""
+    response = jsonify({
+        "error": "Service temporarily busy, please retry",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(RateLimited)
+async def too_many_requests(err):
+    """A per-client or per-survey token bucket is empty"""
+    response = jsonify({
+        "error": "Too many requests",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response, 429
+
+@app.errorhandler(Overloaded)
+async def server_overloaded(err):
+    """Shed by the concurrency limiter rather than queued behind the connection pool"""
+    response = jsonify({
+        "error": "Service temporarily busy, please retry",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response, 503
+
+@app.before_request
+async def start_timer():
+    g.request_start = time.perf_counter()
+
+# Retries with a finished Idempotency-Key are replayed before taking a slot
+app.before_request(aio_idempotency.early_replay)
+
+@app.before_request
+async def admit_request():
+    if aio_admission.limiter is None or request.endpoint in ADMISSION_EXEMPT_ENDPOINTS:
+        return
+    await aio_admission.limiter.acquire()
+    g.admitted = True
+
+@app.teardown_request
+async def release_request_slot(exc):
+    if g.pop('admitted', False):
+        aio_admission.limiter.release()
+
+@app.after_request
+async def record_request_duration(response):
+    """Observe the time to build the response (streamed bodies are timed up to their first byte)"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.request_duration.observe(
+            time.perf_counter() - start,
+            request.endpoint or 'unmatched', request.method, str(response.status_code)
+        )
+    return response
+
+async def compressed_chunks(body, encoding):
+    compress_chunk, finish = compression.streaming_compressor(encoding)
+    async with body as chunks:
+        async for chunk in chunks:
+            data = compress_chunk(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+    yield finish()
+
+@app.after_request
+async def compress_response(response):
+    """compression.compress_response for Quart's buffered and streamed bodies"""
+    if not compression.compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.negotiate(request)
+    if encoding is None or request.method == 'HEAD':
+        return response
+
+    if isinstance(response.response, DataBody):
+        body = await response.get_data()
+        if len(body) < compression.COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compression.compress(body, encoding))
+    else:
+        response.response = IterableBody(compressed_chunks(response.response, encoding))
+        response.headers.pop('Content-Length', None)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(compression.encoded_etag(etag, encoding))
+    return response
+
+@app.route('/metrics')
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+from aio.routes.auth import auth_bp
+from aio.routes.survey import survey_bp
+from aio.routes.user import user_bp
+
+app.register_blueprint(auth_bp, url_prefix='/api/auth')
+app.register_blueprint(survey_bp, url_prefix='/api/survey')
+app.register_blueprint(user_bp, url_prefix='/api/user')
+
+import ingest
+if ingest.enabled():
+    ingest.start()
+
+# Move old responses to cold storage every ARCHIVE_INTERVAL_HOURS
+import archive
+if archive.enabled():
+    archive.start()
+
+metrics.register(metrics.GaugeCollector('db_pool', 'Async connection pool state', aio_database.pool_stats))
+metrics.register(metrics.GaugeCollector('ingest', 'Response spool state', ingest.stats))
+metrics.register(metrics.GaugeCollector('archive', 'Response archival job state', archive.stats))
+metrics.register(metrics.GaugeCollector('admission', 'Concurrency limiter state', aio_admission.stats))
+metrics.register(metrics.GaugeCollector('idempotency', 'Idempotency-Key result cache state', aio_idempotency.stats))
+
+if __name__ == '__main__':
+    app.run()
@@ -0,0 +1,79 @@
+"""
+Non-blocking MySQL access for the asyncio serving mode, on aiomysql.
+Uses the same settings as database.py. Connections run in autocommit mode:
+reads hold no snapshot, and writes open an explicit transaction with begin().
+"""
+import asyncio
+import ssl
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+from database import db_config, pool_config, PoolTimeout
+from metrics import pool_wait, record_statement
+
+pool = None
+
+async def init_pool():
+    global pool
+    options = {
+        'host': db_config['host'],
+        'port': db_config.get('port', 3306),
+        'user': db_config['user'],
+        'password': db_config['password'] or '',
+        'db': db_config['database']
+    }
+    if db_config.get('ssl_ca'):
+        options['ssl'] = ssl.create_default_context(cafile=db_config['ssl_ca'])
+    pool = await aiomysql.create_pool(
+        minsize=0,
+        maxsize=pool_config['size'],
+        pool_recycle=int(pool_config['recycle']),
+        autocommit=True,
+        **options
+    )
+
+async def close_pool():
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+@asynccontextmanager
+async def connection():
+    """
+    Check a connection out of the pool, waiting up to DB_POOL_TIMEOUT seconds
+    (PoolTimeout otherwise, like the threaded pool). Released on exit.
+    """
+    start = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), pool_config['timeout'])
+    except asyncio.TimeoutError:
+        raise PoolTimeout(f"No database connection available within {pool_config['timeout']}s")
+    pool_wait.observe(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        # aiomysql closes rather than reuses a connection left in a transaction
+        pool.release(conn)
+
+async def execute(cursor, operation, params=None):
+    """Run a statement, recording its timing and row count for /metrics"""
+    start = time.perf_counter()
+    try:
+        await cursor.execute(operation, params)
+    finally:
+        # Result sets are buffered by the default cursors, so rowcount is known here
+        record_statement(operation, time.perf_counter() - start, max(cursor.rowcount or 0, 0))
+    return cursor.rowcount
+
+def pool_stats():
+    """Open, idle and maximum connections"""
+    if pool is None:
+        return {}
+    return {
+        "size": pool.maxsize,
+        "open": pool.size,
+        "idle": pool.freesize,
+        "in_use": pool.size - pool.freesize
+    }
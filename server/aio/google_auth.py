@@ -0,0 +1,103 @@
+"""
+Async counterparts of google_auth's network calls, on a shared httpx client:
+ID token verification (with Google's signing certificates fetched and cached
+without blocking the event loop) and the OAuth code exchange.
+Verified tokens share google_auth's token cache.
+"""
+import time
+from functools import wraps
+
+import httpx
+from quart import request, jsonify
+
+import google_auth
+from google_auth import CLIENT_ID, CLIENT_SECRET, REDIRECT_URI, token_cache, token_cache_key, token_user_info, _parse_max_age
+from metrics import auth_verify
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_TOKEN_URL = 'https://oauth2.googleapis.com/token'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Created when the app starts serving, so it binds to the server's event loop
+http_client = None
+
+# (certs, wall-clock expiry) from the last fetch, kept for the response's max-age
+_certs = (None, 0.0)
+
+async def open_client():
+    global http_client
+    http_client = httpx.AsyncClient(timeout=10)
+
+async def close_client():
+    if http_client is not None:
+        await http_client.aclose()
+
+async def google_certs():
+    """Google's current signing certificates ({kid: PEM})"""
+    global _certs
+    certs, expires_at = _certs
+    if certs and expires_at > time.time():
+        return certs
+    response = await http_client.get(GOOGLE_CERTS_URL)
+    response.raise_for_status()
+    certs = response.json()
+    _certs = (certs, time.time() + _parse_max_age(response.headers))
+    return certs
+
+async def verify_google_token(token):
+    """Verify Google ID token and extract user information"""
+    start = time.perf_counter()
+    cache_key = token_cache_key(token)
+    cached_user = token_cache.get(cache_key)
+    if cached_user:
+        auth_verify.observe(time.perf_counter() - start, 'cached')
+        return dict(cached_user)
+
+    try:
+        # Imported on first use rather than at startup (see google_auth.CachingCertsRequest)
+        from google.auth import jwt
+        if google_auth.test_certs is not None:
+            idinfo = jwt.decode(token, certs=google_auth.test_certs, audience=CLIENT_ID)
+        else:
+            idinfo = jwt.decode(token, certs=await google_certs(), audience=CLIENT_ID)
+            if idinfo['iss'] not in GOOGLE_ISSUERS:
+                raise ValueError(f"Wrong issuer: {idinfo['iss']}")
+
+        user_info = token_user_info(idinfo)
+        token_cache.set(cache_key, user_info, expires_at=idinfo['exp'])
+        auth_verify.observe(time.perf_counter() - start, 'verified')
+        return dict(user_info)
+    except ValueError:
+        # Invalid token
+        auth_verify.observe(time.perf_counter() - start, 'rejected')
+        return None
+
+async def exchange_code_for_token(code):
+    """Exchange authorization code for access token"""
+    response = await http_client.post(GOOGLE_TOKEN_URL, data={
+        "code": code,
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+        "redirect_uri": REDIRECT_URI,
+        "grant_type": "authorization_code"
+    })
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+def auth_required(f):
+    """Decorator to verify authentication token for protected routes"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        user = None
+        if auth_header and auth_header.startswith('Bearer '):
+            user = await verify_google_token(auth_header.split('Bearer ')[1])
+
+        if not user:
+            return jsonify({"error": "Authentication required"}), 401
+
+        # Add user to request context for route handlers
+        request.user = user
+        return await f(*args, **kwargs)
+    return decorated_function
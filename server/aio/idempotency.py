@@ -0,0 +1,113 @@
+"""
+Idempotency-Key support for the asyncio serving mode: idempotency.idempotent
+and early_replay for Quart views, with duplicates waiting on an asyncio.Event.
+Completed results share the threaded mode's cache.
+"""
+import asyncio
+from functools import wraps
+
+from quart import current_app, request, jsonify, make_response, Response
+from quart.wrappers.response import DataBody
+
+from aio.google_auth import verify_google_token
+from idempotency import (
+    IDEMPOTENCY_HEADER, IDEMPOTENCY_WAIT_TIMEOUT, KEY_REUSED_ERROR, STILL_RUNNING_ERROR,
+    InFlight, StoredResponse, cacheable, completed, fingerprint, idempotent_scope, key_error, request_subject,
+    scope_key, survey_subject
+)
+
+in_flight = InFlight(asyncio.Event)
+
+
+def replay(stored, request_fingerprint):
+    if stored.fingerprint != request_fingerprint:
+        return jsonify({"error": KEY_REUSED_ERROR}), 422
+    response = Response(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def still_running():
+    response = jsonify({"error": STILL_RUNNING_ERROR})
+    response.headers['Retry-After'] = '1'
+    return response, 409
+
+
+async def early_replay():
+    """idempotency.early_replay for Quart views"""
+    scope = idempotent_scope(current_app.view_functions.get(request.endpoint))
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    if scope is None or not idempotency_key or key_error(idempotency_key):
+        return None
+    if scope == 'user':
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        user = await verify_google_token(auth_header.split('Bearer ')[1])
+        if not user:
+            return None
+        subject = user['user_id']
+    else:
+        subject = survey_subject(request.view_args['survey_id'])
+
+    key = scope_key(request.endpoint, subject, idempotency_key)
+    stored = completed.get(key)
+    if stored is None:
+        running = in_flight.get(key)
+        if running is None:
+            return None
+        try:
+            await asyncio.wait_for(running.wait(), IDEMPOTENCY_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return still_running()
+        stored = completed.get(key)
+        if stored is None:
+            return None
+    return replay(stored, fingerprint(await request.get_data(cache=True)))
+
+
+def idempotent(scope):
+    """idempotency.idempotent for Quart views"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(*args, **kwargs):
+            idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return await f(*args, **kwargs)
+            error = key_error(idempotency_key)
+            if error:
+                return jsonify({"error": error}), 400
+
+            key = scope_key(request.endpoint, request_subject(scope, request), idempotency_key)
+            request_fingerprint = fingerprint(await request.get_data(cache=True))
+            while True:
+                stored = completed.get(key)
+                if stored is not None:
+                    return replay(stored, request_fingerprint)
+                running = in_flight.claim(key)
+                if running is None:
+                    break
+                try:
+                    await asyncio.wait_for(running.wait(), IDEMPOTENCY_WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return still_running()
+
+            try:
+                stored = completed.get(key)
+                if stored is not None:
+                    return replay(stored, request_fingerprint)
+                response = await make_response(await f(*args, **kwargs))
+                if cacheable(response.status_code) and isinstance(response.response, DataBody):
+                    completed.set(key, StoredResponse(
+                        request_fingerprint, response.status_code, await response.get_data(), response.mimetype
+                    ))
+                return response
+            finally:
+                in_flight.finish(key)
+        decorated.idempotency_scope = scope
+        return decorated
+    return decorator
+
+
+def stats():
+    return {**completed.stats(), "in_flight": len(in_flight)}
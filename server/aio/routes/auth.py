@@ -0,0 +1,115 @@
+from quart import Blueprint, request, jsonify
+import aiomysql
+from aio.database import connection, execute
+from aio.google_auth import exchange_code_for_token, verify_google_token
+from google_auth import get_google_auth_url, user_cache
+from database import PoolTimeout
+from routes.auth import UPSERT_USER_QUERY
+
+auth_bp = Blueprint('auth', __name__)
+
+async def get_or_create_user(user_info):
+    """
+    Create the user, or refresh their email and name, in a single statement.
+    Returns tuple (user_data, is_new_user)
+    """
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            # Autocommit: the single upsert commits on its own
+            affected = await execute(
+                cursor,
+                UPSERT_USER_QUERY,
+                (user_info['user_id'], user_info['email'], user_info['name'])
+            )
+    
+    # The cached profile may hold a stale email or name
+    user_cache.pop(user_info['user_id'])
+    
+    user_data = {
+        'google_user_id': user_info['user_id'],
+        'email': user_info['email'],
+        'name': user_info['name']
+    }
+    return user_data, affected == 1
+
+@auth_bp.route('/login', methods=['GET'])
+async def login():
+    """
+    Redirect user to Google login page
+    """
+    auth_url = get_google_auth_url()
+    return jsonify({"auth_url": auth_url})
+
+@auth_bp.route('/callback', methods=['GET'])
+async def callback():
+    """
+    Handle Google OAuth callback
+    """
+    # Get authorization code from query parameters
+    code = request.args.get('code')
+    if not code:
+        return jsonify({"error": "Authorization code missing"}), 400
+    
+    # Exchange authorization code for tokens
+    token_response = await exchange_code_for_token(code)
+    if not token_response:
+        return jsonify({"error": "Failed to exchange authorization code for token"}), 400
+    
+    # Extract ID token
+    id_token = token_response.get('id_token')
+    if not id_token:
+        return jsonify({"error": "ID token missing from response"}), 400
+    
+    # Verify the ID token and get user info
+    user_info = await verify_google_token(id_token)
+    if not user_info:
+        return jsonify({"error": "Failed to verify ID token"}), 400
+    
+    # Return tokens and user info to the client
+    return jsonify({
+        "message": "Authentication successful",
+        "id_token": id_token,
+        "access_token": token_response.get('access_token'),
+        "refresh_token": token_response.get('refresh_token'),
+        "user": user_info,
+        "status": "success"
+    }), 200
+
+@auth_bp.route('/register', methods=['POST'])
+async def register():
+    """
+    Register a new user with Google Auth 2.0
+    Required header:
+    Authorization: Bearer <Google Auth token>
+    """
+    auth_header = request.headers.get('Authorization')
+    
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({"error": "Missing or invalid Authorization header. Must be 'Bearer <token>'"}), 401
+
+    # Extract token from "Bearer <token>"
+    google_token = auth_header.split(' ')[1]
+    
+    # Verify the ID token and get user info
+    user_info = await verify_google_token(google_token)
+    
+    if not user_info:
+        return jsonify({"error": "Invalid Google token"}), 400
+
+    try:
+        # Get or create user in database
+        await get_or_create_user(user_info)
+        
+        return jsonify({
+            "message": "User registered successfully",
+            "status": "success"
+        }), 200
+        
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except aiomysql.MySQLError as err:
+        return jsonify({
+            "error": "Database error occurred",
+            "message": str(err)
+        }), 500
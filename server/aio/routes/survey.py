@@ -0,0 +1,658 @@
+from quart import Blueprint, request, jsonify, Response
+import asyncio
+import io
+import itertools
+import aiomysql
+from admission import READ_PER_IP, READ_PER_SURVEY, SUBMIT_PER_IP, SUBMIT_PER_SURVEY
+from aio.admission import rate_limited, release_slot_on_close
+from aio.idempotency import idempotent
+from aio.database import connection, execute
+from aio.google_auth import auth_required
+from archive import ARCHIVE_SEGMENTS_QUERY, archived_page, archived_responses, response_order, survey_segments
+from analytics import RECORD_ANSWERS_QUERY, RECORD_DAILY_QUERY, DAILY_STATS_QUERY, ANSWER_STATS_QUERY, summarize_stats
+from compression import encoded_etag
+from database import multi_row_values, PoolTimeout
+from export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_QUESTIONS_QUERY, EXPORT_RESPONSES_QUERY, WRITERS
+import ingest
+from keys import new_id, parse_id, to_str
+from pagination import (
+    decode_cursor, decode_score_cursor, encode_cursor, encode_score_cursor, id_list_placeholders,
+    keyset_condition, parse_page_size
+)
+from search import SEARCH_ANSWERS_QUERY, SEARCH_QUERY_MAX_LENGTH, search_hits, search_params
+from routes.survey import (
+    INSERT_ANSWERS_QUERY, INSERT_RESPONSE_QUERY, RESPONSE_ANSWERS_QUERY, RESPONSES_PAGE_QUERY,
+    SURVEY_HEADER_QUERY, SURVEY_MAX_AGE, SURVEY_OWNER_QUERY, SURVEY_QUESTION_KEYS_QUERY,
+    SURVEY_QUESTIONS_QUERY, USER_SURVEYS_PAGE_QUERY,
+    add_questions, answer_rows, archived_answer_entries, survey_cache, survey_document, survey_entry,
+    survey_questions_cache
+)
+
+# Same routes, queries, caches and JSON shapes as routes/survey.py, without
+# holding a thread while waiting on MySQL
+survey_bp = Blueprint('survey', __name__)
+
+async def record_responses(cursor, response_ids):
+    """Async analytics.record_responses: fold new responses into the summary tables"""
+    if not response_ids:
+        return
+    ids = id_list_placeholders(response_ids)
+    await execute(cursor, RECORD_DAILY_QUERY.format(ids=ids), response_ids)
+    await execute(cursor, RECORD_ANSWERS_QUERY.format(ids=ids), response_ids)
+
+async def survey_question_keys(survey_key):
+    """Set of question ids for a survey, or None if the survey doesn't exist"""
+    question_keys = survey_questions_cache.get(survey_key)
+    if question_keys is not None:
+        return question_keys
+
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await execute(cursor, SURVEY_QUESTION_KEYS_QUERY, (survey_key,))
+            rows = await cursor.fetchall()
+
+    if not rows:
+        return None
+    question_keys = frozenset(bytes(row[0]) for row in rows if row[0] is not None)
+    survey_questions_cache.set(survey_key, question_keys)
+    return question_keys
+
+async def owns_survey(cursor, survey_key, user_id):
+    await execute(cursor, SURVEY_OWNER_QUERY, (survey_key, user_id))
+    return await cursor.fetchone() is not None
+
+def survey_document_response(document):
+    """Build a cacheable, conditional response from a cached survey document"""
+    body, encoding = document['body'].for_request(request)
+    etag = encoded_etag(document['etag'], encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(b'', status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = SURVEY_MAX_AGE
+    return response
+
+@survey_bp.route('', methods=['POST'])
+@auth_required
+@idempotent('user')
+async def create_survey():
+    """
+    Create a new survey with questions
+    Requires authentication
+    A retry with the same Idempotency-Key header replays the first result
+    """
+    data = await request.get_json()
+    user_id = request.user['user_id']  # Added by auth_required decorator
+    if not data:
+        return jsonify({"error": "Missing survey data"}), 400
+
+    required_fields = ['title', 'system_prompt', 'questions']
+    if not all(field in data for field in required_fields):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    if not data['questions']:
+        return jsonify({"error": "Survey must have at least one question"}), 400
+
+    async with connection() as conn:
+        try:
+            await conn.begin()
+            async with conn.cursor() as cursor:
+                survey_id = new_id()
+                await execute(
+                    cursor,
+                    """
+                    INSERT INTO surveys (id, user_id, title, system_prompt)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (survey_id, user_id, data['title'], data['system_prompt'])
+                )
+
+                # Create all questions in one multi-row insert
+                placeholders, params = multi_row_values(
+                    "(%s, %s, %s, %s)",
+                    [
+                        (new_id(), survey_id, question['question'], question['elaborate'])
+                        for question in data['questions']
+                    ]
+                )
+                await execute(
+                    cursor,
+                    f"""
+                    INSERT INTO questions (id, survey_id, question, elaborate)
+                    VALUES {placeholders}
+                    """,
+                    params
+                )
+            await conn.commit()
+
+            return jsonify({
+                "message": "Survey created successfully",
+                "survey_id": to_str(survey_id),
+                "status": "success"
+            }), 201
+
+        except Exception as e:
+            await conn.rollback()
+            return jsonify({
+                "error": "Failed to create survey",
+                "message": str(e)
+            }), 500
+
+@survey_bp.route('', methods=['GET'])
+@auth_required
+async def get_user_surveys():
+    """
+    Get the authenticated user's surveys, newest first
+    Requires authentication
+    Query parameters:
+        limit  - page size (default DEFAULT_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        cursor - `next_cursor` from the previous page
+    """
+    google_user_id = request.user['user_id']
+
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        position = decode_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                keyset, keyset_params = keyset_condition(position)
+                await execute(
+                    cursor,
+                    USER_SURVEYS_PAGE_QUERY.format(keyset=keyset),
+                    [google_user_id] + keyset_params + [page_size + 1]
+                )
+                rows = await cursor.fetchall()
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+
+                surveys = {bytes(row[0]): survey_entry(row) for row in rows}
+
+                # Questions for the whole page in one query
+                if surveys:
+                    survey_keys = list(surveys)
+                    await execute(
+                        cursor,
+                        SURVEY_QUESTIONS_QUERY.format(ids=id_list_placeholders(survey_keys)),
+                        survey_keys
+                    )
+                    add_questions(surveys, await cursor.fetchall())
+
+        return jsonify({
+            "surveys": list(surveys.values()),
+            "next_cursor": encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None,
+            "status": "success"
+        }), 200
+
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch surveys",
+            "message": str(e)
+        }), 500
+
+@survey_bp.route('/<survey_id>/responses', methods=['GET'])
+@auth_required
+async def get_survey_responses(survey_id):
+    """
+    Get responses for a specific survey, newest first
+    Requires authentication and survey ownership
+    Query parameters: limit, cursor, since (see routes/survey.py)
+    """
+    user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        since = decode_cursor(request.args['since']) if 'since' in request.args else None
+        position = decode_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if not await owns_survey(cursor, survey_key, user_id):
+                    return jsonify({
+                        "error": "Survey not found or access denied"
+                    }), 404
+
+                descending = since is None
+                keyset, keyset_params = keyset_condition(position if descending else since, descending)
+                await execute(
+                    cursor,
+                    RESPONSES_PAGE_QUERY.format(keyset=keyset, direction='DESC' if descending else 'ASC'),
+                    [survey_key] + keyset_params + [page_size + 1]
+                )
+                rows = [(bytes(row['id']), row['created_at'], None) for row in await cursor.fetchall()]
+
+                # Merge in archived responses that belong on this page; segment files are read off the event loop
+                await execute(cursor, ARCHIVE_SEGMENTS_QUERY, (survey_key,))
+                segments = survey_segments(await cursor.fetchall())
+                if segments:
+                    rows = await asyncio.to_thread(
+                        archived_page, rows, segments, position if descending else since, descending, page_size + 1
+                    )
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+
+                responses = {}
+                for response_id, created_at, _ in rows:
+                    responses[response_id] = {
+                        'id': to_str(response_id),
+                        'created_at': created_at,
+                        'answers': []
+                    }
+
+                # Answers for the whole page's hot responses in one query
+                hot_keys = [response_id for response_id, _, answers in rows if answers is None]
+                if hot_keys:
+                    await execute(
+                        cursor,
+                        RESPONSE_ANSWERS_QUERY.format(ids=id_list_placeholders(hot_keys)),
+                        hot_keys
+                    )
+                    for row in await cursor.fetchall():
+                        responses[bytes(row['response_id'])]['answers'].append({
+                            'question_id': to_str(row['question_id']),
+                            'question': row['question'],
+                            'answer': row['answer']
+                        })
+                if len(hot_keys) < len(rows):
+                    await execute(cursor, EXPORT_QUESTIONS_QUERY, (survey_key,))
+                    questions = await cursor.fetchall()
+                    for response_id, _, answers in rows:
+                        if answers is not None:
+                            responses[response_id]['answers'] = archived_answer_entries(questions, answers)
+
+        last_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if rows else None
+        if descending:
+            next_cursor = last_cursor if has_more else None
+            since_cursor = encode_cursor(rows[0][1], rows[0][0]) if rows and not position else None
+        else:
+            since_cursor = last_cursor or request.args['since']
+            next_cursor = since_cursor if has_more else None
+
+        return jsonify({
+            "responses": list(responses.values()),
+            "next_cursor": next_cursor,
+            "since_cursor": since_cursor,
+            "status": "success"
+        }), 200
+
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch survey responses",
+            "message": str(e)
+        }), 500
+
+async def hot_responses(cursor, chunk_size):
+    """Async export.iter_responses: group an unbuffered cursor's rows into (response_id, created_at, answers)"""
+    current = None
+    while True:
+        rows = await cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for response_id, created_at, question_id, answer in rows:
+            if current is None or current[0] != response_id:
+                if current is not None:
+                    yield current
+                current = (bytes(response_id), created_at, {})
+            if question_id is not None:
+                current[2][bytes(question_id)] = answer
+    if current is not None:
+        yield current
+
+async def next_or_none(iterator):
+    """Next item of an async iterator, or None once it is exhausted"""
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def archived_batches(segments, batch_size):
+    """archived_responses(segments), read and gunzipped batch_size at a time in a worker thread"""
+    archived = archived_responses(segments)
+    while True:
+        batch = await asyncio.to_thread(list, itertools.islice(archived, batch_size))
+        if not batch:
+            break
+        for response in batch:
+            yield response
+
+async def export_chunks(survey_key, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Async ExportStream: CSV or NDJSON text chunks read through an unbuffered
+    cursor, with archived responses merged in by (created_at, id). The
+    connection is only checked out once the body starts streaming.
+    """
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await execute(cursor, EXPORT_QUESTIONS_QUERY, (survey_key,))
+            questions = [(bytes(question_id), question) for question_id, question in await cursor.fetchall()]
+            await execute(cursor, ARCHIVE_SEGMENTS_QUERY, (survey_key,))
+            segments = survey_segments(await cursor.fetchall())
+
+        buffer = io.StringIO()
+        write = WRITERS[export_format](buffer, questions)
+        archived = archived_batches(segments, chunk_size)
+        next_archived = await next_or_none(archived)
+        cursor = await conn.cursor(aiomysql.SSCursor)
+        try:
+            await execute(cursor, EXPORT_RESPONSES_QUERY, (survey_key,))
+            hot = hot_responses(cursor, chunk_size)
+            next_hot = await next_or_none(hot)
+            pending = 0
+            while next_hot is not None or next_archived is not None:
+                if next_hot is None or (next_archived is not None and response_order(next_archived) < response_order(next_hot)):
+                    write(*next_archived)
+                    next_archived = await next_or_none(archived)
+                else:
+                    write(*next_hot)
+                    next_hot = await next_or_none(hot)
+                pending += 1
+                if pending >= chunk_size:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+        except BaseException:
+            # Stream ended early (usually a client disconnect): close the
+            # connection, which the pool then drops, rather than read off the
+            # rest of the result to make it reusable
+            conn.close()
+            raise
+        await cursor.close()
+        yield buffer.getvalue()
+
+@survey_bp.route('/<survey_id>/export', methods=['GET'])
+@auth_required
+async def export_survey_responses(survey_id):
+    """
+    Stream all responses for a survey as CSV (one column per question) or NDJSON
+    Requires authentication and survey ownership
+    Query parameters:
+        format - csv (default) or ndjson
+    """
+    user_id = request.user['user_id']
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({
+            "error": f"Unsupported export format, expected one of: {', '.join(EXPORT_FORMATS)}"
+        }), 400
+
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                owned = await owns_survey(cursor, survey_key, user_id)
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to export survey responses",
+            "message": str(e)
+        }), 500
+
+    if not owned:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+
+    # The body checks out a connection once it starts streaming, so it keeps the request's slot
+    return release_slot_on_close(Response(
+        export_chunks(survey_key, export_format),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="survey-{to_str(survey_key)}.{export_format}"'
+        }
+    ))
+
+@survey_bp.route('/<survey_id>/search', methods=['GET'])
+@auth_required
+async def search_survey_answers(survey_id):
+    """
+    Full-text search over a survey's answers, best matches first
+    Requires authentication and survey ownership
+    Query parameters: q, limit, cursor (see routes/survey.py)
+    """
+    user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+
+    query = request.args.get('q', '').strip()
+    if not query or len(query) > SEARCH_QUERY_MAX_LENGTH:
+        return jsonify({
+            "error": f"q must be 1 to {SEARCH_QUERY_MAX_LENGTH} characters"
+        }), 400
+
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        position = decode_score_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if not await owns_survey(cursor, survey_key, user_id):
+                    return jsonify({
+                        "error": "Survey not found or access denied"
+                    }), 404
+
+                keyset, params = search_params(query, survey_key, position, page_size + 1)
+                await execute(cursor, SEARCH_ANSWERS_QUERY.format(keyset=keyset), params)
+                rows = await cursor.fetchall()
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+
+        return jsonify({
+            "hits": search_hits(rows, query),
+            "next_cursor": encode_score_cursor(rows[-1]['score'], rows[-1]['id']) if has_more else None,
+            "status": "success"
+        }), 200
+
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to search survey answers",
+            "message": str(e)
+        }), 500
+
+@survey_bp.route('/<survey_id>/stats', methods=['GET'])
+@auth_required
+async def get_survey_stats(survey_id):
+    """
+    Get response analytics for a survey from the summary tables
+    Requires authentication and survey ownership
+    """
+    user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                if not await owns_survey(cursor, survey_key, user_id):
+                    return jsonify({
+                        "error": "Survey not found or access denied"
+                    }), 404
+
+                await execute(cursor, DAILY_STATS_QUERY, (survey_key,))
+                daily_rows = await cursor.fetchall()
+                await execute(cursor, ANSWER_STATS_QUERY, (survey_key,))
+                answer_stat_rows = await cursor.fetchall()
+
+        return jsonify({
+            "stats": summarize_stats(daily_rows, answer_stat_rows),
+            "status": "success"
+        }), 200
+
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch survey stats",
+            "message": str(e)
+        }), 500
+
+@survey_bp.route('/<survey_id>', methods=['GET'])
+@rate_limited(('ip', READ_PER_IP), ('survey', READ_PER_SURVEY))
+async def get_survey(survey_id):
+    """
+    Get details of a specific survey including owner's name and all questions
+    Public endpoint - no authentication required
+    Served from a read-through cache with ETag / If-None-Match support
+    """
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found"
+        }), 404
+
+    cache_key = to_str(survey_key)
+    document = survey_cache.get(cache_key)
+    if document:
+        return survey_document_response(document)
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await execute(cursor, SURVEY_HEADER_QUERY, (survey_key,))
+                survey_row = await cursor.fetchone()
+                if survey_row is not None:
+                    await execute(cursor, SURVEY_QUESTIONS_QUERY.format(ids='%s'), (survey_key,))
+                    question_rows = await cursor.fetchall()
+
+        if survey_row is None:
+            return jsonify({
+                "error": "Survey not found"
+            }), 404
+
+        document = survey_document(survey_row, question_rows)
+        survey_cache.set(cache_key, document)
+        return survey_document_response(document)
+
+    except PoolTimeout:
+        # Answered with a 503 by the app's error handler, as in threaded mode
+        raise
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch survey details",
+            "message": str(e)
+        }), 500
+
+@survey_bp.route('/<survey_id>', methods=['POST'])
+@idempotent('survey')
+@rate_limited(('ip', SUBMIT_PER_IP), ('survey', SUBMIT_PER_SURVEY))
+async def submit_survey_response(survey_id):
+    """
+    Submit a new response for a survey
+    Public endpoint - no authentication required
+    A retry with the same Idempotency-Key header replays the first result
+    Expected JSON format: {"answers": {"question_id": "answer", ...}}
+    """
+    data = await request.get_json()
+    if not data or 'answers' not in data:
+        return jsonify({"error": "Missing answers data"}), 400
+
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({"error": "Survey not found"}), 404
+
+    if ingest.enabled():
+        try:
+            question_keys = await survey_question_keys(survey_key)
+            if question_keys is None:
+                return jsonify({"error": "Survey not found"}), 404
+            response_id = new_id()
+            # The spool append fsyncs, so keep it off the event loop
+            await asyncio.to_thread(
+                ingest.enqueue, response_id, survey_key, answer_rows(data['answers'], question_keys)
+            )
+            return jsonify({
+                "message": "Response accepted",
+                "response_id": to_str(response_id),
+                "status": "accepted"
+            }), 202
+        except Exception as e:
+            return jsonify({
+                "error": "Failed to submit response",
+                "message": str(e)
+            }), 500
+
+    async with connection() as conn:
+        try:
+            await conn.begin()
+            async with conn.cursor() as cursor:
+                # Create the response; inserting from surveys doubles as the existence check
+                response_id = new_id()
+                if await execute(cursor, INSERT_RESPONSE_QUERY, (response_id, survey_key)) == 0:
+                    await conn.rollback()
+                    return jsonify({"error": "Survey not found"}), 404
+
+                rows = answer_rows(data['answers'])
+                if rows:
+                    placeholders, params = multi_row_values("ROW(%s, %s, %s)", rows)
+                    await execute(
+                        cursor,
+                        INSERT_ANSWERS_QUERY.format(placeholders=placeholders),
+                        [response_id] + params + [survey_key]
+                    )
+
+                await record_responses(cursor, [response_id])
+            await conn.commit()
+
+            return jsonify({
+                "message": "Response submitted successfully",
+                "response_id": to_str(response_id),
+                "status": "success"
+            }), 201
+
+        except Exception as e:
+            await conn.rollback()
+            return jsonify({
+                "error": "Failed to submit response",
+                "message": str(e)
+            }), 500
@@ -0,0 +1,52 @@
+from quart import Blueprint, request, jsonify
+import aiomysql
+from aio.database import connection, execute
+from aio.google_auth import auth_required
+from google_auth import user_cache
+from database import PoolTimeout
+from routes.user import USER_PROFILE_QUERY
+
+user_bp = Blueprint('user', __name__)
+
+@user_bp.route('', methods=['GET'])
+@auth_required
+async def get_user_info():
+    """
+    Get user information
+    Requires authentication
+    Served from the user profile cache, falling back to the database
+    """
+    user_id = request.user['user_id']
+    profile = user_cache.get(user_id)
+    
+    if profile is None:
+        try:
+            async with connection() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await execute(cursor, USER_PROFILE_QUERY, (user_id,))
+                    row = await cursor.fetchone()
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            return jsonify({
+                "error": "Failed to fetch user",
+                "message": str(e)
+            }), 500
+        
+        if not row:
+            return jsonify({
+                "error": "User not registered"
+            }), 404
+        
+        profile = {
+            "user_id": row['google_user_id'],
+            "email": row['email'],
+            "name": row['name'],
+            "created_at": row['created_at']
+        }
+        user_cache.set(user_id, profile)
+    
+    return jsonify({
+        **profile,
+        "status": "success"
+    }), 200
@@ -0,0 +1,138 @@
+from keys import to_str
+from pagination import id_list_placeholders
+
+# Longest answer kept verbatim as a distribution bucket
+ANSWER_VALUE_LENGTH = 64
+
+# Summary rows are folded in from the responses just inserted, inside the
+# same transaction, so the counts never drift from the raw tables
+RECORD_DAILY_QUERY = """
+    INSERT INTO survey_daily_stats (survey_id, day, response_count)
+    SELECT * FROM (
+        SELECT survey_id, DATE(created_at) AS day, COUNT(*) AS response_count
+        FROM responses
+        WHERE id IN ({ids})
+        GROUP BY survey_id, DATE(created_at)
+    ) AS new_stats
+    ON DUPLICATE KEY UPDATE
+        response_count = survey_daily_stats.response_count + new_stats.response_count
+"""
+
+# Distributions are only kept for closed (non-elaborate, e.g. yes/no) questions
+RECORD_ANSWERS_QUERY = f"""
+    INSERT INTO question_answer_stats (question_id, answer_value, answer_count)
+    SELECT * FROM (
+        SELECT a.question_id, LOWER(TRIM(LEFT(a.answer, {ANSWER_VALUE_LENGTH}))) AS answer_value, COUNT(*) AS answer_count
+        FROM answers a
+        JOIN questions q ON q.id = a.question_id
+        WHERE a.response_id IN ({{ids}}) AND q.elaborate = FALSE AND a.answer IS NOT NULL
+        GROUP BY a.question_id, answer_value
+    ) AS new_stats
+    ON DUPLICATE KEY UPDATE
+        answer_count = question_answer_stats.answer_count + new_stats.answer_count
+"""
+
+DAILY_STATS_QUERY = """
+    SELECT day, response_count
+    FROM survey_daily_stats
+    WHERE survey_id = %s
+    ORDER BY day
+"""
+
+ANSWER_STATS_QUERY = """
+    SELECT q.id, q.question, q.elaborate, st.answer_value, st.answer_count
+    FROM questions q
+    LEFT JOIN question_answer_stats st ON st.question_id = q.id
+    WHERE q.survey_id = %s
+    ORDER BY q.created_at, q.id, st.answer_count DESC
+"""
+
+CLEAR_DAILY_QUERY = "DELETE FROM survey_daily_stats WHERE survey_id = %s"
+
+CLEAR_ANSWERS_QUERY = """
+    DELETE st FROM question_answer_stats st
+    JOIN questions q ON q.id = st.question_id
+    WHERE q.survey_id = %s
+"""
+
+REBUILD_DAILY_QUERY = """
+    INSERT INTO survey_daily_stats (survey_id, day, response_count)
+    SELECT survey_id, DATE(created_at), COUNT(*)
+    FROM responses
+    WHERE survey_id = %s
+    GROUP BY survey_id, DATE(created_at)
+"""
+
+REBUILD_ANSWERS_QUERY = f"""
+    INSERT INTO question_answer_stats (question_id, answer_value, answer_count)
+    SELECT a.question_id, LOWER(TRIM(LEFT(a.answer, {ANSWER_VALUE_LENGTH}))) AS answer_value, COUNT(*)
+    FROM questions q
+    JOIN answers a ON a.question_id = q.id
+    WHERE q.survey_id = %s AND q.elaborate = FALSE AND a.answer IS NOT NULL
+    GROUP BY a.question_id, answer_value
+"""
+
+def record_responses(cursor, response_ids):
+    """
+    Add newly inserted responses (and their answers) to the summary tables.
+    Must run in the transaction that inserted them.
+    """
+    if not response_ids:
+        return
+    ids = id_list_placeholders(response_ids)
+    cursor.execute(RECORD_DAILY_QUERY.format(ids=ids), response_ids)
+    cursor.execute(RECORD_ANSWERS_QUERY.format(ids=ids), response_ids)
+
+def survey_stats(cursor, survey_key):
+    """
+    Read a survey's summary: total responses, responses per day and answer
+    distributions per closed question. Cost doesn't depend on response count.
+    """
+    cursor.execute(DAILY_STATS_QUERY, (survey_key,))
+    daily_rows = cursor.fetchall()
+    cursor.execute(ANSWER_STATS_QUERY, (survey_key,))
+    return summarize_stats(daily_rows, cursor.fetchall())
+
+def summarize_stats(daily_rows, answer_rows):
+    """Shape DAILY_STATS_QUERY and ANSWER_STATS_QUERY rows into the stats document"""
+    per_day = [
+        {'day': day.isoformat(), 'responses': count}
+        for day, count in daily_rows
+    ]
+
+    questions = {}
+    for question_id, question, elaborate, answer_value, answer_count in answer_rows:
+        question_id = bytes(question_id)
+        if question_id not in questions:
+            questions[question_id] = {
+                'question_id': to_str(question_id),
+                'question': question,
+                'elaborate': bool(elaborate),
+                'answers': {}
+            }
+        if answer_value is not None:
+            questions[question_id]['answers'][answer_value] = answer_count
+
+    return {
+        'total_responses': sum(day['responses'] for day in per_day),
+        'responses_per_day': per_day,
+        'questions': list(questions.values())
+    }
+
+def rebuild_survey_stats(db, survey_key):
+    """Recompute one survey's summary rows from the raw responses and answers, hot and archived"""
+    from archive import fold_archived_stats
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(CLEAR_DAILY_QUERY, (survey_key,))
+        cursor.execute(CLEAR_ANSWERS_QUERY, (survey_key,))
+        cursor.execute(REBUILD_DAILY_QUERY, (survey_key,))
+        cursor.execute(REBUILD_ANSWERS_QUERY, (survey_key,))
+        fold_archived_stats(cursor, survey_key)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
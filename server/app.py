@@ -1,30 +1,158 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
+import logging
 import os
+import time
 from flask_cors import CORS
 from dotenv import load_dotenv
-from database import init_db
+from database import init_db, pool_stats, replica_stats, PoolTimeout
+from serialization import FastJSONProvider
+from admission import ADMISSION_EXEMPT_ENDPOINTS, PROXY_FIX_X_FOR, RateLimited, Overloaded
+import admission
+import compression
+import idempotency
+import metrics
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'default-secret-key')
+app.json = FastJSONProvider(app)
+
+# Behind N reverse proxies, take the client address (used for rate limits)
+# from the last N X-Forwarded-For entries instead of the proxy's own
+if PROXY_FIX_X_FOR:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_X_FOR)
 
-# Initialize database connection pool
+# Initialize database connection pool and check the schema version
 init_db()
 
 # Configure CORS to allow requests from frontend
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:3000", "http://localhost:5000", "http://localhost:8000", "http://localhost:8080"]}})
 
+@app.errorhandler(PoolTimeout)
+def database_busy(err):
+    """All pooled connections stayed busy for the whole checkout timeout"""
+    response = jsonify({
+        "error": "Service temporarily busy, please retry",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(RateLimited)
+def too_many_requests(err):
+    """A per-client or per-survey token bucket is empty"""
+    response = jsonify({
+        "error": "Too many requests",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response, 429
+
+@app.errorhandler(Overloaded)
+def server_overloaded(err):
+    """Shed by the concurrency limiter rather than queued behind the connection pool"""
+    response = jsonify({
+        "error": "Service temporarily busy, please retry",
+        "message": str(err)
+    })
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response, 503
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+# Retries with a finished Idempotency-Key are replayed before taking a slot
+app.before_request(idempotency.early_replay)
+
+# Registered after the timer, so time spent waiting for a slot counts towards the request
+@app.before_request
+def admit_request():
+    if admission.limiter is None or request.endpoint in ADMISSION_EXEMPT_ENDPOINTS:
+        return
+    admission.limiter.acquire()
+    g.admitted = True
+
+@app.teardown_request
+def release_request_slot(exc):
+    if g.pop('admitted', False):
+        admission.limiter.release()
+
+@app.after_request
+def record_request_duration(response):
+    """Observe the time to build the response (streamed bodies are timed up to their first byte)"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.request_duration.observe(
+            time.perf_counter() - start,
+            request.endpoint or 'unmatched', request.method, str(response.status_code)
+        )
+    return response
+
+# Registered after the timer, so it runs first and compression counts towards the request time
+@app.after_request
+def compress_response(response):
+    return compression.compress_response(response, request)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Import routes after app is defined to avoid circular imports
 from routes.auth import auth_bp
 from routes.survey import survey_bp
 from routes.user import user_bp
+from routes.audio import audio_bp
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(survey_bp, url_prefix='/api/survey')
 app.register_blueprint(user_bp, url_prefix='/api/user')
+app.register_blueprint(audio_bp, url_prefix='/api/audio')
+
+# Trim and measure finished audio recordings in worker processes, forked
+# before the spool flusher (or any other thread) is running
+import audio_worker
+if audio_worker.enabled():
+    audio_worker.start()
+
+# Start draining the response spool (replays anything left by a previous run)
+import ingest
+if ingest.enabled():
+    ingest.start()
+
+# Move old responses to cold storage every ARCHIVE_INTERVAL_HOURS
+import archive
+if archive.enabled():
+    archive.start()
+
+from google_auth import get_auth_cache_stats
+
+def auth_cache_gauges():
+    stats = get_auth_cache_stats()
+    return {
+        **{f'token_cache_{name}': value for name, value in stats['tokens'].items()},
+        **{f'certs_cache_{name}': value for name, value in stats['certs'].items()}
+    }
+
+# Point-in-time pool, spool, archival, audio processing, admission, idempotency and auth cache state, read on each scrape
+metrics.register(metrics.GaugeCollector('db_pool', 'Connection pool state', pool_stats))
+metrics.register(metrics.GaugeCollector('db_replica', 'Replica lag (-1 if unknown) and replica pool state', replica_stats))
+metrics.register(metrics.GaugeCollector('ingest', 'Response spool state', ingest.stats))
+metrics.register(metrics.GaugeCollector('archive', 'Response archival job state', archive.stats))
+metrics.register(metrics.GaugeCollector('audio_processing', 'Audio post-processing pool state', audio_worker.stats))
+metrics.register(metrics.GaugeCollector('admission', 'Concurrency limiter and rate limit bucket state', admission.stats))
+metrics.register(metrics.GaugeCollector('idempotency', 'Idempotency-Key result cache state', idempotency.stats))
+metrics.register(metrics.GaugeCollector('auth', 'ID token and certificate cache state', auth_cache_gauges))
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,371 @@
+"""
+Hot/cold split of survey responses.
+
+Responses older than ARCHIVE_AFTER_MONTHS (and, with `manage.py archive
+--closed`, every response of a closed survey) are moved out of the
+`responses` and `answers` tables into gzipped NDJSON segment files under
+ARCHIVE_STORAGE_PATH, one calendar month of one survey per segment:
+
+    {ARCHIVE_STORAGE_PATH}/{survey id}/{YYYY-MM}/{segment id}.ndjson.gz
+
+Each segment is written and fsynced first, then its rows are deleted and the
+segment is registered in `response_archives` (and its response ids in
+`archived_response_ids`) in one transaction, so a crash at any point leaves
+the rows either hot or archived, never both or neither (an unregistered file
+left behind is ignored). Readers find a survey's
+segments through `response_archives` and merge them with the hot rows by
+(created_at, id), so listings and exports look the same after archival.
+
+Responses with audio uploads stay hot, since audio_uploads references them.
+The analytics summary tables keep counting archived responses; rebuild-stats
+folds the segments back in.
+"""
+import gzip
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from analytics import ANSWER_VALUE_LENGTH
+from database import get_db_connection, multi_row_values
+from keys import new_id, to_str
+from pagination import id_list_placeholders, keyset_condition
+from serialization import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATH = os.getenv('ARCHIVE_STORAGE_PATH', 'archive')
+# Responses created before the start of the month this many months ago are archived
+ARCHIVE_AFTER_MONTHS = int(os.getenv('ARCHIVE_AFTER_MONTHS', 12))
+# Responses per segment file (and per delete transaction)
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 2000))
+# Hours between background archival runs (0 disables; run `manage.py archive` instead)
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', 0))
+# MySQL named lock held while archiving, so only one process archives at a time
+ARCHIVE_LOCK_NAME = 'audio_survey.archive'
+
+ARCHIVE_SEGMENTS_QUERY = """
+    SELECT path, first_created_at, last_created_at
+    FROM response_archives
+    WHERE survey_id = %s
+    ORDER BY first_created_at, id
+"""
+
+ARCHIVABLE_RESPONSES_QUERY = """
+    SELECT r.id, r.created_at
+    FROM responses r
+    WHERE r.survey_id = %s AND r.created_at < %s {keyset}
+        AND NOT EXISTS (SELECT 1 FROM audio_uploads au WHERE au.response_id = r.id)
+    ORDER BY r.created_at, r.id
+    LIMIT %s
+"""
+
+ARCHIVABLE_ANSWERS_QUERY = """
+    SELECT response_id, question_id, answer
+    FROM answers
+    WHERE response_id IN ({ids})
+"""
+
+REGISTER_SEGMENT_QUERY = """
+    INSERT INTO response_archives (id, survey_id, path, response_count, first_created_at, last_created_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+INDEX_ARCHIVED_IDS_QUERY = """
+    INSERT INTO archived_response_ids (id, archive_id)
+    VALUES {placeholders}
+"""
+
+CLOSED_QUESTIONS_QUERY = """
+    SELECT id FROM questions
+    WHERE survey_id = %s AND elaborate = FALSE
+"""
+
+FOLD_DAILY_QUERY = """
+    INSERT INTO survey_daily_stats (survey_id, day, response_count)
+    VALUES {placeholders} AS new_stats
+    ON DUPLICATE KEY UPDATE
+        response_count = survey_daily_stats.response_count + new_stats.response_count
+"""
+
+FOLD_ANSWERS_QUERY = """
+    INSERT INTO question_answer_stats (question_id, answer_value, answer_count)
+    VALUES {placeholders} AS new_stats
+    ON DUPLICATE KEY UPDATE
+        answer_count = question_answer_stats.answer_count + new_stats.answer_count
+"""
+
+def enabled():
+    return ARCHIVE_INTERVAL_HOURS > 0
+
+def response_order(response):
+    """Sort key of a (response_id, created_at, answers) tuple: the listings' (created_at, id)"""
+    return response[1], response[0]
+
+def archive_cutoff(months=ARCHIVE_AFTER_MONTHS, now=None):
+    """Start of the month `months` months before now; older responses are archived"""
+    now = now or datetime.now()
+    month_index = now.year * 12 + now.month - 1 - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+def survey_segments(rows):
+    """(path, first_created_at, last_created_at) for ARCHIVE_SEGMENTS_QUERY rows from any cursor"""
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in rows]
+
+def read_segment(path):
+    """Yield a segment's (response_id, created_at, {question_id: answer}) in (created_at, id) order"""
+    with gzip.open(os.path.join(ARCHIVE_PATH, path), 'rt', encoding='utf-8') as segment:
+        for line in segment:
+            record = json.loads(line)
+            yield (
+                bytes.fromhex(record['id']),
+                datetime.fromisoformat(record['created_at']),
+                {bytes.fromhex(question_id): answer for question_id, answer in record['answers']}
+            )
+
+def archived_responses(segments):
+    """Every archived response of a survey, oldest first, streamed from its segments"""
+    return heapq.merge(*(read_segment(path) for path, _, _ in segments), key=response_order)
+
+def archived_page(hot, segments, position, descending, limit):
+    """
+    One listing page ordered by (created_at, id), newest first if descending:
+    the first `limit` of the hot rows (already strictly past `position`) and
+    the archived responses strictly past `position`. A segment is only read
+    if it can still hold a better row than the page found so far, so a full
+    page of hot rows newer than every segment reads none.
+    """
+    if descending:
+        segments = sorted(segments, key=lambda segment: segment[2], reverse=True)
+    else:
+        segments = sorted(segments, key=lambda segment: segment[1])
+    found = sorted(hot, key=response_order, reverse=descending)[:limit]
+    for path, first_created_at, last_created_at in segments:
+        # Entirely on the near side of the position
+        if position is not None and ((first_created_at > position[0]) if descending else (last_created_at < position[0])):
+            continue
+        if len(found) >= limit:
+            boundary = found[limit - 1][1]
+            if (last_created_at < boundary) if descending else (first_created_at > boundary):
+                break
+        rows = [
+            response for response in read_segment(path)
+            if position is None or (response_order(response) < position if descending else response_order(response) > position)
+        ]
+        found = sorted(found + rows, key=response_order, reverse=descending)[:limit]
+    return found
+
+def write_segment(survey_key, month, records):
+    """Write and fsync a gzipped NDJSON segment; returns its path relative to ARCHIVE_PATH"""
+    path = os.path.join(to_str(survey_key), month, f'{to_str(new_id())}.ndjson.gz')
+    full_path = os.path.join(ARCHIVE_PATH, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    partial_path = full_path + '.partial'
+    with open(partial_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as segment:
+            for response_id, created_at, answers in records:
+                segment.write(dumps_bytes({
+                    'id': response_id.hex(),
+                    'created_at': created_at.isoformat(),
+                    'answers': [[question_id.hex(), answer] for question_id, answer in answers]
+                }, sort_keys=False))
+                segment.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial_path, full_path)
+    return path
+
+def archive_batch(db, survey_key, rows):
+    """
+    Move one month's batch of (response_id, created_at) rows, oldest first,
+    to a new segment. Returns the number of responses archived.
+    """
+    response_ids = [bytes(response_id) for response_id, _ in rows]
+    ids = id_list_placeholders(response_ids)
+    cursor = db.cursor()
+    path = None
+    try:
+        cursor.execute(ARCHIVABLE_ANSWERS_QUERY.format(ids=ids), response_ids)
+        answers = {response_id: [] for response_id in response_ids}
+        for response_id, question_id, answer in cursor.fetchall():
+            answers[bytes(response_id)].append((bytes(question_id), answer))
+
+        first_created_at, last_created_at = rows[0][1], rows[-1][1]
+        path = write_segment(
+            survey_key, first_created_at.strftime('%Y-%m'),
+            [(response_id, created_at, answers[response_id]) for response_id, (_, created_at) in zip(response_ids, rows)]
+        )
+
+        cursor.execute(f"DELETE FROM answers WHERE response_id IN ({ids})", response_ids)
+        cursor.execute(f"DELETE FROM responses WHERE id IN ({ids})", response_ids)
+        if cursor.rowcount != len(response_ids):
+            raise RuntimeError("Responses changed while being archived")
+        archive_id = new_id()
+        cursor.execute(REGISTER_SEGMENT_QUERY, (
+            archive_id, survey_key, path, len(response_ids), first_created_at, last_created_at
+        ))
+        placeholders, params = multi_row_values("(%s, %s)", [(response_id, archive_id) for response_id in response_ids])
+        cursor.execute(INDEX_ARCHIVED_IDS_QUERY.format(placeholders=placeholders), params)
+        db.commit()
+        return len(response_ids)
+    except Exception:
+        db.rollback()
+        if path is not None:
+            os.remove(os.path.join(ARCHIVE_PATH, path))
+        raise
+    finally:
+        cursor.close()
+
+def archive_survey(db, survey_key, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive a survey's responses created before cutoff; returns (responses, segments)"""
+    archived, segments = 0, 0
+    position = None
+    cursor = db.cursor()
+    try:
+        while True:
+            keyset, keyset_params = keyset_condition(position, descending=False)
+            cursor.execute(
+                ARCHIVABLE_RESPONSES_QUERY.format(keyset=keyset),
+                [survey_key, cutoff] + keyset_params + [batch_size]
+            )
+            rows = cursor.fetchall()
+            db.commit()
+            if not rows:
+                return archived, segments
+            # A segment never spans two months
+            month = (rows[0][1].year, rows[0][1].month)
+            rows = [row for row in rows if (row[1].year, row[1].month) == month]
+            archived += archive_batch(db, survey_key, rows)
+            segments += 1
+            position = (rows[-1][1], bytes(rows[-1][0]))
+    finally:
+        cursor.close()
+
+def fold_archived_stats(cursor, survey_key):
+    """
+    Add a survey's archived responses to its summary rows, like
+    analytics.REBUILD_*_QUERY do for the hot ones. Runs in the caller's transaction.
+    """
+    cursor.execute(ARCHIVE_SEGMENTS_QUERY, (survey_key,))
+    segments = survey_segments(cursor.fetchall())
+    if not segments:
+        return
+    cursor.execute(CLOSED_QUESTIONS_QUERY, (survey_key,))
+    closed = {bytes(row[0]) for row in cursor.fetchall()}
+
+    days, values = Counter(), Counter()
+    for _, created_at, answers in archived_responses(segments):
+        days[created_at.date()] += 1
+        for question_id, answer in answers.items():
+            if question_id in closed and answer is not None:
+                values[question_id, answer[:ANSWER_VALUE_LENGTH].strip(' ').lower()] += 1
+
+    if days:
+        placeholders, params = multi_row_values(
+            "(%s, %s, %s)", [(survey_key, day, count) for day, count in days.items()]
+        )
+        cursor.execute(FOLD_DAILY_QUERY.format(placeholders=placeholders), params)
+    if values:
+        placeholders, params = multi_row_values(
+            "(%s, %s, %s)", [(question_id, value, count) for (question_id, value), count in values.items()]
+        )
+        cursor.execute(FOLD_ANSWERS_QUERY.format(placeholders=placeholders), params)
+
+def run_archival(cutoff=None, survey_keys=None):
+    """
+    Archive every survey's (or just survey_keys') responses created before
+    cutoff (default: archive_cutoff()). Returns (responses, segments), or
+    None if another process holds the archive lock.
+    """
+    cutoff = cutoff or archive_cutoff()
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (ARCHIVE_LOCK_NAME,))
+        if not cursor.fetchall()[0][0]:
+            return None
+        try:
+            if survey_keys is None:
+                cursor.execute("SELECT id FROM surveys ORDER BY created_at, id")
+                survey_keys = [bytes(row[0]) for row in cursor.fetchall()]
+                db.commit()
+            archived, segments = 0, 0
+            for survey_key in survey_keys:
+                survey_archived, survey_segments_written = archive_survey(db, survey_key, cutoff)
+                archived += survey_archived
+                segments += survey_segments_written
+                if survey_archived:
+                    logger.info(
+                        "Archived %d responses of survey %s in %d segments",
+                        survey_archived, to_str(survey_key), survey_segments_written
+                    )
+            return archived, segments
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (ARCHIVE_LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        db.close()
+
+
+class Archiver(threading.Thread):
+    """Background thread running the archival job every ARCHIVE_INTERVAL_HOURS"""
+
+    def __init__(self, interval):
+        super().__init__(name='response-archiver', daemon=True)
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.archived = 0
+        self.segments = 0
+        self.failures = 0
+        self.last_run_seconds = 0.0
+        self.last_run_at = None
+
+    def run_once(self):
+        start = time.perf_counter()
+        result = run_archival()
+        if result is not None:
+            self.archived += result[0]
+            self.segments += result[1]
+        self.last_run_seconds = time.perf_counter() - start
+        self.last_run_at = time.time()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as err:
+                # Whatever was committed stays archived; the rest is retried next run
+                self.failures += 1
+                logger.error("Error archiving responses: %s", err)
+
+    def stop(self):
+        self.stopping.set()
+
+
+archiver = None
+
+def start():
+    """Start the background archival job"""
+    global archiver
+    archiver = Archiver(ARCHIVE_INTERVAL_HOURS * 3600)
+    archiver.start()
+    logger.info(
+        "Archiving responses older than %d months to %s every %gh",
+        ARCHIVE_AFTER_MONTHS, ARCHIVE_PATH, ARCHIVE_INTERVAL_HOURS
+    )
+
+def stats():
+    """Responses and segments archived by this process, and the last run's duration"""
+    if archiver is None:
+        return {}
+    return {
+        "archived_total": archiver.archived,
+        "segments_total": archiver.segments,
+        "failures_total": archiver.failures,
+        "last_run_seconds": archiver.last_run_seconds
+    }
@@ -0,0 +1,175 @@
+"""
+Post-processing for finished audio recordings, vectorized with NumPy.
+
+process_recording() reads a PCM WAV file, measures it (duration, RMS
+loudness, share of speech), trims leading and trailing silence found by a
+frame-energy VAD, and writes a mono 16-bit WAV at AUDIO_TARGET_SAMPLE_RATE.
+Everything here is pure computation on files, so it runs in worker
+processes (see audio_worker.py) and in the benchmark without a database.
+"""
+import os
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Sample rate of the compacted copy kept for playback
+AUDIO_TARGET_SAMPLE_RATE = int(os.getenv('AUDIO_TARGET_SAMPLE_RATE', 16000))
+# Frames quieter than this are never speech
+AUDIO_VAD_THRESHOLD_DBFS = float(os.getenv('AUDIO_VAD_THRESHOLD_DBFS', -50))
+# ...nor are frames this far below the loudest frame of the recording
+AUDIO_VAD_DYNAMIC_RANGE_DB = float(os.getenv('AUDIO_VAD_DYNAMIC_RANGE_DB', 35))
+# Silence kept around the first and last speech frame, so words aren't clipped
+AUDIO_VAD_PADDING_SECONDS = float(os.getenv('AUDIO_VAD_PADDING_SECONDS', 0.2))
+# VAD analysis frame length
+VAD_FRAME_SECONDS = 0.02
+# Length of the low-pass filter applied before downsampling
+RESAMPLE_FILTER_TAPS = 63
+# Output samples resampled per step at non-integer ratios (bounds the gathered filter windows to a few MB)
+RESAMPLE_BLOCK = 16384
+# Avoids log10(0) for digital silence
+SILENCE_DBFS = -120.0
+
+SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+class UnsupportedAudio(ValueError):
+    """The recording isn't PCM WAV, the only format decoded here"""
+
+
+def read_pcm(path):
+    """Samples of a PCM WAV file as float32 in [-1, 1], shaped (frames, channels), and the sample rate"""
+    try:
+        with wave.open(path, 'rb') as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise UnsupportedAudio(str(e))
+    if width not in SAMPLE_TYPES:
+        raise UnsupportedAudio(f"{width * 8}-bit samples aren't supported")
+
+    samples = np.frombuffer(raw, dtype=SAMPLE_TYPES[width]).astype(np.float32)
+    if width == 1:
+        # 8-bit WAV is unsigned
+        samples -= 128.0
+    samples /= float(2 ** (8 * width - 1))
+    return samples.reshape(-1, channels), rate
+
+
+def write_pcm(path, samples, rate):
+    """Write mono float samples as a 16-bit PCM WAV file"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype('<i2')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def downmix(samples):
+    """Average the channels into one"""
+    channels = samples.shape[1]
+    if channels == 1:
+        return samples[:, 0]
+    # A matrix-vector product is much faster than mean(axis=1) over interleaved frames
+    return samples @ np.full(channels, 1.0 / channels, dtype=np.float32)
+
+
+def lowpass_taps(cutoff):
+    """Hamming-windowed sinc low-pass filter, cutoff as a fraction of the sample rate"""
+    n = np.arange(RESAMPLE_FILTER_TAPS) - (RESAMPLE_FILTER_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_FILTER_TAPS)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def resample(samples, rate, target_rate):
+    """
+    Resample mono audio. Downsampling low-pass filters at the new Nyquist
+    frequency, so content above it doesn't alias, evaluating the filter only
+    where output samples fall rather than at the full input rate. Upsampling
+    interpolates linearly.
+    """
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    length = int(round(len(samples) * target_rate / rate))
+    if target_rate > rate:
+        positions = np.arange(length, dtype=np.float64) * (rate / target_rate)
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+    taps = lowpass_taps(0.5 * target_rate / rate)
+    # One more trailing zero so the sample after the last position always exists
+    padded = np.pad(samples, (len(taps) // 2, len(taps) // 2 + 1))
+    # Filter window around every input sample: a strided view, nothing copied
+    windows = sliding_window_view(padded, len(taps))
+    if rate % target_rate == 0:
+        return np.einsum('ij,j->i', windows[:len(samples):rate // target_rate], taps)
+
+    # Other ratios: filter the two input samples around each output position and interpolate
+    resampled = np.empty(length, dtype=np.float32)
+    for start in range(0, length, RESAMPLE_BLOCK):
+        positions = np.arange(start, min(length, start + RESAMPLE_BLOCK), dtype=np.float64) * (rate / target_rate)
+        index = positions.astype(np.intp)
+        before = windows[index] @ taps
+        after = windows[index + 1] @ taps
+        resampled[start:start + len(index)] = before + (positions - index) * (after - before)
+    return resampled
+
+
+def frame_levels(samples, frame_length):
+    """RMS level of each whole frame in dBFS"""
+    frames = len(samples) // frame_length
+    if frames == 0:
+        return np.empty(0, dtype=np.float32)
+    blocks = samples[:frames * frame_length].reshape(frames, frame_length)
+    power = np.einsum('ij,ij->i', blocks, blocks) / frame_length
+    return 10.0 * np.log10(np.maximum(power, 10 ** (SILENCE_DBFS / 10)))
+
+
+def speech_frames(levels):
+    """Frame-energy VAD: frames loud in absolute terms and relative to the recording's loudest frame"""
+    if len(levels) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(AUDIO_VAD_THRESHOLD_DBFS, float(levels.max()) - AUDIO_VAD_DYNAMIC_RANGE_DB)
+    return levels >= threshold
+
+
+def rms_dbfs(samples):
+    if len(samples) == 0:
+        return SILENCE_DBFS
+    power = float(np.dot(samples, samples)) / len(samples)
+    return max(SILENCE_DBFS, 10.0 * float(np.log10(power))) if power > 0 else SILENCE_DBFS
+
+
+def process_recording(source_path, output_path):
+    """
+    Measure, trim and compact one recording. Returns its metadata:
+    duration_seconds (original), speech_seconds (after trimming), speech_ratio
+    (share of VAD frames that are speech), rms_dbfs (of the trimmed audio)
+    and processed_bytes. Raises UnsupportedAudio for anything but PCM WAV.
+    """
+    samples, rate = read_pcm(source_path)
+    duration = len(samples) / rate
+    mono = resample(downmix(samples), rate, AUDIO_TARGET_SAMPLE_RATE)
+    rate = AUDIO_TARGET_SAMPLE_RATE
+
+    frame_length = max(1, int(rate * VAD_FRAME_SECONDS))
+    speech = speech_frames(frame_levels(mono, frame_length))
+    speaking = np.flatnonzero(speech)
+    if len(speaking):
+        padding = int(rate * AUDIO_VAD_PADDING_SECONDS)
+        start = max(0, speaking[0] * frame_length - padding)
+        end = min(len(mono), (speaking[-1] + 1) * frame_length + padding)
+        trimmed = mono[start:end]
+    else:
+        trimmed = mono[:0]
+
+    write_pcm(output_path, trimmed, rate)
+    return {
+        "duration_seconds": duration,
+        "speech_seconds": len(trimmed) / rate,
+        "speech_ratio": float(speech.mean()) if len(speech) else 0.0,
+        "rms_dbfs": rms_dbfs(trimmed),
+        "processed_bytes": os.path.getsize(output_path)
+    }
@@ -0,0 +1,171 @@
+import fcntl
+import hashlib
+import mimetypes
+import os
+import shutil
+
+# Where uploads in progress and finished recordings are kept
+AUDIO_STORAGE_PATH = os.getenv('AUDIO_STORAGE_PATH', 'audio')
+# Request body is read and written in blocks of this size, so memory stays flat
+READ_BLOCK_SIZE = 64 * 1024
+
+# Formats browsers' MediaRecorder produces, which mimetypes doesn't all know
+AUDIO_EXTENSIONS = {
+    'audio/webm': '.webm',
+    'audio/ogg': '.ogg',
+    'audio/mp4': '.m4a',
+    'audio/mpeg': '.mp3',
+    'audio/wav': '.wav'
+}
+
+
+class UploadBusy(Exception):
+    """Another request is writing a chunk of the same upload"""
+
+
+class ChunkRejected(ValueError):
+    """The chunk body was truncated or failed its checksum; nothing was appended"""
+
+
+class AudioStore:
+    """
+    On-disk storage for chunked audio uploads.
+
+    Each upload is a `<id>.part` file under `uploads/` whose size is the
+    resume offset. A chunk is streamed to a scratch file first, checked, then
+    appended to the part file in-kernel (copy_file_range), so a failed or
+    interrupted chunk never corrupts what was already received. A finished
+    upload is moved to `recordings/`, next to the trimmed copy made by
+    audio_worker.py.
+    """
+
+    def __init__(self, root):
+        self.uploads = os.path.join(root, 'uploads')
+        self.recordings = os.path.join(root, 'recordings')
+        os.makedirs(self.uploads, exist_ok=True)
+        os.makedirs(self.recordings, exist_ok=True)
+
+    def part_path(self, upload_id):
+        return os.path.join(self.uploads, f'{upload_id}.part')
+
+    def recording_path(self, upload_id, extension):
+        return os.path.join(self.recordings, f'{upload_id}{extension}')
+
+    def processed_path(self, upload_id):
+        return os.path.join(self.recordings, f'{upload_id}.trimmed.wav')
+
+    def offset(self, upload_id):
+        """Bytes received so far"""
+        try:
+            return os.path.getsize(self.part_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def write_chunk(self, upload_id, offset, stream, length, expected_sha256=None):
+        """
+        Append `length` bytes read from stream at `offset`. Returns the new offset.
+        Raises ValueError if offset isn't the current end of the upload,
+        ChunkRejected for a short body or checksum mismatch, UploadBusy if another
+        request holds the upload.
+        """
+        fd = os.open(self.part_path(upload_id), os.O_WRONLY | os.O_CREAT, 0o640)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadBusy(upload_id)
+
+            current = os.fstat(fd).st_size
+            if offset != current:
+                raise ValueError(f"Chunk starts at {offset}, expected {current}")
+
+            scratch_path = os.path.join(self.uploads, f'{upload_id}.chunk')
+            try:
+                with open(scratch_path, 'w+b') as scratch:
+                    digest = hashlib.sha256()
+                    received = 0
+                    while received < length:
+                        block = stream.read(min(READ_BLOCK_SIZE, length - received))
+                        if not block:
+                            break
+                        digest.update(block)
+                        scratch.write(block)
+                        received += len(block)
+                    if received != length:
+                        raise ChunkRejected(f"Chunk body ended after {received} of {length} bytes")
+                    if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+                        raise ChunkRejected("Chunk checksum mismatch")
+
+                    scratch.flush()
+                    append_file(scratch.fileno(), fd, current, length)
+                    os.fsync(fd)
+            finally:
+                if os.path.exists(scratch_path):
+                    os.remove(scratch_path)
+            return current + length
+        finally:
+            os.close(fd)
+
+    def finish(self, upload_id, extension):
+        """Checksum the completed upload and move it into recordings; returns (sha256, path)"""
+        part_path = self.part_path(upload_id)
+        sha256 = file_sha256(part_path)
+        path = self.recording_path(upload_id, extension)
+        os.replace(part_path, path)
+        return sha256, path
+
+    def finished(self, upload_id, extension):
+        """Whether the upload was already moved into recordings by finish()"""
+        return os.path.exists(self.recording_path(upload_id, extension))
+
+    def discard(self, upload_id):
+        """Drop everything received for an upload, so it restarts from offset 0"""
+        try:
+            os.remove(self.part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+
+def recording_extension(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return AUDIO_EXTENSIONS.get(media_type) or mimetypes.guess_extension(media_type) or '.audio'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(READ_BLOCK_SIZE * 16)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def append_file(src_fd, dst_fd, dst_offset, length):
+    """Copy length bytes from the start of src_fd to dst_fd at dst_offset without going through user space"""
+    copied = 0
+    try:
+        while copied < length:
+            written = os.copy_file_range(src_fd, dst_fd, length - copied, copied, dst_offset + copied)
+            if written == 0:
+                break
+            copied += written
+    except (AttributeError, OSError):
+        # No copy_file_range on this platform or filesystem: fall back to a buffered copy
+        copied = 0
+    if copied < length:
+        # fdopen doesn't truncate; the duplicated descriptors share the originals' positions
+        with os.fdopen(os.dup(src_fd), 'rb') as src, os.fdopen(os.dup(dst_fd), 'wb') as dst:
+            src.seek(copied)
+            dst.seek(dst_offset + copied)
+            shutil.copyfileobj(src, dst, READ_BLOCK_SIZE)
+
+
+store = None
+
+def get_store():
+    global store
+    if store is None:
+        store = AudioStore(AUDIO_STORAGE_PATH)
+    return store
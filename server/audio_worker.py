@@ -0,0 +1,183 @@
+import logging
+import os
+import queue
+import threading
+
+from audio_store import get_store, recording_extension
+from database import get_db_connection
+from keys import parse_id, to_str
+
+logger = logging.getLogger(__name__)
+
+# Processes trimming and measuring finished recordings (0 disables post-processing)
+AUDIO_PROCESSING_WORKERS = int(os.getenv('AUDIO_PROCESSING_WORKERS', 0))
+
+# Finished recordings not processed yet, e.g. completed while the server was down
+PENDING_RECORDINGS_QUERY = """
+    SELECT id, content_type
+    FROM audio_uploads
+    WHERE status = 'complete' AND processing_status IS NULL
+    ORDER BY completed_at
+"""
+
+SAVE_PROCESSING_QUERY = """
+    UPDATE audio_uploads
+    SET processing_status = %s, duration_seconds = %s, speech_seconds = %s,
+        speech_ratio = %s, rms_dbfs = %s, processed_bytes = %s, processed_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+def enabled():
+    return AUDIO_PROCESSING_WORKERS > 0
+
+
+def save_result(upload_key, status, metadata):
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute(SAVE_PROCESSING_QUERY, (
+            status,
+            metadata.get('duration_seconds'),
+            metadata.get('speech_seconds'),
+            metadata.get('speech_ratio'),
+            metadata.get('rms_dbfs'),
+            metadata.get('processed_bytes'),
+            upload_key
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+
+class AudioProcessor:
+    """
+    Runs audio_processing.process_recording for finished recordings in a
+    process pool, so the NumPy work never holds the serving process's GIL. Results are written back to
+    audio_uploads by one thread; a recording whose result never made it to
+    MySQL keeps processing_status NULL and is picked up again by
+    submit_pending() on the next start.
+    """
+
+    def __init__(self, workers):
+        # NumPy is only needed once processing is enabled (requirements-audio.txt);
+        # importing it here means the forked workers start with it loaded
+        from audio_processing import process_recording, UnsupportedAudio
+        self.process_recording = process_recording
+        self.unsupported_error = UnsupportedAudio
+        # The process pool machinery is only loaded when processing is enabled
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        self.broken_pool_error = BrokenProcessPool
+
+        # fork rather than spawn, which would re-import the app module (and
+        # re-run its startup) in every worker. All workers are launched by the
+        # first submit, so create this before the server starts other threads.
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        self.executor.submit(int).result()
+        self.workers = workers
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.counts = {'processed': 0, 'unsupported': 0, 'failed': 0}
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+        self.results = queue.Queue()
+        self.writer = threading.Thread(target=self.write_results, name='audio-results', daemon=True)
+        self.writer.start()
+
+    def submit(self, upload_id, content_type):
+        """Queue one finished recording (upload_id as its string id)"""
+        store = get_store()
+        source = store.recording_path(upload_id, recording_extension(content_type))
+        output = store.processed_path(upload_id)
+        try:
+            future = self.executor.submit(self.process_recording, source, output + '.tmp')
+        except self.broken_pool_error as err:
+            # A worker died (e.g. killed for memory); the recording stays unprocessed until the next start
+            logger.error("Audio processing pool unavailable, recording %s not queued: %s", upload_id, err)
+            return
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(lambda done: self.results.put((upload_id, output, done)))
+
+    def submit_pending(self):
+        """Queue every finished recording without a processing result; returns how many"""
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute(PENDING_RECORDINGS_QUERY)
+            pending = cursor.fetchall()
+        finally:
+            cursor.close()
+            db.close()
+        for upload_key, content_type in pending:
+            self.submit(to_str(bytes(upload_key)), content_type)
+        return len(pending)
+
+    def write_results(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            upload_id, output, future = item
+            metadata = {}
+            try:
+                metadata = future.result()
+                os.replace(output + '.tmp', output)
+                status = 'processed'
+            except self.unsupported_error as err:
+                logger.info("Recording %s not processed: %s", upload_id, err)
+                status = 'unsupported'
+            except Exception as err:
+                logger.error("Error processing recording %s: %s", upload_id, err)
+                status = 'failed'
+
+            try:
+                save_result(parse_id(upload_id), status, metadata)
+            except Exception as err:
+                # Left unprocessed in MySQL, so it is retried on the next start
+                logger.error("Error saving processing result for recording %s: %s", upload_id, err)
+            with self._lock:
+                self.counts[status] += 1
+                self.audio_seconds += metadata.get('duration_seconds', 0.0)
+                self.speech_seconds += metadata.get('speech_seconds', 0.0)
+
+    def close(self):
+        """Finish everything queued, then stop the workers and the result writer"""
+        self.executor.shutdown(wait=True)
+        self.results.put(None)
+        self.writer.join()
+
+    def stats(self):
+        with self._lock:
+            done = sum(self.counts.values())
+            return {
+                "workers": self.workers,
+                "queued": self.submitted - done,
+                **{f'{status}_total': count for status, count in self.counts.items()},
+                "audio_seconds_total": self.audio_seconds,
+                "speech_seconds_total": self.speech_seconds
+            }
+
+
+processor = None
+
+def start(workers=None):
+    """Start the worker pool and queue recordings left unprocessed by a previous run"""
+    global processor
+    processor = AudioProcessor(workers or AUDIO_PROCESSING_WORKERS)
+    pending = processor.submit_pending()
+    logger.info("Audio processing with %d workers (%d recordings pending)", processor.workers, pending)
+    return processor
+
+def submit(upload_id, content_type):
+    processor.submit(upload_id, content_type)
+
+def stats():
+    if processor is None:
+        return {"workers": 0}
+    return processor.stats()
@@ -0,0 +1,120 @@
+"""
+Public endpoints under a flood from one client, with and without admission
+control.
+
+--flooders threads, all from one IP address, post responses and fetch the
+survey as fast as they can, while --clients threads, each from its own IP,
+submit one response every --think seconds. The first run has rate limits and
+the concurrency limiter switched off, the second uses the configured ones.
+Per-IP limits are off by default, so set them for the run to see the
+flooder throttled on its own.
+Reports status codes per group, the well-behaved clients' latency, and
+whether the connection pool ran out (checkout timeouts end in a 503 only
+after DB_POOL_TIMEOUT seconds, which is what admission control avoids).
+
+Usage (from the server directory):
+    RATE_LIMIT_SUBMIT_PER_IP=1,10 RATE_LIMIT_READ_PER_IP=10,50 \
+        python -m benchmarks.admission_flood --flooders 64 --clients 8 --seconds 10
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+import admission
+import database
+from app import app
+from keys import to_str
+from benchmarks.common import UnlimitedBuckets, percentile, seed_survey, seed_user
+
+BENCH_USER_ID = 'bench-admission-user'
+FLOOD_IP = '203.0.113.1'
+
+
+def run(survey_id, question_ids, flooders, clients, think, seconds):
+    """Flood and well-behaved traffic together; returns (flood statuses, client statuses, client latencies ms)"""
+    payload = {'answers': {question_id: 'yes' for question_id in question_ids}}
+    stop = threading.Event()
+    flood_statuses, client_statuses = Counter(), Counter()
+    client_latencies = []
+    lock = threading.Lock()
+
+    def flooder():
+        client = app.test_client()
+        environ = {'REMOTE_ADDR': FLOOD_IP}
+        statuses = Counter()
+        while not stop.is_set():
+            statuses[client.post(f'/api/survey/{survey_id}', json=payload, environ_base=environ).status_code] += 1
+            statuses[client.get(f'/api/survey/{survey_id}', environ_base=environ).status_code] += 1
+        with lock:
+            flood_statuses.update(statuses)
+
+    def well_behaved(index):
+        client = app.test_client()
+        environ = {'REMOTE_ADDR': f'198.51.100.{index + 1}'}
+        statuses = Counter()
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            statuses[client.post(f'/api/survey/{survey_id}', json=payload, environ_base=environ).status_code] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            stop.wait(think)
+        with lock:
+            client_statuses.update(statuses)
+            client_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=flooder) for _ in range(flooders)]
+    threads += [threading.Thread(target=well_behaved, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return flood_statuses, client_statuses, sorted(client_latencies)
+
+
+def format_statuses(statuses):
+    return ' '.join(f'{status}:{count}' for status, count in sorted(statuses.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flooders', type=int, default=64)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--think', type=float, default=1.0, help='seconds between a client\'s submissions')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--questions', type=int, default=10)
+    args = parser.parse_args()
+
+    db = database.get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    # One survey per run, so the per-survey bucket starts full each time
+    surveys = [seed_survey(db, BENCH_USER_ID, args.questions) for _ in range(2)]
+    db.close()
+
+    configurations = [
+        ('no admission control', UnlimitedBuckets(), None),
+        ('admission control', admission.bucket_store, admission.limiter),
+    ]
+    print(f"{args.flooders} flooding threads from one IP, {args.clients} clients submitting every {args.think}s")
+    for (name, bucket_store, limiter), (survey_key, question_keys) in zip(configurations, surveys):
+        admission.bucket_store, admission.limiter = bucket_store, limiter
+        failures_before = database.pool_stats()['checkout_failures']
+        flood_statuses, client_statuses, latencies = run(
+            to_str(survey_key), [to_str(key) for key in question_keys],
+            args.flooders, args.clients, args.think, args.seconds
+        )
+        pool_timeouts = database.pool_stats()['checkout_failures'] - failures_before
+        print(f"\n{name}")
+        print(f"  flood statuses:  {format_statuses(flood_statuses)}")
+        print(f"  client statuses: {format_statuses(client_statuses)}")
+        print(
+            f"  client latency:  p50 {percentile(latencies, 0.50):.1f}ms  p95 {percentile(latencies, 0.95):.1f}ms  "
+            f"p99 {percentile(latencies, 0.99):.1f}ms"
+        )
+        print(f"  pool checkout timeouts: {pool_timeouts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Search latency over a survey's answers at scale (1M answers by default).
+
+Seeds one survey with --answers free-text answers drawn from a Zipf-like
+vocabulary, with topic words planted at known rates (rare, medium, common),
+then times GET /api/survey/{id}/search through the Flask test client: the
+first page, and a page --depth cursors in. For comparison, the same lookup as
+a LIKE '%word%' scan of the survey's answers, which is what filtering without
+the index amounts to, run --scan-repeat times.
+
+Usage (from the server directory):
+    python -m benchmarks.answer_search --answers 1000000 --queries 50
+"""
+import argparse
+import random
+import time
+
+BENCH_USER_ID = 'bench-search-user'
+
+# word, fraction of answers mentioning it
+TOPICS = [('refund', 0.001), ('battery', 0.01), ('shipping', 0.1)]
+VOCABULARY_SIZE = 5000
+WORDS_PER_ANSWER = (8, 40)
+
+LIKE_SCAN_QUERY = """
+    SELECT a.id, a.response_id
+    FROM answers a
+    JOIN questions q ON q.id = a.question_id
+    WHERE q.survey_id = %s AND a.answer LIKE %s
+    LIMIT %s
+"""
+
+
+def answer_text(rng, vocabulary, weights):
+    words = rng.choices(vocabulary, weights, k=rng.randint(*WORDS_PER_ANSWER))
+    for topic, rate in TOPICS:
+        if rng.random() < rate:
+            words.insert(rng.randrange(len(words) + 1), topic)
+    return ' '.join(words)
+
+
+def timed(fetch, count):
+    """Sorted latencies in ms of count calls"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fetch()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--answers', type=int, default=1000000)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=50, help='timed searches per word and page')
+    parser.add_argument('--depth', type=int, default=5, help='page reached by following next_cursor')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--scan-repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import app
+    from database import get_db_connection
+    from keys import to_str
+    from benchmarks.common import install_test_signer, issue_token, percentile, seed_responses, seed_survey, seed_user
+
+    rng = random.Random(args.seed)
+    vocabulary = [f'w{i}' for i in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+
+    db = get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    survey_key, question_keys = seed_survey(db, BENCH_USER_ID, args.questions)
+    seed_start = time.perf_counter()
+    seed_responses(
+        db, survey_key, question_keys, args.answers // args.questions,
+        answer=lambda i, q: answer_text(rng, vocabulary, weights)
+    )
+    print(f"seeded {args.answers} answers in {time.perf_counter() - seed_start:.0f}s")
+    survey_id = to_str(survey_key)
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {issue_token(install_test_signer(), BENCH_USER_ID)}'}
+
+    def search(word, cursor=None):
+        url = f'/api/survey/{survey_id}/search?q={word}&limit={args.limit}'
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    print(f"{'word':<10} {'answers':>8} {'page':>5} {'p50 ms':>8} {'p95 ms':>8} {'LIKE scan ms':>13}")
+    cursor = db.cursor()
+    for word, rate in TOPICS:
+        # Cursor for the page at --depth, if there are that many hits
+        deep_cursor = None
+        for _ in range(args.depth - 1):
+            deep_cursor = search(word, deep_cursor)['next_cursor']
+            if deep_cursor is None:
+                break
+
+        scan = timed(lambda: (cursor.execute(LIKE_SCAN_QUERY, (survey_key, f'%{word}%', args.limit)), cursor.fetchall()), args.scan_repeat)
+        first = timed(lambda: search(word), args.queries)
+        print(
+            f"{word:<10} {int(args.answers * rate):>8} {1:>5} {percentile(first, 0.50):>8.1f} "
+            f"{percentile(first, 0.95):>8.1f} {percentile(scan, 0.50):>13.1f}"
+        )
+        if deep_cursor:
+            deep = timed(lambda: search(word, deep_cursor), args.queries)
+            print(f"{word:<10} {'':>8} {args.depth:>5} {percentile(deep, 0.50):>8.1f} {percentile(deep, 0.95):>8.1f}")
+    cursor.close()
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Concurrent submissions: threaded Flask versus the asyncio serving mode.
+
+Serves each mode in its own subprocess (werkzeug's threaded server for app.py,
+hypercorn for aio.app) and posts survey responses from an asyncio client at
+increasing numbers of in-flight requests. Reports throughput, latency, errors,
+the server's peak RSS and thread count, and RSS growth per in-flight request.
+
+Needs the async extras (pip install -r requirements-async.txt).
+
+Usage (from the server directory):
+    python -m benchmarks.async_concurrency --concurrency 50 200 1000 --requests 5000
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+BENCH_USER_ID = 'bench-async-user'
+
+
+def serve(mode, port):
+    """Child process: serve one mode until killed"""
+    from benchmarks.common import disable_admission_control
+    if mode == 'threaded':
+        from werkzeug.serving import make_server
+        from app import app
+        disable_admission_control()
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+    else:
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from hypercorn.config import Config
+        from aio.app import app
+        disable_admission_control()
+        config = Config()
+        config.bind = [f'127.0.0.1:{port}']
+        config.backlog = 4096
+        asyncio.run(hypercorn_serve(app, config))
+
+
+def process_status(pid):
+    """(RSS in KB, thread count) from /proc"""
+    values = {}
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            values[key] = value.split()
+    return int(values['VmRSS'][0]), int(values['Threads'][0])
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} didn't start")
+
+
+async def drive(url, payload, requests_count, concurrency, pid):
+    """Keep `concurrency` submissions in flight; returns latencies, errors, wall time and peaks"""
+    import httpx
+
+    latencies = []
+    errors = 0
+    peak = [0, 0]
+    remaining = iter(range(requests_count))
+
+    async def sample():
+        while True:
+            rss, threads = process_status(pid)
+            peak[0] = max(peak[0], rss)
+            peak[1] = max(peak[1], threads)
+            await asyncio.sleep(0.05)
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        sampler = asyncio.create_task(sample())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+        sampler.cancel()
+    return sorted(latencies), errors, wall, peak
+
+
+def run(modes, concurrency_levels, requests_count, port):
+    from database import get_db_connection
+    from keys import to_str
+    from benchmarks.common import percentile, seed_survey, seed_user
+
+    db = get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    survey_key, question_keys = seed_survey(db, BENCH_USER_ID, 20)
+    db.close()
+    url = f'http://127.0.0.1:{port}/api/survey/{to_str(survey_key)}'
+    payload = {'answers': {to_str(question_key): 'yes' for question_key in question_keys}}
+
+    print(
+        f"{'mode':<9} {'in-flight':>9} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} "
+        f"{'peak RSS MB':>11} {'KB/in-flight':>12} {'threads':>7}"
+    )
+    for mode in modes:
+        server = subprocess.Popen([sys.executable, '-m', 'benchmarks.async_concurrency', '--serve', mode, str(port)])
+        try:
+            wait_for_port(port)
+            idle_kb, _ = process_status(server.pid)
+            for concurrency in concurrency_levels:
+                latencies, errors, wall, (peak_kb, threads) = asyncio.run(
+                    drive(url, payload, requests_count, concurrency, server.pid)
+                )
+                print(
+                    f"{mode:<9} {concurrency:>9} {requests_count / wall:>7.0f} "
+                    f"{percentile(latencies, 0.50):>8.1f} {percentile(latencies, 0.99):>8.1f} {errors:>6} "
+                    f"{peak_kb / 1024:>11.1f} {(peak_kb - idle_kb) / concurrency:>12.1f} {threads:>7}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['threaded', 'async'], choices=['threaded', 'async'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--requests', type=int, default=5000, help='submissions per concurrency level')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--serve', nargs=2, metavar=('MODE', 'PORT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve[0], int(args.serve[1]))
+    else:
+        run(args.modes, args.concurrency, args.requests, args.port)
@@ -0,0 +1,127 @@
+"""
+Audio post-processing throughput, in audio-seconds per CPU-second.
+
+Synthesizes speech-like PCM WAV recordings with leading and trailing
+silence, then runs audio_processing.process_recording over all of them
+in-process (workers 0) and in a process pool of each size given. CPU time is
+the processing processes' user + system time, so audio-s/CPU-s measures the
+per-core cost and audio-s/wall-s the throughput of the whole pool. Also
+reports the share of audio kept after trimming and the stored size relative
+to the upload. Needs NumPy (pip install -r requirements-audio.txt) but no
+database.
+
+Usage (from the server directory):
+    python -m benchmarks.audio_throughput --recordings 64 --seconds 30 --workers 0 1 2 4
+    python -m benchmarks.audio_throughput --rate 48000 --channels 2   # exercise downmix and resampling
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_processing import process_recording, write_pcm
+
+
+def synthesize(path, seconds, rate, channels, rng):
+    """
+    A recording of `seconds`: quiet room noise, then syllable-rate modulated
+    voiced sound with short pauses, then noise again (each silence 10-25%)
+    """
+    length = int(seconds * rate)
+    lead = int(length * rng.uniform(0.10, 0.25))
+    tail = int(length * rng.uniform(0.10, 0.25))
+    voiced = length - lead - tail
+
+    t = np.arange(voiced) / rate
+    pitch = rng.uniform(90, 220)
+    voice = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t), 0, None) ** 0.5
+    # A pause of about half a second every few seconds
+    envelope *= (np.sin(2 * np.pi * t / rng.uniform(3, 6)) > -0.85)
+    signal = np.concatenate([np.zeros(lead), 0.3 * voice * envelope, np.zeros(tail)])
+    signal += rng.normal(0, 10 ** (-65 / 20), length)
+    signal = signal.astype(np.float32)
+
+    if channels == 1:
+        write_pcm(path, signal, rate)
+        return
+    # Interleaved multi-channel 16-bit WAV, channels differing slightly in level
+    frames = np.stack([signal * (1 - 0.1 * c) for c in range(channels)], axis=1)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(frames, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_once(jobs, workers):
+    """Process every (source, output) job; returns (wall seconds, CPU seconds, metadata list)"""
+    if workers == 0:
+        cpu_before = cpu_seconds(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        results = [process_recording(source, output) for source, output in jobs]
+        return time.perf_counter() - start, cpu_seconds(resource.RUSAGE_SELF) - cpu_before, results
+
+    # Worker CPU time is counted once they exit and are reaped, after shutdown()
+    cpu_before = cpu_seconds(resource.RUSAGE_CHILDREN)
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+    executor.submit(int).result()
+    start = time.perf_counter()
+    results = list(executor.map(process_recording, *zip(*jobs)))
+    wall = time.perf_counter() - start
+    executor.shutdown(wait=True)
+    return wall, cpu_seconds(resource.RUSAGE_CHILDREN) - cpu_before, results
+
+
+def run(recordings, seconds, rate, channels, worker_counts):
+    directory = tempfile.mkdtemp(prefix='audio-bench-')
+    try:
+        rng = np.random.default_rng(7)
+        sources = []
+        for i in range(recordings):
+            path = os.path.join(directory, f'{i}.wav')
+            synthesize(path, seconds, rate, channels, rng)
+            sources.append(path)
+        uploaded_bytes = sum(os.path.getsize(path) for path in sources)
+        jobs = [(source, source + '.trimmed.wav') for source in sources]
+        print(f"{recordings} recordings x {seconds}s, {rate} Hz, {channels} channel(s), {uploaded_bytes / 1e6:.1f} MB")
+
+        print(
+            f"{'workers':>7} {'wall s':>7} {'CPU s':>7} {'audio-s/CPU-s':>13} {'audio-s/wall-s':>14} "
+            f"{'speech ratio':>12} {'kept':>6} {'stored/uploaded':>15}"
+        )
+        for workers in worker_counts:
+            wall, cpu, results = run_once(jobs, workers)
+            audio = sum(result['duration_seconds'] for result in results)
+            kept = sum(result['speech_seconds'] for result in results)
+            stored = sum(result['processed_bytes'] for result in results)
+            ratio = sum(result['speech_ratio'] for result in results) / len(results)
+            print(
+                f"{workers:>7} {wall:>7.2f} {cpu:>7.2f} {audio / cpu:>13.0f} {audio / wall:>14.0f} "
+                f"{ratio:>12.2f} {kept / audio:>6.0%} {stored / uploaded_bytes:>15.0%}"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recordings', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=30, help='length of each recording')
+    parser.add_argument('--rate', type=int, default=16000, help='sample rate of the uploaded recordings')
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4], help='pool sizes (0: in-process)')
+    args = parser.parse_args()
+    run(args.recordings, args.seconds, args.rate, args.channels, args.workers)
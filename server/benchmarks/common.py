@@ -0,0 +1,142 @@
+"""
+Shared helpers for the benchmarks: data seeding, a local token signer,
+server-side statement counting and switching off admission control.
+"""
+import sys
+import time
+
+import rsa
+from google.auth import crypt, jwt
+
+import google_auth
+from database import multi_row_values
+from keys import new_id
+
+# Rows per multi-row INSERT when seeding
+SEED_BATCH_SIZE = 1000
+TEST_KEY_ID = 'benchmark-key'
+
+
+def server_questions(cursor):
+    """Number of statements the server has executed so far (global `Questions` counter)"""
+    cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+    row = cursor.fetchone()
+    return int(row['Value'] if isinstance(row, dict) else row[1])
+
+
+def install_test_signer():
+    """
+    Switch token verification to a freshly generated local key and return a
+    signer for issuing ID tokens with issue_token()
+    """
+    public_key, private_key = rsa.newkeys(2048)
+    google_auth.set_test_certs({TEST_KEY_ID: public_key.save_pkcs1().decode('ascii')})
+    return crypt.RSASigner.from_string(private_key.save_pkcs1().decode('ascii'), key_id=TEST_KEY_ID)
+
+
+def issue_token(signer, user_id, lifetime=3600):
+    """Sign an ID token for user_id that the test key set accepts"""
+    now = int(time.time())
+    payload = {
+        'iss': 'https://accounts.google.com',
+        'aud': google_auth.CLIENT_ID,
+        'sub': user_id,
+        'email': f'{user_id}@example.com',
+        'name': f'Benchmark {user_id}',
+        'iat': now,
+        'exp': now + lifetime
+    }
+    return jwt.encode(signer, payload).decode('ascii')
+
+
+def seed_user(db, user_id):
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        INSERT IGNORE INTO users (google_user_id, email, name)
+        VALUES (%s, %s, %s)
+        """,
+        (user_id, f'{user_id}@example.com', f'Benchmark {user_id}')
+    )
+    db.commit()
+    cursor.close()
+
+
+def seed_survey(db, user_id, question_count, system_prompt='Benchmark'):
+    """Create a survey with question_count questions, returning (survey_key, question_keys)"""
+    cursor = db.cursor()
+    survey_id = new_id()
+    cursor.execute(
+        """
+        INSERT INTO surveys (id, user_id, title, system_prompt)
+        VALUES (%s, %s, %s, %s)
+        """,
+        (survey_id, user_id, f'Benchmark survey ({question_count} questions)', system_prompt)
+    )
+    question_ids = [new_id() for _ in range(question_count)]
+    placeholders, params = multi_row_values(
+        "(%s, %s, %s, %s)",
+        [(question_id, survey_id, f'Question {i}', i % 2 == 1) for i, question_id in enumerate(question_ids)]
+    )
+    cursor.execute(
+        f"INSERT INTO questions (id, survey_id, question, elaborate) VALUES {placeholders}",
+        params
+    )
+    db.commit()
+    cursor.close()
+    return survey_id, question_ids
+
+
+def seed_responses(db, survey_id, question_ids, count, answer=lambda i, q: 'yes' if (i + q) % 2 else 'no'):
+    """Insert count responses answering every question, in SEED_BATCH_SIZE-row statements"""
+    cursor = db.cursor()
+    responses_per_batch = max(1, SEED_BATCH_SIZE // max(1, len(question_ids)))
+    for start in range(0, count, responses_per_batch):
+        response_rows, answer_rows = [], []
+        for i in range(start, min(count, start + responses_per_batch)):
+            response_id = new_id()
+            response_rows.append((response_id, survey_id))
+            for q, question_id in enumerate(question_ids):
+                answer_rows.append((new_id(), response_id, question_id, answer(i, q)))
+
+        placeholders, params = multi_row_values("(%s, %s)", response_rows)
+        cursor.execute(f"INSERT INTO responses (id, survey_id) VALUES {placeholders}", params)
+        placeholders, params = multi_row_values("(%s, %s, %s, %s)", answer_rows)
+        cursor.execute(
+            f"INSERT INTO answers (id, response_id, question_id, answer) VALUES {placeholders}",
+            params
+        )
+        db.commit()
+    cursor.close()
+
+
+class UnlimitedBuckets:
+    """Rate limit bucket store that never refuses"""
+
+    def take(self, key, limit):
+        return 0.0
+
+    def stats(self):
+        return {}
+
+
+def disable_admission_control():
+    """
+    Turn off rate limits and the concurrency limiter (threaded and async
+    mode), so a benchmark driving one endpoint hard measures the endpoint
+    """
+    import admission
+    admission.bucket_store = UnlimitedBuckets()
+    admission.limiter = None
+    aio_admission = sys.modules.get('aio.admission')
+    if aio_admission is not None:
+        aio_admission.limiter = None
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
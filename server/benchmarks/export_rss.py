@@ -0,0 +1,84 @@
+"""
+Peak RSS of the streaming export versus response count.
+
+Seeds one survey per response count, then exports each one in a fresh
+subprocess (so peak RSS isn't shared between runs) through the Flask test
+client, consuming the body chunk by chunk like a real client would.
+
+Usage (from the server directory):
+    python -m benchmarks.export_rss --counts 1000 10000 100000 --questions 10
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+BENCH_USER_ID = 'bench-export-user'
+
+
+def export_once(survey_id, export_format):
+    """Child process: run one export and report peak RSS, bytes and time"""
+    from app import app
+    from benchmarks.common import install_test_signer, issue_token
+
+    token = issue_token(install_test_signer(), BENCH_USER_ID)
+    client = app.test_client()
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    response = client.get(
+        f'/api/survey/{survey_id}/export?format={export_format}',
+        headers={'Authorization': f'Bearer {token}'},
+        buffered=False
+    )
+    assert response.status_code == 200, response.get_data()
+    total_bytes = 0
+    for chunk in response.iter_encoded():
+        total_bytes += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{peak_kb} {peak_kb - baseline_kb} {total_bytes} {elapsed:.3f}")
+
+
+def run(counts, question_count, formats):
+    from database import get_db_connection
+    from keys import to_str
+    from benchmarks.common import seed_responses, seed_survey, seed_user
+
+    db = get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    surveys = {}
+    for count in counts:
+        survey_key, question_keys = seed_survey(db, BENCH_USER_ID, question_count)
+        seed_responses(db, survey_key, question_keys, count)
+        surveys[count] = to_str(survey_key)
+    db.close()
+
+    print(f"{'responses':>10} {'format':>7} {'peak RSS MB':>12} {'growth MB':>10} {'body MB':>9} {'seconds':>8}")
+    for count in counts:
+        for export_format in formats:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.export_rss', '--child', surveys[count], export_format],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            peak_kb, growth_kb, total_bytes, seconds = output[-4:]
+            print(
+                f"{count:>10} {export_format:>7} {int(peak_kb) / 1024:>12.1f} "
+                f"{int(growth_kb) / 1024:>10.1f} {int(total_bytes) / 2**20:>9.1f} {float(seconds):>8.2f}"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'ndjson'])
+    parser.add_argument('--child', nargs=2, metavar=('SURVEY_ID', 'FORMAT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        export_once(*args.child)
+    else:
+        run(args.counts, args.questions, args.formats)
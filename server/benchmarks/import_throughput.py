@@ -0,0 +1,76 @@
+"""
+Bulk import throughput versus one POST per response.
+
+Generates --responses NDJSON responses for a fresh survey and loads them
+with bulk_import.ResponseImporter at each --batch-sizes value, then submits
+--submits responses one at a time through POST /api/survey/{id} (the only
+ingestion path before bulk import) for comparison. Reports responses and
+answers per second.
+
+Usage (from the server directory):
+    python -m benchmarks.import_throughput --responses 100000 --questions 10
+"""
+import argparse
+import io
+import json
+import time
+
+BENCH_USER_ID = 'bench-import-user'
+
+
+def ndjson_body(question_ids, count):
+    return ''.join(
+        json.dumps({'answers': {question_id: f'answer {i} to {q}' for q, question_id in enumerate(question_ids)}}) + '\n'
+        for i in range(count)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--responses', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--submits', type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import app
+    from bulk_import import ResponseImporter, load_questions, ndjson_records
+    from database import get_db_connection
+    from keys import to_str
+    from benchmarks.common import disable_admission_control, seed_survey, seed_user
+
+    db = get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+
+    print(f"{'path':<24} {'responses':>10} {'seconds':>8} {'responses/s':>12} {'answers/s':>10}")
+
+    def report(name, count, elapsed):
+        print(f"{name:<24} {count:>10} {elapsed:>8.1f} {count / elapsed:>12.0f} {count * args.questions / elapsed:>10.0f}")
+
+    for batch_size in args.batch_sizes:
+        survey_key, question_keys = seed_survey(db, BENCH_USER_ID, args.questions)
+        body = ndjson_body([to_str(key) for key in question_keys], args.responses)
+        cursor = db.cursor()
+        questions = load_questions(cursor, survey_key)
+        cursor.close()
+        importer = ResponseImporter(db, survey_key, batch_size)
+        start = time.perf_counter()
+        for _ in importer.run(ndjson_records(io.StringIO(body), questions)):
+            pass
+        report(f'import, batch {batch_size}', importer.imported, time.perf_counter() - start)
+
+    survey_key, question_keys = seed_survey(db, BENCH_USER_ID, args.questions)
+    db.close()
+    payload = {'answers': {to_str(key): 'answer' for key in question_keys}}
+    client = app.test_client()
+    # Submit rate limits would measure the limiter, not the write path
+    disable_admission_control()
+    start = time.perf_counter()
+    for _ in range(args.submits):
+        response = client.post(f'/api/survey/{to_str(survey_key)}', json=payload)
+        assert response.status_code in (201, 202), response.get_json()
+    report('POST per response', args.submits, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
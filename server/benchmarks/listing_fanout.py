@@ -0,0 +1,177 @@
+"""
+Bytes transferred and handler CPU of the survey reads, joined versus two-phase.
+
+Seeds one user with --surveys surveys of --questions questions each, every
+survey carrying a --prompt-kb system prompt, then reads them two ways on one
+connection:
+- joined: surveys LEFT JOIN questions into dictionary rows, regrouped in Python,
+  which repeats every survey column (system prompt included) on each question row
+- two-phase: what get_user_surveys and get_survey run now, one row per survey
+  plus an IN-batched question query, decoded from tuple rows
+for the whole listing (--page-size surveys per page) and for a single survey
+document. Bytes are the server's session `Bytes_sent` counter, CPU is this
+process's CPU time for running the queries and building the response dicts.
+
+Usage (from the server directory):
+    python -m benchmarks.listing_fanout --surveys 500 --questions 50
+"""
+import argparse
+import statistics
+import time
+
+# Prefix of the user seeded per run, so earlier runs don't grow the listing
+BENCH_USER_PREFIX = 'bench-listing-user'
+
+JOINED_LISTING_QUERY = """
+    SELECT
+        s.id, s.title, s.system_prompt, s.created_at, s.updated_at,
+        q.id as question_id, q.question, q.elaborate
+    FROM surveys s
+    LEFT JOIN questions q ON q.survey_id = s.id
+    WHERE s.user_id = %s
+    ORDER BY s.created_at DESC, s.id DESC, q.created_at ASC, q.id ASC
+"""
+
+JOINED_DETAIL_QUERY = """
+    SELECT
+        s.id, s.title, s.system_prompt, s.created_at, s.updated_at,
+        u.name as owner_name,
+        q.id as question_id, q.question, q.elaborate
+    FROM surveys s
+    JOIN users u ON u.google_user_id = s.user_id
+    LEFT JOIN questions q ON q.survey_id = s.id
+    WHERE s.id = %s
+    ORDER BY q.created_at ASC, q.id ASC
+"""
+
+
+def bytes_sent(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    return int(cursor.fetchall()[0][1])
+
+
+def joined_surveys(db, sql, params):
+    """Surveys regrouped from one-row-per-question dictionary rows"""
+    from keys import to_str
+
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(sql, params)
+    surveys = {}
+    for row in cursor.fetchall():
+        survey = surveys.get(bytes(row['id']))
+        if survey is None:
+            survey = surveys[bytes(row['id'])] = {
+                'id': to_str(row['id']),
+                'title': row['title'],
+                'system_prompt': row['system_prompt'],
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+                'questions': []
+            }
+            if 'owner_name' in row:
+                survey['owner_name'] = row['owner_name']
+        if row['question_id']:
+            survey['questions'].append({
+                'id': to_str(row['question_id']),
+                'question': row['question'],
+                'elaborate': row['elaborate']
+            })
+    cursor.close()
+    return list(surveys.values())
+
+
+def two_phase_listing(db, user_id, page_size):
+    """Every page of get_user_surveys, as the handler queries and builds it"""
+    from pagination import id_list_placeholders, keyset_condition
+    from routes.survey import SURVEY_QUESTIONS_QUERY, USER_SURVEYS_PAGE_QUERY, add_questions, survey_entry
+
+    cursor = db.cursor()
+    listing, position = [], None
+    while True:
+        keyset, keyset_params = keyset_condition(position)
+        cursor.execute(USER_SURVEYS_PAGE_QUERY.format(keyset=keyset), [user_id] + keyset_params + [page_size])
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        surveys = {bytes(row[0]): survey_entry(row) for row in rows}
+        survey_keys = list(surveys)
+        cursor.execute(SURVEY_QUESTIONS_QUERY.format(ids=id_list_placeholders(survey_keys)), survey_keys)
+        add_questions(surveys, cursor.fetchall())
+        listing.extend(surveys.values())
+        if len(rows) < page_size:
+            break
+        position = (rows[-1][3], rows[-1][0])
+    cursor.close()
+    return listing
+
+
+def two_phase_detail(db, survey_key):
+    """The survey document get_survey builds"""
+    from routes.survey import fetch_survey_detail, survey_document
+
+    cursor = db.cursor()
+    document = survey_document(*fetch_survey_detail(cursor, survey_key))
+    cursor.close()
+    return document
+
+
+def measure(db, read, repeat):
+    """(median bytes sent, median CPU ms, median wall ms) of repeat calls to read()"""
+    counter = db.cursor()
+    sent, cpu, wall = [], [], []
+    for _ in range(repeat):
+        before = bytes_sent(counter)
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        read()
+        cpu.append((time.process_time() - cpu_start) * 1000)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        sent.append(bytes_sent(counter) - before)
+    counter.close()
+    return statistics.median(sent), statistics.median(cpu), statistics.median(wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--surveys', type=int, default=500)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--prompt-kb', type=int, default=4, help='system prompt size per survey')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from database import get_db_connection, init_db
+    from keys import new_id
+    from benchmarks.common import seed_survey, seed_user
+
+    init_db()
+    user_id = f'{BENCH_USER_PREFIX}-{new_id().hex()}'
+    db = get_db_connection()
+    seed_user(db, user_id)
+    system_prompt = ('You are a friendly voice interviewer. ' * (args.prompt_kb * 32))[:args.prompt_kb * 1024]
+    survey_keys = [
+        seed_survey(db, user_id, args.questions, system_prompt)[0]
+        for _ in range(args.surveys)
+    ]
+
+    runs = [
+        (
+            f'listing ({args.surveys} surveys)', 'joined',
+            lambda: joined_surveys(db, JOINED_LISTING_QUERY, (user_id,))
+        ),
+        (
+            f'listing ({args.surveys} surveys)', 'two-phase',
+            lambda: two_phase_listing(db, user_id, args.page_size)
+        ),
+        ('survey document', 'joined', lambda: joined_surveys(db, JOINED_DETAIL_QUERY, (survey_keys[0],))),
+        ('survey document', 'two-phase', lambda: two_phase_detail(db, survey_keys[0])),
+    ]
+
+    print(f"{'read':<24} {'shape':<10} {'KB sent':>10} {'CPU ms':>8} {'wall ms':>8}")
+    for name, shape, read in runs:
+        sent, cpu, wall = measure(db, read, args.repeat)
+        print(f"{name:<24} {shape:<10} {sent / 1024:>10.1f} {cpu:>8.1f} {wall:>8.1f}")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
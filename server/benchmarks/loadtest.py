@@ -0,0 +1,256 @@
+"""
+Endpoint load test against a local MySQL.
+
+Starts the Flask app in-process on a threaded WSGI server, switches token
+verification to a locally generated key, seeds realistic data (many users,
+surveys of 5-200 questions, as many answers as requested) and drives every
+endpoint at a fixed concurrency. For each endpoint it reports p50/p95/p99
+latency, requests per second and DB round trips per request (from the
+server's global `Questions` counter, so use an otherwise idle MySQL).
+
+Results can be saved as a JSON baseline and later runs compared against it:
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json --tolerance 0.2
+A run exits non-zero when any endpoint regresses beyond the tolerance.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from database import get_db_connection, pool_config
+from keys import to_str
+from benchmarks.common import (
+    disable_admission_control, install_test_signer, issue_token, percentile, seed_responses, seed_survey, seed_user,
+    server_questions
+)
+
+# Metrics compared against the baseline: (name, True if higher is worse)
+COMPARED_METRICS = [('p95_ms', True), ('p99_ms', True), ('rps', False), ('round_trips', True)]
+
+
+def seed(users, surveys_per_user, answers, seed_value):
+    """Seed users, surveys and responses; returns [(user_id, [(survey_id, [question_ids])])]"""
+    from analytics import rebuild_survey_stats
+
+    rng = random.Random(seed_value)
+    run_id = uuid.uuid4().hex[:8]
+    db = get_db_connection()
+    dataset = []
+    all_surveys = []
+    for u in range(users):
+        user_id = f'load-{run_id}-{u}'
+        seed_user(db, user_id)
+        surveys = []
+        for _ in range(surveys_per_user):
+            survey_key, question_keys = seed_survey(db, user_id, rng.randint(5, 200), system_prompt='x' * 2000)
+            surveys.append((survey_key, question_keys))
+            all_surveys.append((survey_key, question_keys))
+        dataset.append((user_id, surveys))
+
+    # Spread the answer budget across surveys, skewed towards a few popular ones
+    weights = [rng.paretovariate(1.2) for _ in all_surveys]
+    total_weight = sum(weights)
+    for (survey_key, question_keys), weight in zip(all_surveys, weights):
+        responses = int(answers * weight / total_weight / len(question_keys))
+        if responses:
+            seed_responses(db, survey_key, question_keys, responses)
+        rebuild_survey_stats(db, survey_key)
+    db.close()
+
+    return [
+        (user_id, [(to_str(survey_key), [to_str(q) for q in question_keys]) for survey_key, question_keys in surveys])
+        for user_id, surveys in dataset
+    ]
+
+
+def scenarios(dataset, tokens, rng):
+    """Request factories per endpoint: name -> callable returning (method, path, headers, json)"""
+    def owner():
+        user_id, surveys = rng.choice(dataset)
+        return {'Authorization': f'Bearer {tokens[user_id]}'}, surveys
+
+    def any_survey():
+        return rng.choice(rng.choice(dataset)[1])
+
+    def create_survey():
+        headers, _ = owner()
+        body = {
+            'title': 'Load test survey',
+            'system_prompt': 'x' * 2000,
+            'questions': [{'question': f'Question {i}', 'elaborate': i % 2 == 1} for i in range(rng.randint(5, 50))]
+        }
+        return 'POST', '/api/survey', headers, body
+
+    def list_surveys():
+        headers, _ = owner()
+        return 'GET', '/api/survey', headers, None
+
+    def get_survey():
+        survey_id, _ = any_survey()
+        return 'GET', f'/api/survey/{survey_id}', {}, None
+
+    def submit_response():
+        survey_id, question_ids = any_survey()
+        return 'POST', f'/api/survey/{survey_id}', {}, {'answers': {q: rng.choice(['yes', 'no']) for q in question_ids}}
+
+    def survey_responses():
+        headers, surveys = owner()
+        return 'GET', f'/api/survey/{rng.choice(surveys)[0]}/responses', headers, None
+
+    def survey_stats():
+        headers, surveys = owner()
+        return 'GET', f'/api/survey/{rng.choice(surveys)[0]}/stats', headers, None
+
+    def user_info():
+        headers, _ = owner()
+        return 'GET', '/api/user', headers, None
+
+    def register():
+        headers, _ = owner()
+        return 'POST', '/api/auth/register', headers, None
+
+    return {
+        'POST /api/survey': create_survey,
+        'GET /api/survey': list_surveys,
+        'GET /api/survey/<id>': get_survey,
+        'POST /api/survey/<id>': submit_response,
+        'GET /api/survey/<id>/responses': survey_responses,
+        'GET /api/survey/<id>/stats': survey_stats,
+        'GET /api/user': user_info,
+        'POST /api/auth/register': register,
+    }
+
+
+def drive(base_url, make_request, requests_count, concurrency):
+    """Send requests_count requests at the given concurrency; returns latencies (ms) and errors"""
+    local = threading.local()
+    # Build the requests up front so generating them isn't timed
+    planned = [make_request() for _ in range(requests_count)]
+
+    def send(planned_request):
+        method, path, headers, body = planned_request
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.request(method, base_url + path, headers=headers, json=body)
+        elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(send, planned))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    return latencies, errors, wall
+
+
+def compare(results, baseline, tolerance):
+    """List human-readable regressions of results against a baseline"""
+    regressions = []
+    for endpoint, current in results.items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS:
+            old, new = previous[metric], current[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (higher_is_worse and change > tolerance) or (not higher_is_worse and -change > tolerance):
+                regressions.append(f"{endpoint}: {metric} {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--surveys-per-user', type=int, default=5)
+    parser.add_argument('--answers', type=int, default=200000, help='total answers to seed')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--only', nargs='*', help='only run these endpoints')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    pool_config['size'] = max(pool_config['size'], args.concurrency + 2)
+    from app import app
+    disable_admission_control()
+    signer = install_test_signer()
+
+    print(f"Seeding {args.users} users x {args.surveys_per_user} surveys, ~{args.answers} answers...")
+    dataset = seed(args.users, args.surveys_per_user, args.answers, args.seed)
+    tokens = {user_id: issue_token(signer, user_id) for user_id, _ in dataset}
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    db = get_db_connection()
+    cursor = db.cursor()
+    rng = random.Random(args.seed)
+    results = {}
+    print(f"{'endpoint':<32} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'trips':>6} {'errors':>6}")
+    try:
+        for endpoint, make_request in scenarios(dataset, tokens, rng).items():
+            if args.only and endpoint not in args.only:
+                continue
+            before = server_questions(cursor)
+            latencies, errors, wall = drive(base_url, make_request, args.requests, args.concurrency)
+            # Subtract the SHOW STATUS statement itself
+            round_trips = (server_questions(cursor) - before - 1) / args.requests
+            results[endpoint] = {
+                'p50_ms': percentile(latencies, 0.50),
+                'p95_ms': percentile(latencies, 0.95),
+                'p99_ms': percentile(latencies, 0.99),
+                'rps': args.requests / wall,
+                'round_trips': round_trips,
+                'errors': errors
+            }
+            r = results[endpoint]
+            print(
+                f"{endpoint:<32} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                f"{r['rps']:>8.0f} {r['round_trips']:>6.1f} {errors:>6}"
+            )
+    finally:
+        cursor.close()
+        db.close()
+        server.shutdown()
+
+    run_info = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('save_baseline', 'baseline')},
+        'endpoints': results
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(run_info, file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Login-storm throughput: registrations per second through get_or_create_user.
+
+Compares the previous SELECT / INSERT / SELECT implementation with the
+single-statement upsert, at a given concurrency. Each run mixes first-time
+registrations with returning users, like a launch-day login spike.
+
+Usage (from the server directory):
+    python -m benchmarks.login_storm --logins 5000 --concurrency 16 --returning 0.8
+"""
+import argparse
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from database import init_db, get_db_connection, pool_config
+from benchmarks.common import server_questions
+from routes.auth import get_or_create_user
+
+
+def legacy_get_or_create_user(user_info):
+    """The original three-round-trip implementation, kept for comparison"""
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT google_user_id, email, name FROM users WHERE google_user_id = %s",
+            (user_info['user_id'],)
+        )
+        existing_user = cursor.fetchone()
+        if existing_user:
+            return existing_user, False
+        cursor.execute(
+            "INSERT INTO users (google_user_id, email, name) VALUES (%s, %s, %s)",
+            (user_info['user_id'], user_info['email'], user_info['name'])
+        )
+        db.commit()
+        cursor.execute(
+            "SELECT google_user_id, email, name FROM users WHERE google_user_id = %s",
+            (user_info['user_id'],)
+        )
+        return cursor.fetchone(), True
+    finally:
+        cursor.close()
+        db.close()
+
+
+def make_logins(count, returning):
+    """User infos for one storm; `returning` is the share of repeat logins"""
+    run_id = uuid.uuid4().hex[:8]
+    known = []
+    logins = []
+    for i in range(count):
+        if known and random.random() < returning:
+            logins.append(random.choice(known))
+        else:
+            user_id = f'storm-{run_id}-{i}'
+            info = {'user_id': user_id, 'email': f'{user_id}@example.com', 'name': f'Storm {i}'}
+            known.append(info)
+            logins.append(info)
+    return logins
+
+
+def storm(implementation, logins, concurrency):
+    db = get_db_connection()
+    cursor = db.cursor()
+    before = server_questions(cursor)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(implementation, logins))
+    elapsed = time.perf_counter() - start
+    round_trips = (server_questions(cursor) - before - 1) / len(logins)
+    cursor.close()
+    db.close()
+    return len(logins) / elapsed, round_trips
+
+
+def run(count, concurrency, returning):
+    pool_config['size'] = max(pool_config['size'], concurrency + 1)
+    init_db()
+    print(f"{'implementation':>15} {'logins/s':>10} {'round trips':>12}")
+    for name, implementation in (('select+insert', legacy_get_or_create_user), ('upsert', get_or_create_user)):
+        rate, round_trips = storm(implementation, make_logins(count, returning), concurrency)
+        print(f"{name:>15} {rate:>10.0f} {round_trips:>12.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--returning', type=float, default=0.8, help='share of logins by already registered users')
+    args = parser.parse_args()
+    run(args.logins, args.concurrency, args.returning)
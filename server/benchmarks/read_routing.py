@@ -0,0 +1,131 @@
+"""
+Submission latency under a read flood, with and without a read replica pool.
+
+Reader threads hammer the survey listing and the responses listing while
+submitter threads post responses. The first run shares the primary pool, the
+second routes reads through a replica pool pointed at the same instance
+(one instance under two pools), so the difference is pool contention alone.
+Also checks read-your-writes: a survey listing right after creating a survey
+must come from the primary and include the new survey.
+
+Usage (from the server directory):
+    python -m benchmarks.read_routing --readers 32 --submitters 4 --seconds 10
+"""
+import argparse
+import threading
+import time
+
+import database
+import metrics
+from app import app
+from keys import to_str
+from benchmarks.common import (
+    disable_admission_control, install_test_signer, issue_token, percentile, seed_responses, seed_survey, seed_user
+)
+
+BENCH_USER_ID = 'bench-routing-user'
+
+
+def routing_counts():
+    return {f"{labels['target']}/{labels['reason']}": count for _, labels, count in metrics.read_routing.samples()}
+
+
+def check_read_your_writes(token):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/survey', headers=headers, json={
+        'title': 'Read-your-writes check', 'system_prompt': 'x',
+        'questions': [{'question': 'Still there?', 'elaborate': False}]
+    })
+    survey_id = response.get_json()['survey_id']
+    before = routing_counts().get('primary/sticky', 0)
+    surveys = client.get('/api/survey', headers=headers).get_json()['surveys']
+    assert any(survey['id'] == survey_id for survey in surveys), "new survey missing from listing"
+    assert routing_counts().get('primary/sticky', 0) == before + 1, "listing after a write wasn't pinned to the primary"
+    print("read-your-writes: listing after create was served by the primary and includes the new survey")
+
+
+def flood(token, survey_id, question_ids, readers, submitters, seconds):
+    """Run readers and submitters together; returns submit latencies (ms) and read count"""
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = {'answers': {question_id: 'yes' for question_id in question_ids}}
+    stop = threading.Event()
+    submit_latencies = []
+    reads = [0]
+    lock = threading.Lock()
+
+    def reader():
+        client = app.test_client()
+        count = 0
+        while not stop.is_set():
+            client.get('/api/survey', headers=headers)
+            client.get(f'/api/survey/{survey_id}/responses?limit=200', headers=headers)
+            count += 2
+        with lock:
+            reads[0] += count
+
+    def submitter():
+        client = app.test_client()
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.post(f'/api/survey/{survey_id}', json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+        with lock:
+            submit_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=submitter) for _ in range(submitters)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sorted(submit_latencies), reads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=32)
+    parser.add_argument('--submitters', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    disable_admission_control()
+    signer = install_test_signer()
+    token = issue_token(signer, BENCH_USER_ID)
+    db = database.get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    survey_key, question_keys = seed_survey(db, BENCH_USER_ID, 20)
+    seed_responses(db, survey_key, question_keys, 2000)
+    db.close()
+    survey_id = to_str(survey_key)
+    question_ids = [to_str(question_key) for question_key in question_keys]
+
+    primary = database.connection_pool
+    configurations = [
+        ('primary only', None),
+        ('with replica pool', database.ReadRouter(
+            primary,
+            database.ConnectionPool(database.db_config, replica=True, **database.replica_pool_config),
+            **database.read_routing_config
+        ))
+    ]
+
+    print(f"{'configuration':<20} {'submits/s':>10} {'submit p50':>11} {'submit p95':>11} {'submit p99':>11} {'reads/s':>8}")
+    for name, router in configurations:
+        database.read_router = router
+        latencies, reads = flood(token, survey_id, question_ids, args.readers, args.submitters, args.seconds)
+        print(
+            f"{name:<20} {len(latencies) / args.seconds:>10.0f} "
+            f"{percentile(latencies, 0.50):>9.1f}ms {percentile(latencies, 0.95):>9.1f}ms "
+            f"{percentile(latencies, 0.99):>9.1f}ms {reads / args.seconds:>8.0f}"
+        )
+        if router is not None:
+            check_read_your_writes(token)
+            print(f"routing: {routing_counts()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+CPU time and bytes on the wire per serializer and content encoding.
+
+Seeds one survey with --responses responses, then fetches it through the
+Flask test client the way a dashboard would: every page of the responses
+listing (at MAX_PAGE_SIZE), the CSV and NDJSON exports, and the public survey
+document --document-requests times (served from the survey cache). Each
+endpoint is measured with:
+
+    today      Flask's stdlib JSON provider, no compression
+    orjson     serialization.FastJSONProvider with orjson, no compression
+    gzip / br  orjson, compressed for a client sending Accept-Encoding
+
+CPU time is this process's, so it includes the MySQL driver's work, which is
+the same for every configuration; the differences are the serializer's and
+the compressor's. Best of --repeat runs.
+
+Usage (from the server directory):
+    python -m benchmarks.response_encoding --responses 10000 --questions 10
+"""
+import argparse
+import gzip
+import json
+import time
+
+BENCH_USER_ID = 'bench-encoding-user'
+
+# name, orjson enabled, Accept-Encoding
+CONFIGURATIONS = [
+    ('today', False, 'identity'),
+    ('orjson', True, 'identity'),
+    ('gzip', True, 'gzip'),
+    ('br', True, 'br'),
+]
+
+
+def fetch_responses(client, survey_id, headers):
+    """Walk every page of the responses listing; returns bytes received"""
+    received = 0
+    url = f'/api/survey/{survey_id}/responses?limit=100000'
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.status_code
+        received += len(response.data)
+        next_cursor = next_page_cursor(response)
+        url = f'/api/survey/{survey_id}/responses?limit=100000&cursor={next_cursor}' if next_cursor else None
+    return received
+
+
+def next_page_cursor(response):
+    """next_cursor from a (possibly compressed) responses page"""
+    body = response.data
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'br':
+        import brotli
+        body = brotli.decompress(body)
+    return json.loads(body)['next_cursor']
+
+
+def fetch_export(client, survey_id, export_format, headers):
+    response = client.get(f'/api/survey/{survey_id}/export?format={export_format}', headers=headers, buffered=False)
+    assert response.status_code == 200, response.status_code
+    received = sum(len(chunk) for chunk in response.iter_encoded())
+    response.close()
+    return received
+
+
+def fetch_document(client, survey_id, headers, count):
+    received = 0
+    for _ in range(count):
+        response = client.get(f'/api/survey/{survey_id}', headers=headers)
+        assert response.status_code == 200, response.status_code
+        received += len(response.data)
+    return received
+
+
+def measure(fetch, repeat):
+    """(best CPU seconds, best wall seconds, bytes received) over repeat runs"""
+    best_cpu = best_wall = float('inf')
+    received = 0
+    for _ in range(repeat):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        received = fetch()
+        best_cpu = min(best_cpu, time.process_time() - cpu_start)
+        best_wall = min(best_wall, time.perf_counter() - wall_start)
+    return best_cpu, best_wall, received
+
+
+def run(response_count, question_count, document_requests, repeat):
+    from flask.json.provider import DefaultJSONProvider
+
+    import serialization
+    from app import app
+    from database import get_db_connection
+    from keys import to_str
+    from serialization import FastJSONProvider
+    from benchmarks.common import (
+        disable_admission_control, install_test_signer, issue_token, seed_responses, seed_survey, seed_user
+    )
+
+    disable_admission_control()
+    db = get_db_connection()
+    seed_user(db, BENCH_USER_ID)
+    # A long prompt and questions make the survey document worth compressing
+    survey_key, question_keys = seed_survey(db, BENCH_USER_ID, question_count, system_prompt='Benchmark prompt. ' * 100)
+    seed_responses(db, survey_key, question_keys, response_count)
+    db.close()
+    survey_id = to_str(survey_key)
+
+    token = issue_token(install_test_signer(), BENCH_USER_ID)
+    client = app.test_client()
+    endpoints = [
+        ('responses (all pages)', lambda headers: fetch_responses(client, survey_id, headers)),
+        ('export csv', lambda headers: fetch_export(client, survey_id, 'csv', headers)),
+        ('export ndjson', lambda headers: fetch_export(client, survey_id, 'ndjson', headers)),
+        (f'survey document x{document_requests}', lambda headers: fetch_document(client, survey_id, headers, document_requests)),
+    ]
+
+    print(f"{response_count} responses x {question_count} questions")
+    print(f"{'endpoint':<24} {'config':<7} {'CPU s':>7} {'wall s':>7} {'MB on wire':>10} {'CPU vs today':>12} {'bytes vs today':>14}")
+    for name, fetch in endpoints:
+        baseline = None
+        for config, fast, accept_encoding in CONFIGURATIONS:
+            serialization.USE_ORJSON = fast
+            app.json = FastJSONProvider(app) if fast else DefaultJSONProvider(app)
+            headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': accept_encoding}
+            cpu, wall, received = measure(lambda: fetch(headers), repeat)
+            baseline = baseline or (cpu, received)
+            print(
+                f"{name:<24} {config:<7} {cpu:>7.3f} {wall:>7.3f} {received / 1e6:>10.2f} "
+                f"{cpu / baseline[0]:>12.2f} {received / baseline[1]:>14.2f}"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--responses', type=int, default=10000)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--document-requests', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.responses, args.questions, args.document_requests, args.repeat)
@@ -0,0 +1,140 @@
+"""
+Cold start time of the Flask app, by phase.
+
+Starts --repeat fresh interpreters and times, in each:
+- interpreter: `python -c pass`, the floor every process pays
+- import database: the driver, dotenv and pool modules
+- init_db: pool creation plus the schema version check boot now runs
+- import app: every other module app.py pulls in (init_db is already done)
+- first request: GET /metrics through the test client
+- boot DDL: the previous boot, re-running every statement of every migration
+  on each start (for comparison; not part of the new startup)
+Total startup is the child's wall time without boot DDL. Then lists the
+slowest direct imports of `import app` from `-X importtime`.
+
+Usage (from the server directory):
+    python -m benchmarks.startup_time --repeat 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ['import database', 'init_db', 'import app', 'first request', 'boot DDL']
+
+
+def measure_once():
+    """Child process: time each phase and print its milliseconds on one line"""
+    timings = []
+
+    start = time.perf_counter()
+    import database
+    timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    database.init_db()
+    timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    from app import app
+    timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200, response.status_code
+    timings.append(time.perf_counter() - start)
+
+    timings.append(boot_ddl(database.get_db_connection()))
+    print(' '.join(f'{seconds * 1000:.2f}' for seconds in timings))
+
+
+def boot_ddl(db):
+    """Seconds to re-run every migration statement, as init_db did on each start"""
+    import mysql.connector
+    from migrations import IDEMPOTENT_DDL_ERRORS, available_migrations, split_statements
+
+    cursor = db.cursor()
+    start = time.perf_counter()
+    for _, _, path in available_migrations():
+        with open(path, 'r') as file:
+            statements = split_statements(file.read())
+        for statement in statements:
+            try:
+                cursor.execute(statement)
+            except mysql.connector.Error as err:
+                if err.errno not in IDEMPOTENT_DDL_ERRORS:
+                    raise
+    db.commit()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    db.close()
+    return elapsed
+
+
+def interpreter_ms():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def slowest_imports(count):
+    """(cumulative ms, module) of the slowest modules app.py imports directly"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        check=True, capture_output=True, text=True
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # Each level of nesting indents the module name by two more spaces;
+        # app itself is at level 0, its own imports at level 1
+        if len(module) - len(module.lstrip()) != 3:
+            continue
+        imports.append((int(cumulative) / 1000, module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        measure_once()
+        return
+
+    from database import init_db
+
+    # Fails fast if the schema is behind: run `python manage.py migrate` first
+    init_db()
+
+    interpreter, process, runs = [], [], []
+    for _ in range(args.repeat):
+        interpreter.append(interpreter_ms())
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.startup_time', '--child'],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()
+        elapsed = (time.perf_counter() - start) * 1000
+        runs.append([float(value) for value in output[-1].split()])
+        process.append(elapsed - runs[-1][-1])
+
+    print(f"{'phase':<16} {'median ms':>10} {'max ms':>8}")
+    print(f"{'interpreter':<16} {statistics.median(interpreter):>10.1f} {max(interpreter):>8.1f}")
+    for index, phase in enumerate(PHASES):
+        values = [run[index] for run in runs]
+        print(f"{phase:<16} {statistics.median(values):>10.1f} {max(values):>8.1f}")
+    print(f"{'total startup':<16} {statistics.median(process):>10.1f} {max(process):>8.1f}")
+
+    print(f"\n{'slowest imports of app.py':<40} {'cumulative ms':>14}")
+    for cumulative_ms, module in slowest_imports(args.top):
+        print(f"{module:<40} {cumulative_ms:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
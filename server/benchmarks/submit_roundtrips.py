@@ -0,0 +1,63 @@
+"""
+Round trips and latency per survey submission as the question count grows.
+
+Runs POST /api/survey/<id> through the Flask test client against the database
+configured in .env. Round trips are read from the server's global `Questions`
+status counter, so run it against an otherwise idle local MySQL.
+
+Usage (from the server directory):
+    python -m benchmarks.submit_roundtrips --submissions 200
+"""
+import argparse
+import statistics
+import time
+
+from app import app
+from database import get_db_connection
+from keys import to_str
+from benchmarks.common import disable_admission_control, percentile, seed_survey, seed_user, server_questions
+
+QUESTION_COUNTS = [5, 10, 25, 50, 100, 200]
+BENCH_USER_ID = 'bench-submit-user'
+
+
+def run(submissions):
+    disable_admission_control()
+    client = app.test_client()
+    db = get_db_connection()
+    cursor = db.cursor()
+    seed_user(db, BENCH_USER_ID)
+
+    print(f"{'questions':>9} {'round trips':>12} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for question_count in QUESTION_COUNTS:
+        survey_key, question_keys = seed_survey(db, BENCH_USER_ID, question_count)
+        survey_id = to_str(survey_key)
+        payload = {"answers": {to_str(question_key): 'yes' for question_key in question_keys}}
+
+        latencies = []
+        before = server_questions(cursor)
+        for _ in range(submissions):
+            start = time.perf_counter()
+            response = client.post(f'/api/survey/{survey_id}', json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 201, response.get_json()
+        # Subtract the SHOW STATUS statement itself
+        round_trips = (server_questions(cursor) - before - 1) / submissions
+
+        latencies.sort()
+        print(
+            f"{question_count:>9} {round_trips:>12.1f} "
+            f"{percentile(latencies, 0.50):>8.2f} "
+            f"{percentile(latencies, 0.95):>8.2f} "
+            f"{statistics.mean(latencies):>8.2f}"
+        )
+
+    cursor.close()
+    db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=200, help='submissions per question count')
+    args = parser.parse_args()
+    run(args.submissions)
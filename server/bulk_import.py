@@ -0,0 +1,286 @@
+"""
+Bulk import of historical responses from CSV or NDJSON.
+
+Input uses the export formats (export.py):
+
+    csv     header row of optional `response_id` and `created_at` columns
+            plus one column per question (question id, or the question text
+            as written by the export); one row per response
+    ndjson  one {"id", "created_at", "answers": {question_id: answer}} object
+            per line; `id` and `created_at` are optional
+
+Records are read as a stream and validated against the survey's questions,
+loaded once up front. Valid responses are written in batches of
+IMPORT_BATCH_SIZE, one transaction per batch, with multi-row inserts.
+Records whose response id already exists, hot or archived, are skipped, so
+re-importing an export is harmless. After each commit the importer yields its progress, and
+`offset` (records consumed so far) is where an interrupted import resumes.
+"""
+import csv
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from analytics import record_responses
+from database import multi_row_values
+from export import EXPORT_QUESTIONS_QUERY
+from keys import new_id, parse_id, to_str
+from pagination import id_list_placeholders
+from serialization import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+# Responses per transaction
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+# Rows per multi-row INSERT inside a batch
+INSERT_CHUNK_SIZE = 1000
+# Invalid records described in the summary (all of them are counted)
+IMPORT_MAX_ERRORS = 100
+
+# Supplied ids that are already taken, by a hot response or an archived one
+EXISTING_RESPONSES_QUERY = """
+    SELECT id FROM responses WHERE id IN ({ids})
+    UNION ALL
+    SELECT id FROM archived_response_ids WHERE id IN ({ids})
+"""
+
+IMPORT_RESPONSES_QUERY = """
+    INSERT INTO responses (id, survey_id, created_at)
+    VALUES {placeholders}
+"""
+
+IMPORT_ANSWERS_QUERY = """
+    INSERT INTO answers (id, response_id, question_id, answer)
+    VALUES {placeholders}
+"""
+
+
+class InvalidImport(ValueError):
+    """The input can't be imported at all (bad format or CSV header)"""
+
+
+class InvalidRecord(ValueError):
+    """One record can't be imported; the rest of the input still is"""
+
+
+def load_questions(cursor, survey_key):
+    """[(question id, question text)] for the survey, in survey order"""
+    cursor.execute(EXPORT_QUESTIONS_QUERY, (survey_key,))
+    return [(bytes(row[0]), row[1]) for row in cursor.fetchall()]
+
+
+def parse_created_at(value):
+    """Naive UTC datetime from an ISO 8601 string, or None when empty"""
+    if value is None or value == '':
+        return None
+    try:
+        created_at = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"invalid created_at: {value!r}")
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at
+
+
+def parse_response_id(value):
+    if value is None or value == '':
+        return None
+    response_key = parse_id(value)
+    if response_key is None:
+        raise InvalidRecord(f"invalid response id: {value!r}")
+    return response_key
+
+
+def answer_text(value):
+    """Answer as stored (text), or None to leave the question unanswered"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    raise InvalidRecord(f"answers must be text or numbers, got {type(value).__name__}")
+
+
+def csv_records(lines, questions):
+    """(response id, created_at, [(question id, answer)]) per CSV row"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    by_id = {to_str(question_id): question_id for question_id, _ in questions}
+    by_text = {}
+    for question_id, text in questions:
+        # Question text only identifies a column if no other question shares it
+        by_text[text] = None if text in by_text else question_id
+
+    columns = []
+    for name in header:
+        if name in ('response_id', 'created_at'):
+            columns.append(name)
+        elif name in by_id or by_text.get(name):
+            columns.append(by_id.get(name) or by_text[name])
+        else:
+            raise InvalidImport(f"CSV column {name!r} isn't a question of this survey")
+
+    for row in reader:
+        if len(row) != len(columns):
+            yield InvalidRecord(f"expected {len(columns)} fields, got {len(row)}")
+            continue
+        try:
+            fields = dict(zip(columns, row))
+            yield (
+                parse_response_id(fields.get('response_id')),
+                parse_created_at(fields.get('created_at')),
+                [(column, answer) for column, answer in zip(columns, row) if isinstance(column, bytes) and answer != '']
+            )
+        except InvalidRecord as err:
+            yield err
+
+
+def ndjson_records(lines, questions):
+    """(response id, created_at, [(question id, answer)]) per NDJSON line"""
+    question_keys = {to_str(question_id): question_id for question_id, _ in questions}
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise InvalidRecord("not valid JSON")
+            if not isinstance(record, dict) or not isinstance(record.get('answers'), dict):
+                raise InvalidRecord("expected an object with an answers object")
+            answers = []
+            for question_id, answer in record['answers'].items():
+                question_key = question_keys.get(question_id)
+                if question_key is None:
+                    raise InvalidRecord(f"{question_id!r} isn't a question of this survey")
+                text = answer_text(answer)
+                if text is not None:
+                    answers.append((question_key, text))
+            yield parse_response_id(record.get('id')), parse_created_at(record.get('created_at')), answers
+        except InvalidRecord as err:
+            yield err
+
+READERS = {
+    'csv': csv_records,
+    'ndjson': ndjson_records
+}
+
+
+class ResponseImporter:
+    """
+    Writes parsed records for one survey in bounded transactions.
+    run() is a generator of progress dicts, one per committed batch and a
+    final summary; db must be a dedicated connection (not autocommit).
+    """
+
+    def __init__(self, db, survey_key, batch_size=IMPORT_BATCH_SIZE):
+        self.db = db
+        self.survey_key = survey_key
+        self.batch_size = batch_size
+        self.offset = 0
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []
+
+    def progress(self):
+        return {
+            "offset": self.offset,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "invalid": self.invalid
+        }
+
+    def run(self, records, offset=0):
+        """
+        Import records (from csv_records / ndjson_records), skipping the
+        first `offset` of them, which an earlier run already committed
+        """
+        self.offset = offset
+        batch = []
+        consumed = offset
+        for index, record in enumerate(records):
+            if index < offset:
+                continue
+            consumed = index + 1
+            if isinstance(record, InvalidRecord):
+                self.invalid += 1
+                if len(self.errors) < IMPORT_MAX_ERRORS:
+                    self.errors.append({"record": index, "error": str(record)})
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+                self.offset = consumed
+                yield self.progress()
+
+        if batch:
+            self.write_batch(batch)
+        self.offset = consumed
+        yield {**self.progress(), "errors": self.errors, "status": "success"}
+
+    def write_batch(self, batch):
+        cursor = self.db.cursor()
+        try:
+            supplied = [response_id for response_id, _, _ in batch if response_id is not None]
+            existing = set()
+            if supplied:
+                cursor.execute(EXISTING_RESPONSES_QUERY.format(ids=id_list_placeholders(supplied)), supplied + supplied)
+                existing = {bytes(row[0]) for row in cursor.fetchall()}
+
+            response_rows, answer_rows = [], []
+            seen = set()
+            for response_id, created_at, answers in batch:
+                if response_id in existing or response_id in seen:
+                    self.skipped += 1
+                    continue
+                response_id = response_id or new_id()
+                seen.add(response_id)
+                response_rows.append((response_id, self.survey_key, created_at))
+                answer_rows.extend((new_id(), response_id, question_id, answer) for question_id, answer in answers)
+
+            for start in range(0, len(response_rows), INSERT_CHUNK_SIZE):
+                placeholders, params = multi_row_values("(%s, %s, COALESCE(%s, CURRENT_TIMESTAMP))", response_rows[start:start + INSERT_CHUNK_SIZE])
+                cursor.execute(IMPORT_RESPONSES_QUERY.format(placeholders=placeholders), params)
+            for start in range(0, len(answer_rows), INSERT_CHUNK_SIZE):
+                placeholders, params = multi_row_values("(%s, %s, %s, %s)", answer_rows[start:start + INSERT_CHUNK_SIZE])
+                cursor.execute(IMPORT_ANSWERS_QUERY.format(placeholders=placeholders), params)
+            # Keep the analytics summaries in step with the raw tables
+            record_responses(cursor, [row[0] for row in response_rows])
+            self.db.commit()
+            self.imported += len(response_rows)
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class ImportStream:
+    """
+    NDJSON progress lines for an import running as a streamed HTTP response:
+    one per committed batch, then the summary (or the error that stopped it).
+    Takes ownership of db and closes it when the response ends.
+    """
+
+    def __init__(self, db, importer, records, offset):
+        self.db = db
+        self.importer = importer
+        self.records = records
+        self.offset = offset
+
+    def __iter__(self):
+        try:
+            for progress in self.importer.run(self.records, self.offset):
+                yield dumps_bytes(progress, sort_keys=False) + b'\n'
+        except Exception as e:
+            logger.exception("Import into survey %s stopped at offset %d", to_str(self.importer.survey_key), self.importer.offset)
+            yield dumps_bytes({**self.importer.progress(), "status": "error", "message": str(e)}, sort_keys=False) + b'\n'
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,183 @@
+"""
+Query-plan regression check for the hot queries in routes/survey.py, export.py,
+search.py and archive.py.
+
+Runs EXPLAIN for each hot query against the database configured in .env
+and exits non-zero if any of them uses a full table scan, a full index scan,
+a filesort or a temporary table that isn't explicitly allowed below.
+
+Usage (from the server directory):
+    python check_query_plans.py
+"""
+import sys
+from datetime import datetime
+
+import mysql.connector
+
+import analytics
+import archive
+import export
+import search
+from database import db_config, multi_row_values
+from keys import new_id
+from pagination import DEFAULT_PAGE_SIZE, id_list_placeholders, keyset_condition
+from routes import survey
+
+# Plan features that mean the query work grows with table size
+FULL_SCAN_TYPES = {'ALL', 'index'}
+BAD_EXTRAS = ('Using filesort', 'Using temporary')
+
+
+def sample_values(cursor):
+    """Pick real keys from the database so the optimizer sees realistic data"""
+    cursor.execute("SELECT user_id, id FROM surveys ORDER BY created_at DESC LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        user_id, survey_id = row['user_id'], bytes(row['id'])
+    else:
+        user_id, survey_id = 'check-query-plans', new_id()
+
+    cursor.execute("SELECT survey_id FROM responses ORDER BY created_at DESC LIMIT 1")
+    row = cursor.fetchone()
+    responded_survey_id = bytes(row['survey_id']) if row else survey_id
+    return user_id, survey_id, responded_survey_id
+
+
+def hot_queries(user_id, survey_id, responded_survey_id):
+    """
+    (name, sql, params, allowed) for every hot query.
+    `allowed` lists plan problems accepted for that query, with the reason.
+    """
+    placeholders, params = multi_row_values(
+        "ROW(%s, %s, %s)",
+        [(new_id(), new_id(), 'yes'), (new_id(), new_id(), 'no')]
+    )
+    position = (datetime.now(), new_id())
+    keyset, keyset_params = keyset_condition(position)
+    since, since_params = keyset_condition(position, descending=False)
+    page_size = DEFAULT_PAGE_SIZE + 1
+    page_ids = [new_id(), new_id()]
+    _, search_first_params = search.search_params('battery life', survey_id, None, page_size)
+    search_keyset, search_next_params = search.search_params('battery life', survey_id, (0.5, new_id()), page_size)
+    return [
+        ('get_user_surveys', survey.USER_SURVEYS_PAGE_QUERY.format(keyset=''), (user_id, page_size), {}),
+        (
+            'get_user_surveys (next page)',
+            survey.USER_SURVEYS_PAGE_QUERY.format(keyset=keyset),
+            [user_id] + keyset_params + [page_size],
+            {}
+        ),
+        (
+            'get_user_surveys (questions)',
+            survey.SURVEY_QUESTIONS_QUERY.format(ids=id_list_placeholders([survey_id] + page_ids)),
+            [survey_id] + page_ids,
+            {}
+        ),
+        ('get_survey_responses (owner check)', survey.SURVEY_OWNER_QUERY, (survey_id, user_id), {}),
+        (
+            'get_survey_responses',
+            survey.RESPONSES_PAGE_QUERY.format(keyset='', direction='DESC'),
+            (responded_survey_id, page_size),
+            {}
+        ),
+        (
+            'get_survey_responses (since)',
+            survey.RESPONSES_PAGE_QUERY.format(keyset=since, direction='ASC'),
+            [responded_survey_id] + since_params + [page_size],
+            {}
+        ),
+        (
+            'get_survey_responses (answers)',
+            survey.RESPONSE_ANSWERS_QUERY.format(ids=id_list_placeholders(page_ids)),
+            page_ids,
+            {'Using filesort': 'question order within one page of responses'}
+        ),
+        (
+            'search_survey_answers',
+            search.SEARCH_ANSWERS_QUERY.format(keyset=''),
+            search_first_params,
+            {'Using filesort': 'ranking the fulltext matches by relevance'}
+        ),
+        (
+            'search_survey_answers (next page)',
+            search.SEARCH_ANSWERS_QUERY.format(keyset=search_keyset),
+            search_next_params,
+            {'Using filesort': 'ranking the fulltext matches by relevance'}
+        ),
+        ('get_survey_responses (archive segments)', archive.ARCHIVE_SEGMENTS_QUERY, (responded_survey_id,), {}),
+        ('export_survey_responses (questions)', export.EXPORT_QUESTIONS_QUERY, (survey_id,), {}),
+        ('export_survey_responses', export.EXPORT_RESPONSES_QUERY, (responded_survey_id,), {}),
+        ('get_survey_stats (per day)', analytics.DAILY_STATS_QUERY, (survey_id,), {}),
+        (
+            'get_survey_stats (answers)',
+            analytics.ANSWER_STATS_QUERY,
+            (survey_id,),
+            {'Using filesort': 'distribution buckets of one survey\'s closed questions'}
+        ),
+        ('get_survey', survey.SURVEY_HEADER_QUERY, (survey_id,), {}),
+        ('get_survey (questions)', survey.SURVEY_QUESTIONS_QUERY.format(ids='%s'), (survey_id,), {}),
+        (
+            'archive (responses)',
+            archive.ARCHIVABLE_RESPONSES_QUERY.format(keyset=since),
+            [responded_survey_id, datetime.now()] + since_params + [archive.ARCHIVE_BATCH_SIZE],
+            {}
+        ),
+        ('submit_survey_response (response)', survey.INSERT_RESPONSE_QUERY, (new_id(), survey_id), {}),
+        (
+            'submit_survey_response (answers)',
+            survey.INSERT_ANSWERS_QUERY.format(placeholders=placeholders),
+            [new_id()] + params + [survey_id],
+            {}
+        ),
+    ]
+
+
+def plan_problems(plan_rows):
+    """List the scan / sort problems in a traditional EXPLAIN result"""
+    problems = []
+    for row in plan_rows:
+        table = row.get('table') or ''
+        # Derived tables (e.g. VALUES constructors) are built from the statement itself
+        if table.startswith('<'):
+            continue
+        if row.get('type') in FULL_SCAN_TYPES:
+            problems.append((f"full {'index' if row['type'] == 'index' else 'table'} scan", table))
+        extra = row.get('Extra') or ''
+        for bad in BAD_EXTRAS:
+            if bad in extra:
+                problems.append((bad, table))
+    return problems
+
+
+def main():
+    db = mysql.connector.connect(**db_config)
+    cursor = db.cursor(dictionary=True)
+    failures = 0
+
+    try:
+        for name, sql, params, allowed in hot_queries(*sample_values(cursor)):
+            cursor.execute("EXPLAIN " + sql, params)
+            problems = plan_problems(cursor.fetchall())
+            unexpected = [(problem, table) for problem, table in problems if problem not in allowed]
+
+            if unexpected:
+                failures += 1
+                details = ", ".join(f"{problem} on {table}" for problem, table in unexpected)
+                print(f"FAIL {name}: {details}")
+            else:
+                notes = "; ".join(f"{problem} allowed ({allowed[problem]})" for problem, _ in problems)
+                print(f"ok   {name}" + (f" - {notes}" if notes else ""))
+    finally:
+        # EXPLAIN of INSERT doesn't write, but never leave a transaction open
+        db.rollback()
+        cursor.close()
+        db.close()
+
+    if failures:
+        print(f"{failures} hot quer{'y' if failures == 1 else 'ies'} regressed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Negotiated response compression (brotli when installed, else gzip).
+
+compress_response() is an after_request hook: JSON, NDJSON, CSV and text
+bodies of at least COMPRESS_MIN_BYTES are compressed for clients that accept
+it, and streamed bodies (the export) are compressed chunk by chunk as they
+are produced. PrecompressedBody keeps the compressed variants of a body that
+is served many times, such as a cached survey document, so they are only
+computed once.
+"""
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies are sent as they are: compression wouldn't save a packet
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+# Levels for bodies compressed per request; precompressed bodies use the maximum
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+# Preferred first
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate(request):
+    """Best encoding the client accepts (honouring q-values), or None for identity"""
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def gzip_compressor(level):
+    # wbits 31: gzip container rather than raw zlib
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+def compress(body, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else BROTLI_QUALITY)
+    compressor = gzip_compressor(9 if best else GZIP_LEVEL)
+    return compressor.compress(body) + compressor.flush()
+
+
+def streaming_compressor(encoding):
+    """
+    (compress, finish) functions for compressing a body chunk by chunk.
+    Each chunk is flushed, so whatever the app has yielded (an export chunk,
+    an import progress line) reaches the client without waiting for more.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+    compressor = gzip_compressor(GZIP_LEVEL)
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+class PrecompressedBody:
+    """A response body and its compressed variants, each computed on first use"""
+
+    def __init__(self, body):
+        self.body = body
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """The body in `encoding` (None for identity)"""
+        if encoding is None:
+            return self.body
+        with self._lock:
+            if encoding not in self._encoded:
+                self._encoded[encoding] = compress(self.body, encoding, best=True)
+            return self._encoded[encoding]
+
+    def for_request(self, request):
+        """(body, encoding) to send for the request's Accept-Encoding; encoding is None for identity"""
+        encoding = negotiate(request) if len(self.body) >= COMPRESS_MIN_BYTES else None
+        return self.encoded(encoding), encoding
+
+
+class CompressedStream:
+    """Compresses a streamed body chunk by chunk, closing the wrapped iterable when done"""
+
+    def __init__(self, chunks, encoding):
+        self.chunks = chunks
+        self.encoding = encoding
+
+    def __iter__(self):
+        compress_chunk, finish = streaming_compressor(self.encoding)
+        for chunk in self.chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress_chunk(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    def close(self):
+        if hasattr(self.chunks, 'close'):
+            self.chunks.close()
+
+
+def encoded_etag(etag, encoding):
+    """A distinct strong validator per encoding, since the bytes differ"""
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def compressible(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and 'Content-Encoding' not in response.headers
+        # Files sent with send_file (audio) are passed through untouched
+        and not getattr(response, 'direct_passthrough', False)
+    )
+
+
+def compress_response(response, request):
+    """Compress response in place for the client's Accept-Encoding, if worthwhile"""
+    if not compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request)
+    if encoding is None or request.method == 'HEAD':
+        return response
+
+    if response.is_streamed:
+        response.response = CompressedStream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress(body, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
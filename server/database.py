@@ -1,11 +1,19 @@
+import logging
 import mysql.connector
-from mysql.connector import pooling
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 
+from cache import TTLCache
+from metrics import InstrumentedCursor, pool_wait, read_routing
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Get environment
 ENVIRONMENT = os.getenv('FLASK_ENV', 'development')
 
@@ -14,55 +22,373 @@ db_config = {
     'host': os.getenv('DB_HOST', 'localhost'),
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME', 'audio_survey'),
-    'pool_name': 'mypool',
-    'pool_size': 5
+    'database': os.getenv('DB_NAME', 'audio_survey')
 }
 
 # Add SSL configuration for production
 if ENVIRONMENT == 'production':
     db_config.update({
         'ssl_ca': os.getenv('DB_SSL_CA'),  # SSL certificate authority
-        'ssl_verify_cert': True,
-        'pool_size': 10  # Increased pool size for production
+        'ssl_verify_cert': True
     })
 
+# Connection pool settings
+pool_config = {
+    # Maximum open connections (larger default in production)
+    'size': int(os.getenv('DB_POOL_SIZE', 10 if ENVIRONMENT == 'production' else 5)),
+    # Seconds a request waits for a free connection before giving up
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+    # Connections older than this many seconds are closed and reopened
+    'recycle': float(os.getenv('DB_POOL_RECYCLE', 1800)),
+    # Connections idle for longer than this many seconds are pinged before reuse
+    'ping_after': float(os.getenv('DB_POOL_PING_AFTER', 30))
+}
+
+# Optional read replica (DB_REPLICA_HOST). Pointing it at the primary's own host
+# runs the two pools against one instance, which is enough to test the routing
+replica_config = None
+if os.getenv('DB_REPLICA_HOST'):
+    replica_config = {
+        **db_config,
+        'host': os.getenv('DB_REPLICA_HOST'),
+        'port': int(os.getenv('DB_REPLICA_PORT', 3306)),
+        'user': os.getenv('DB_REPLICA_USER', db_config['user']),
+        'password': os.getenv('DB_REPLICA_PASSWORD', db_config['password'])
+    }
+
+replica_pool_config = {
+    **pool_config,
+    'size': int(os.getenv('DB_REPLICA_POOL_SIZE', pool_config['size']))
+}
+
+read_routing_config = {
+    # Reads fall back to the primary while the replica is further behind than this (seconds)
+    'max_lag': float(os.getenv('DB_REPLICA_MAX_LAG', 2)),
+    # How often replication lag is measured (seconds)
+    'lag_check_interval': float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 1)),
+    # Reads by a user who wrote within this many seconds go to the primary
+    'sticky_seconds': float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5))
+}
+
+class PoolTimeout(mysql.connector.errors.PoolError):
+    """No connection became free within the pool's checkout timeout"""
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the underlying MySQL connection;
+    close() hands it back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, pool, cnx, created_at):
+        self._pool = pool
+        self._cnx = cnx
+        self._created_at = created_at
+        self.replica = pool.replica
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def cursor(self, *args, **kwargs):
+        # Every statement run through the pool is timed and counted for /metrics
+        return InstrumentedCursor(self._cnx.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._cnx is not None:
+            self._pool._release(self._cnx, self._created_at)
+            self._cnx = None
+
+    def discard(self):
+        """Disconnect instead of going back to the pool, e.g. with a result left unread"""
+        if self._cnx is not None:
+            self._pool._release(self._cnx, self._created_at, reuse=False)
+            self._cnx = None
+
+
+class ConnectionPool:
+    """
+    Bounded MySQL connection pool.
+    - get_connection() waits up to `timeout` seconds for a free slot instead of failing immediately
+    - connections idle for more than `ping_after` seconds are pinged before reuse, and
+      connections older than `recycle` seconds are reopened, so MySQL restarts and
+      wait_timeout disconnects never reach a request
+    - wait time, in-use count and checkout failures are tracked for metrics
+    """
+
+    def __init__(self, config, size, timeout, recycle, ping_after, replica=False):
+        self.config = config
+        self.replica = replica
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connections_opened = 0
+        self.connections_discarded = 0
+
+    def get_connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.checkout_failures += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        waited = time.perf_counter() - start
+        pool_wait.observe(waited)
+
+        try:
+            cnx, created_at = self._checkout_idle() or self._open()
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self.checkout_failures += 1
+            raise
+
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return PooledConnection(self, cnx, created_at)
+
+    def _open(self):
+        cnx = mysql.connector.connect(**self.config)
+        with self._lock:
+            self.connections_opened += 1
+        return cnx, time.monotonic()
+
+    def _checkout_idle(self):
+        """Most recently used healthy idle connection, or None"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                cnx, created_at, released_at = self._idle.pop()
+
+            now = time.monotonic()
+            if now - created_at > self.recycle:
+                self._discard(cnx)
+                continue
+            if now - released_at > self.ping_after:
+                try:
+                    cnx.ping(reconnect=False)
+                except mysql.connector.Error:
+                    self._discard(cnx)
+                    continue
+            return cnx, created_at
+
+    def _release(self, cnx, created_at, reuse=True):
+        try:
+            if not reuse:
+                self._discard(cnx)
+                return
+            # End the implicit transaction (and its snapshot) left by reads
+            if cnx.in_transaction:
+                cnx.rollback()
+            with self._lock:
+                self._idle.append((cnx, created_at, time.monotonic()))
+        except mysql.connector.Error:
+            # Broken or busy with an unread result: don't hand it out again
+            self._discard(cnx)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _discard(self, cnx):
+        with self._lock:
+            self.connections_discarded += 1
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "connections_opened": self.connections_opened,
+                "connections_discarded": self.connections_discarded
+            }
+
+
+class ReadRouter:
+    """
+    Sends read-only queries to the replica pool, except:
+    - reads by a user who wrote in the last `sticky_seconds` (read-your-writes)
+    - while measured replication lag exceeds `max_lag`, or lag can't be measured
+    - when no replica connection can be checked out
+    which all go to the primary instead.
+    """
+
+    def __init__(self, primary, replica, max_lag, lag_check_interval, sticky_seconds):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._recent_writers = TTLCache(maxsize=100000, ttl=sticky_seconds)
+        self._lag = 0.0
+        self._lag_checked_at = float('-inf')
+        self._lag_lock = threading.Lock()
+        self._lag_cnx = None
+
+    def mark_write(self, user_id):
+        self._recent_writers.set(user_id, True)
+
+    def replica_lag(self):
+        """Seconds the replica is behind, re-measured at most every lag_check_interval"""
+        stale = time.monotonic() - self._lag_checked_at >= self.lag_check_interval
+        # One request measures; the others use the last value rather than wait
+        if stale and self._lag_lock.acquire(blocking=False):
+            try:
+                self._lag = self._measure_lag()
+                self._lag_checked_at = time.monotonic()
+            finally:
+                self._lag_lock.release()
+        return self._lag
+
+    def _measure_lag(self):
+        try:
+            if self._lag_cnx is None or not self._lag_cnx.is_connected():
+                self._lag_cnx = mysql.connector.connect(**self.replica.config)
+            cursor = self._lag_cnx.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+                status = cursor.fetchall()
+            finally:
+                cursor.close()
+        except mysql.connector.Error as err:
+            logger.warning("Could not measure replica lag, reading from the primary: %s", err)
+            self._lag_cnx = None
+            return float('inf')
+        if not status:
+            # Not a replica (e.g. the primary itself under a second pool)
+            return 0.0
+        lag = status[0].get('Seconds_Behind_Source')
+        # NULL means replication is stopped or broken
+        return float('inf') if lag is None else float(lag)
+
+    def get_connection(self, user_id=None):
+        if user_id is not None and self._recent_writers.get(user_id):
+            read_routing.inc(1, 'primary', 'sticky')
+            return self.primary.get_connection()
+        if self.replica_lag() > self.max_lag:
+            read_routing.inc(1, 'primary', 'lagging')
+            return self.primary.get_connection()
+        try:
+            connection = self.replica.get_connection()
+        except PoolTimeout:
+            # Replica saturated: shed the read rather than move the load onto the primary
+            raise
+        except mysql.connector.Error as err:
+            logger.warning("Replica unavailable, reading from the primary: %s", err)
+            read_routing.inc(1, 'primary', 'unavailable')
+            return self.primary.get_connection()
+        read_routing.inc(1, 'replica', 'ok')
+        return connection
+
+    def stats(self):
+        lag = self._lag
+        return {
+            "lag_seconds": lag if lag != float('inf') else -1,
+            **{f"pool_{name}": value for name, value in self.replica.stats().items()}
+        }
+
+
 # Create connection pool
 connection_pool = None
+# Replica routing, only when DB_REPLICA_HOST is set
+read_router = None
 
 def init_db():
-    global connection_pool
+    """
+    Create the connection pools and check that the schema is up to date.
+    Connections open on first use; the check costs one query. Calling it
+    again once the pools exist does nothing.
+    """
+    global connection_pool, read_router
+    if connection_pool is not None:
+        return
     try:
-        connection_pool = mysql.connector.pooling.MySQLConnectionPool(**db_config)
-        print(f"Database connection pool created successfully in {ENVIRONMENT} environment")
-        
-        # Test the connection
+        connection_pool = ConnectionPool(db_config, **pool_config)
+        logger.info("Database connection pool created successfully in %s environment", ENVIRONMENT)
+        if replica_config:
+            read_router = ReadRouter(
+                connection_pool,
+                ConnectionPool(replica_config, replica=True, **replica_pool_config),
+                **read_routing_config
+            )
+            logger.info("Routing reads to the replica at %s", replica_config['host'])
+
+        from migrations import check_schema
+        # The connection stays in the pool for the first request
         conn = get_db_connection()
-        if conn:
-            print(f"Successfully connected to the database at {db_config['host']}")
-            # Execute the init.sql file
-            with open('sql/init.sql', 'r') as file:
-                sql_script = file.read()
-            cursor = conn.cursor()
-            # Split and execute multiple statements if present
-            for statement in sql_script.split(';'):
-                if statement.strip():
-                    cursor.execute(statement)
-            conn.commit()
-            cursor.close()
-            print("Database initialized successfully")
+        try:
+            version = check_schema(conn)
+        finally:
+            conn.close()
+        logger.info("Connected to the database at %s, schema version %d", db_config['host'], version)
     except mysql.connector.Error as err:
-        print(f"Error creating connection pool: {err}")
+        logger.error("Error creating connection pool: %s", err)
         raise
 
 def get_db_connection():
+    """
+    Check a connection out of the pool, waiting up to DB_POOL_TIMEOUT seconds.
+    Call close() on it to return it.
+    """
     try:
         connection = connection_pool.get_connection()
         return connection
     except mysql.connector.Error as err:
-        print(f"Error getting connection from pool: {err}")
+        logger.error("Error getting connection from pool: %s", err)
         raise
 
+def get_read_connection(user_id=None):
+    """
+    Connection for a read-only handler: a replica connection when one is
+    configured and fresh enough for this user, otherwise the primary.
+    Never use it for writes.
+    """
+    if read_router is None:
+        return get_db_connection()
+    return read_router.get_connection(user_id)
+
+def mark_write(user_id):
+    """Pin user_id's reads to the primary for DB_READ_YOUR_WRITES_SECONDS after a write"""
+    if read_router is not None:
+        read_router.mark_write(user_id)
+
+def pool_stats():
+    """Pool sizing, wait time and failure counters"""
+    return connection_pool.stats() if connection_pool else {}
+
+def replica_stats():
+    """Replica lag (-1 if unknown) and replica pool counters"""
+    return read_router.stats() if read_router else {}
+
+def multi_row_values(row_template, rows):
+    """
+    Build the VALUES list and flattened parameters for a multi-row statement,
+    so a whole batch of rows goes to the server in a single round trip.
+    Returns (placeholders, params)
+    """
+    placeholders = ", ".join([row_template] * len(rows))
+    params = [value for row in rows for value in row]
+    return placeholders, params
+
 def close_db_connection(connection):
     if connection:
         connection.close() 
\ No newline at end of file
@@ -0,0 +1,142 @@
+import csv
+import heapq
+import io
+import os
+
+from archive import ARCHIVE_SEGMENTS_QUERY, archived_responses, response_order, survey_segments
+from keys import to_str
+from serialization import dumps_bytes
+
+# Rows fetched from the server-side cursor, and responses written, per chunk
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+EXPORT_QUESTIONS_QUERY = """
+    SELECT id, question
+    FROM questions
+    WHERE survey_id = %s
+    ORDER BY created_at, id
+"""
+
+# Walks responses in (survey_id, created_at, id) index order, so the answers
+# of one response arrive together and nothing has to be sorted or buffered
+EXPORT_RESPONSES_QUERY = """
+    SELECT r.id, r.created_at, a.question_id, a.answer
+    FROM responses r
+    LEFT JOIN answers a ON a.response_id = r.id
+    WHERE r.survey_id = %s
+    ORDER BY r.created_at, r.id
+"""
+
+def iter_responses(cursor, chunk_size):
+    """
+    Group consecutive (response_id, created_at, question_id, answer) rows
+    into (response_id, created_at, {question_id: answer}) tuples
+    """
+    current = None
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for response_id, created_at, question_id, answer in rows:
+            if current is None or current[0] != response_id:
+                if current is not None:
+                    yield current
+                current = (bytes(response_id), created_at, {})
+            if question_id is not None:
+                current[2][bytes(question_id)] = answer
+    if current is not None:
+        yield current
+
+def csv_writer(buffer, questions):
+    """Pivoted CSV: one row per response, one column per question"""
+    writer = csv.writer(buffer)
+    writer.writerow(['response_id', 'created_at'] + [question for _, question in questions])
+
+    def write(response_id, created_at, answers):
+        writer.writerow(
+            [to_str(response_id), created_at.isoformat()]
+            + [answers.get(question_id, '') for question_id, _ in questions]
+        )
+    return write
+
+def ndjson_writer(buffer, questions):
+    """One JSON object per line per response, answers keyed by question id"""
+    def write(response_id, created_at, answers):
+        buffer.write(dumps_bytes({
+            'id': to_str(response_id),
+            'created_at': created_at.isoformat(),
+            'answers': {to_str(question_id): answer for question_id, answer in answers.items()}
+        }, sort_keys=False).decode('utf-8'))
+        buffer.write('\n')
+    return write
+
+WRITERS = {
+    'csv': csv_writer,
+    'ndjson': ndjson_writer
+}
+
+class ExportStream:
+    """
+    Iterable of CSV or NDJSON text chunks for a survey's responses.
+    Rows are read through an unbuffered cursor, and archived responses are
+    streamed from their segments and merged in by (created_at, id), so memory
+    stays flat however many responses there are. Takes ownership of db: the
+    WSGI server calls close() when the response ends, even if the client
+    disconnects early.
+    """
+
+    def __init__(self, db, survey_key, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+        self.db = db
+        self.cursor = db.cursor()
+        self.survey_key = survey_key
+        self.export_format = export_format
+        self.chunk_size = chunk_size
+        self.finished = False
+        self.closed = False
+
+    def __iter__(self):
+        cursor = self.cursor
+        cursor.execute(EXPORT_QUESTIONS_QUERY, (self.survey_key,))
+        questions = [(bytes(question_id), question) for question_id, question in cursor.fetchall()]
+
+        cursor.execute(ARCHIVE_SEGMENTS_QUERY, (self.survey_key,))
+        segments = survey_segments(cursor.fetchall())
+
+        buffer = io.StringIO()
+        write = WRITERS[self.export_format](buffer, questions)
+        cursor.execute(EXPORT_RESPONSES_QUERY, (self.survey_key,))
+
+        responses = iter_responses(cursor, self.chunk_size)
+        if segments:
+            responses = heapq.merge(archived_responses(segments), responses, key=response_order)
+
+        pending = 0
+        for response_id, created_at, answers in responses:
+            write(response_id, created_at, answers)
+            pending += 1
+            if pending >= self.chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        yield buffer.getvalue()
+        self.finished = True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if not self.finished:
+            # Stream ended early (usually a client disconnect): the rest of the
+            # result may be most of the export, so drop the connection rather
+            # than read it all off to make it reusable
+            self.db.discard()
+            return
+        self.cursor.close()
+        self.db.close()
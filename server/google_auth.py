@@ -1,17 +1,112 @@
 import os
+import re
+import time
+import hashlib
+import threading
 from functools import wraps
 from flask import request, jsonify, session, redirect, url_for
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 import json
+from cache import TTLCache
+from metrics import auth_verify
 
 # Get Google OAuth credentials from environment variables
 CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
 REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', 'http://localhost:5000/api/auth/callback')
 
-# This would typically be replaced by a database in production
-user_database = {}
+# Registered user profiles ({user_id, email, name, created_at}) keyed by Google user id,
+# backed by the users table (see routes/user.py)
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('USER_CACHE_TTL', 300))
+)
+
+# Verified ID tokens, keyed by SHA-256 of the raw token and expiring at the token's `exp`
+token_cache = TTLCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 4096)))
+
+# Optional local key set ({kid: PEM certificate or public key}) used instead of
+# Google's signing certificates, e.g. for tests and benchmarks
+TEST_CERTS_FILE = os.environ.get('GOOGLE_AUTH_TEST_CERTS')
+test_certs = None
+
+
+class CachingCertsRequest:
+    """
+    Transport shared by all token verifications.
+    Reuses one HTTP session and caches GET responses (the signing certificates)
+    for as long as the response's Cache-Control max-age allows. The session
+    (and the requests/urllib3 stack behind it) is created on first use, so
+    importing this module stays cheap.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _request(self, url, method='GET', **kwargs):
+        if self._session is None:
+            from google.auth.transport import requests as google_requests
+            with self._lock:
+                if self._session is None:
+                    self._session = google_requests.Request()
+        return self._session(url, method=method, **kwargs)
+
+    def __call__(self, url, method='GET', **kwargs):
+        if method != 'GET':
+            return self._request(url, method=method, **kwargs)
+
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached and cached[1] > time.time():
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        response = self._request(url, method=method, **kwargs)
+        max_age = _parse_max_age(response.headers)
+        if response.status == 200 and max_age:
+            with self._lock:
+                self._cache[url] = (response, time.time() + max_age)
+        return response
+
+
+def _parse_max_age(headers):
+    """Extract max-age (seconds) from a Cache-Control header, if any"""
+    cache_control = headers.get('cache-control') or headers.get('Cache-Control') or ''
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+certs_request = CachingCertsRequest()
+
+
+def set_test_certs(certs):
+    """
+    Enable test mode: verify tokens against a local key set instead of Google's.
+    Pass None to switch back to Google verification.
+    """
+    global test_certs
+    test_certs = certs
+    token_cache.clear()
+
+
+if TEST_CERTS_FILE:
+    with open(TEST_CERTS_FILE, 'r') as file:
+        set_test_certs(json.load(file))
+
+
+def get_auth_cache_stats():
+    """Hit/miss counters for the verified-token and signing-certificate caches"""
+    return {
+        "tokens": token_cache.stats(),
+        "certs": {
+            "hits": certs_request.hits,
+            "misses": certs_request.misses
+        }
+    }
 
 def get_google_auth_url():
     """Generate the Google OAuth URL for authorization"""
@@ -53,26 +148,46 @@ def exchange_code_for_token(code):
     
     return response.json()
 
+def token_cache_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def token_user_info(idinfo):
+    """User information carried by a verified ID token"""
+    return {
+        "user_id": idinfo['sub'],
+        "email": idinfo['email'],
+        "name": idinfo.get('name', ''),
+        "picture": idinfo.get('picture', '')
+    }
+
 def verify_google_token(token):
     """Verify Google ID token and extract user information"""
+    start = time.perf_counter()
+    cache_key = token_cache_key(token)
+    cached_user = token_cache.get(cache_key)
+    if cached_user:
+        auth_verify.observe(time.perf_counter() - start, 'cached')
+        return dict(cached_user)
+
     try:
         # Specify the CLIENT_ID of the app that accesses the backend
-        idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), CLIENT_ID)
+        if test_certs is not None:
+            from google.auth import jwt
+            idinfo = jwt.decode(token, certs=test_certs, audience=CLIENT_ID)
+        else:
+            from google.oauth2 import id_token
+            idinfo = id_token.verify_oauth2_token(token, certs_request, CLIENT_ID)
         
         # ID token is valid, extract user information
-        user_info = {
-            "user_id": idinfo['sub'],
-            "email": idinfo['email'],
-            "name": idinfo.get('name', ''),
-            "picture": idinfo.get('picture', '')
-        }
+        user_info = token_user_info(idinfo)
         
-        # In a real application, you would store/retrieve this user from your database
-        user_database[idinfo['sub']] = user_info
+        token_cache.set(cache_key, user_info, expires_at=idinfo['exp'])
+        auth_verify.observe(time.perf_counter() - start, 'verified')
         
-        return user_info
+        return dict(user_info)
     except ValueError:
         # Invalid token
+        auth_verify.observe(time.perf_counter() - start, 'rejected')
         return None
 
 def get_user_by_token(auth_header):
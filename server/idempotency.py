@@ -0,0 +1,227 @@
+"""
+Idempotency-Key support for the create endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+first attempt's response replayed (with Idempotent-Replayed: true) instead of
+creating a second survey or response. Completed results are kept in a
+bounded TTL cache; a duplicate that arrives while the first request is still
+running waits for it rather than racing it. Results with a 5xx status (or an
+exception) aren't kept, so the next retry runs the request again.
+
+Keys are scoped per endpoint and per user (create_survey) or survey
+(submissions), and bound to a hash of the request body: reusing a key for a
+different request is refused with 422. Results live in process memory, so a
+retry only replays when it reaches the same worker process.
+
+Replays are answered by early_replay(), a before_request hook that runs ahead
+of admission control, so a well-behaved retry neither takes a concurrency
+slot nor spends a rate limit token, and a duplicate waits for the original
+without holding a slot.
+"""
+import hashlib
+import os
+import threading
+from functools import wraps
+
+from flask import current_app, request, jsonify, make_response, Response
+
+from cache import TTLCache
+from google_auth import get_user_by_token
+from keys import parse_id, to_str
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Longest accepted key (clients typically send a UUID)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Completed results kept for replay, and for how long
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000))
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+# How long a duplicate waits for the first request to finish before a 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+
+# (scope key) -> StoredResponse
+completed = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+
+
+class StoredResponse:
+    """A finished response to replay for retries with the same key"""
+
+    def __init__(self, fingerprint, status, body, mimetype):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.body = body
+        self.mimetype = mimetype
+
+
+class InFlight:
+    """
+    Requests currently running, by scope key; duplicates wait on the first
+    one's event (a threading.Event, or asyncio.Event in the async mode)
+    """
+
+    def __init__(self, event_class=threading.Event):
+        self.event_class = event_class
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """None if the caller now owns key, else the event to wait on"""
+        with self._lock:
+            event = self._events.get(key)
+            if event is None:
+                self._events[key] = self.event_class()
+            return event
+
+    def get(self, key):
+        """The running request's event, or None, without claiming key"""
+        with self._lock:
+            return self._events.get(key)
+
+    def finish(self, key):
+        with self._lock:
+            event = self._events.pop(key)
+        event.set()
+
+    def __len__(self):
+        return len(self._events)
+
+in_flight = InFlight()
+
+
+def survey_subject(survey_id):
+    """Canonical form of a survey id from the URL (as get_survey keys its cache), so every spelling shares keys"""
+    return to_str(parse_id(survey_id)) or survey_id
+
+
+def request_subject(scope, request):
+    """The user (after auth_required) or survey a key is scoped to"""
+    return request.user['user_id'] if scope == 'user' else survey_subject(request.view_args['survey_id'])
+
+
+def scope_key(endpoint, subject, idempotency_key):
+    """Cache key for a request: the endpoint, its user or survey, and the client's key"""
+    return f'{endpoint}:{subject}:{idempotency_key}'
+
+
+def fingerprint(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def cacheable(status):
+    """Whether a result is final: 5xx responses and throttling are retried for real"""
+    return status < 500 and status != 429
+
+
+def key_error(idempotency_key):
+    """Error message for a malformed key, or None"""
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+    return None
+
+KEY_REUSED_ERROR = "Idempotency-Key was already used for a different request"
+STILL_RUNNING_ERROR = "A request with this Idempotency-Key is still being processed"
+
+
+def replay(stored, request_fingerprint):
+    """The stored response, or a 422 if the key was first used for a different request"""
+    if stored.fingerprint != request_fingerprint:
+        return jsonify({"error": KEY_REUSED_ERROR}), 422
+    response = Response(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def still_running():
+    response = jsonify({"error": STILL_RUNNING_ERROR})
+    response.headers['Retry-After'] = '1'
+    return response, 409
+
+
+def idempotent_scope(view):
+    """The scope an @idempotent view was declared with, or None"""
+    return getattr(view, 'idempotency_scope', None)
+
+
+def early_replay():
+    """
+    before_request hook, registered ahead of admission control: answer a
+    retry from its original's stored result, waiting for the original first
+    if it is still running. Returns None when the request has to run.
+    """
+    scope = idempotent_scope(current_app.view_functions.get(request.endpoint))
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    if scope is None or not idempotency_key or key_error(idempotency_key):
+        return None
+    if scope == 'user':
+        # auth_required hasn't run yet; verified tokens are cached, so this costs a lookup
+        user = get_user_by_token(request.headers.get('Authorization'))
+        if not user:
+            return None
+        subject = user['user_id']
+    else:
+        subject = survey_subject(request.view_args['survey_id'])
+
+    key = scope_key(request.endpoint, subject, idempotency_key)
+    stored = completed.get(key)
+    if stored is None:
+        running = in_flight.get(key)
+        if running is None:
+            return None
+        if not running.wait(IDEMPOTENCY_WAIT_TIMEOUT):
+            return still_running()
+        stored = completed.get(key)
+        if stored is None:
+            # The original failed: this retry runs the request itself
+            return None
+    return replay(stored, fingerprint(request.get_data(cache=True)))
+
+
+def idempotent(scope):
+    """
+    Honour an Idempotency-Key header on a create endpoint.
+    scope is 'user' (after auth_required) or 'survey' (the survey_id view argument).
+    Retries of finished requests are normally answered by early_replay().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return f(*args, **kwargs)
+            error = key_error(idempotency_key)
+            if error:
+                return jsonify({"error": error}), 400
+
+            key = scope_key(request.endpoint, request_subject(scope, request), idempotency_key)
+            request_fingerprint = fingerprint(request.get_data(cache=True))
+            while True:
+                stored = completed.get(key)
+                if stored is not None:
+                    return replay(stored, request_fingerprint)
+                running = in_flight.claim(key)
+                if running is None:
+                    break
+                if not running.wait(IDEMPOTENCY_WAIT_TIMEOUT):
+                    return still_running()
+                # The first request finished: replay its result, or take over if it failed
+
+            try:
+                # A result may have been stored between the lookup and the claim
+                stored = completed.get(key)
+                if stored is not None:
+                    return replay(stored, request_fingerprint)
+                response = make_response(f(*args, **kwargs))
+                if cacheable(response.status_code) and not response.is_streamed:
+                    completed.set(key, StoredResponse(
+                        request_fingerprint, response.status_code, response.get_data(), response.mimetype
+                    ))
+                return response
+            finally:
+                in_flight.finish(key)
+        # Copied onto the outer decorators' wrappers by functools.wraps
+        decorated.idempotency_scope = scope
+        return decorated
+    return decorator
+
+
+def stats():
+    return {**completed.stats(), "in_flight": len(in_flight)}
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from analytics import record_responses
+from database import get_db_connection, multi_row_values
+from pagination import id_list_placeholders
+
+logger = logging.getLogger(__name__)
+
+# 'sync' writes submissions straight to MySQL; 'spool' appends them to a local
+# durable spool and a background flusher drains it into MySQL in batches
+INGEST_MODE = os.getenv('RESPONSE_INGEST_MODE', 'sync')
+SPOOL_PATH = os.getenv('INGEST_SPOOL_PATH', 'spool/responses.sqlite3')
+# Responses per flush transaction
+FLUSH_BATCH_SIZE = int(os.getenv('INGEST_FLUSH_BATCH_SIZE', 500))
+# Seconds the flusher sleeps when the spool is empty
+FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 0.5))
+# Rows per multi-row INSERT inside a flush
+INSERT_CHUNK_SIZE = 1000
+
+EXISTING_RESPONSES_QUERY = """
+    SELECT id FROM responses WHERE id IN ({ids})
+"""
+
+# Responses whose survey was deleted since they were spooled are dropped by the join.
+# created_at is the flush time, not the enqueue time: a row stamped in the past
+# would land behind `since` cursors that pollers have already moved beyond
+FLUSH_RESPONSES_QUERY = """
+    INSERT INTO responses (id, survey_id, created_at)
+    SELECT v.id, s.id, CURRENT_TIMESTAMP
+    FROM (VALUES {placeholders}) AS v (id, survey_id)
+    JOIN surveys s ON s.id = v.survey_id
+"""
+
+FLUSH_ANSWERS_QUERY = """
+    INSERT INTO answers (id, response_id, question_id, answer)
+    SELECT v.id, r.id, q.id, v.answer
+    FROM (VALUES {placeholders}) AS v (id, response_id, question_id, answer)
+    JOIN responses r ON r.id = v.response_id
+    JOIN questions q ON q.id = v.question_id AND q.survey_id = r.survey_id
+"""
+
+def enabled():
+    return INGEST_MODE == 'spool'
+
+
+class ResponseSpool:
+    """
+    Append-only SQLite spool of accepted survey responses.
+    An entry is only removed after its batch has been committed to MySQL,
+    so anything still in the file after a crash is replayed on restart.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Every append is fsynced before the client gets its 202
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spool (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                response_id BLOB NOT NULL UNIQUE,
+                survey_id BLOB NOT NULL,
+                answers TEXT NOT NULL,
+                enqueued_at REAL NOT NULL
+            )
+            """
+        )
+
+    def append(self, response_id, survey_id, answer_rows):
+        """Durably record a response; answer_rows are (answer_id, question_id, answer)"""
+        answers = json.dumps([
+            [answer_id.hex(), question_id.hex(), answer]
+            for answer_id, question_id, answer in answer_rows
+        ])
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO spool (response_id, survey_id, answers, enqueued_at) VALUES (?, ?, ?, ?)",
+                (response_id, survey_id, answers, time.time())
+            )
+
+    def peek(self, limit):
+        """Oldest `limit` entries as (seq, response_id, survey_id, answer_rows, enqueued_at)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, response_id, survey_id, answers, enqueued_at FROM spool ORDER BY seq LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            (
+                seq, bytes(response_id), bytes(survey_id),
+                [
+                    (bytes.fromhex(answer_id), bytes.fromhex(question_id), answer)
+                    for answer_id, question_id, answer in json.loads(answers)
+                ],
+                enqueued_at
+            )
+            for seq, response_id, survey_id, answers, enqueued_at in rows
+        ]
+
+    def remove_through(self, seq):
+        """Drop every entry up to and including seq, once it is committed to MySQL"""
+        with self._lock:
+            self._db.execute("DELETE FROM spool WHERE seq <= ?", (seq,))
+
+    def depth(self):
+        """Number of responses waiting to be flushed, and the oldest one's enqueue time"""
+        with self._lock:
+            count, oldest = self._db.execute("SELECT COUNT(*), MIN(enqueued_at) FROM spool").fetchone()
+        return count, oldest
+
+
+def write_batch(db, batch):
+    """
+    Insert a batch of spooled responses in one transaction.
+    Responses that are already in MySQL (a replay after a crash between
+    commit and spool removal) are skipped, making delivery idempotent.
+    Returns the number of responses written.
+    """
+    cursor = db.cursor()
+    try:
+        response_ids = [entry[1] for entry in batch]
+        cursor.execute(
+            EXISTING_RESPONSES_QUERY.format(ids=id_list_placeholders(response_ids)),
+            response_ids
+        )
+        existing = {bytes(row[0]) for row in cursor.fetchall()}
+        batch = [entry for entry in batch if entry[1] not in existing]
+
+        response_rows = [(response_id, survey_id) for _, response_id, survey_id, _, _ in batch]
+        answer_rows = [
+            (answer_id, response_id, question_id, answer)
+            for _, response_id, _, answers, _ in batch
+            for answer_id, question_id, answer in answers
+        ]
+        for start in range(0, len(response_rows), INSERT_CHUNK_SIZE):
+            placeholders, params = multi_row_values("ROW(%s, %s)", response_rows[start:start + INSERT_CHUNK_SIZE])
+            cursor.execute(FLUSH_RESPONSES_QUERY.format(placeholders=placeholders), params)
+        for start in range(0, len(answer_rows), INSERT_CHUNK_SIZE):
+            placeholders, params = multi_row_values("ROW(%s, %s, %s, %s)", answer_rows[start:start + INSERT_CHUNK_SIZE])
+            cursor.execute(FLUSH_ANSWERS_QUERY.format(placeholders=placeholders), params)
+        record_responses(cursor, [response_id for response_id, _ in response_rows])
+
+        db.commit()
+        return len(batch)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class SpoolFlusher(threading.Thread):
+    """Background thread draining the spool into MySQL in batched transactions"""
+
+    def __init__(self, spool):
+        super().__init__(name='ingest-flusher', daemon=True)
+        self.spool = spool
+        self.stopping = threading.Event()
+        self.flushed = 0
+        self.failures = 0
+        self.last_flush_seconds = 0.0
+        self.last_flush_at = None
+
+    def flush_once(self):
+        """Flush one batch; returns the number of spool entries processed"""
+        batch = self.spool.peek(FLUSH_BATCH_SIZE)
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        db = get_db_connection()
+        try:
+            self.flushed += write_batch(db, batch)
+        finally:
+            db.close()
+        self.spool.remove_through(batch[-1][0])
+        self.last_flush_seconds = time.perf_counter() - start
+        self.last_flush_at = time.time()
+        return len(batch)
+
+    def run(self):
+        backoff = FLUSH_INTERVAL
+        while not self.stopping.is_set():
+            try:
+                if self.flush_once() < FLUSH_BATCH_SIZE:
+                    self.stopping.wait(FLUSH_INTERVAL)
+                backoff = FLUSH_INTERVAL
+            except Exception as err:
+                # Entries stay in the spool and are retried
+                self.failures += 1
+                logger.error("Error flushing response spool: %s", err)
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        self.stopping.set()
+
+
+spool = None
+flusher = None
+
+def start():
+    """Open the spool and start the flusher; anything left from a previous run is replayed"""
+    global spool, flusher
+    spool = ResponseSpool(SPOOL_PATH)
+    flusher = SpoolFlusher(spool)
+    flusher.start()
+    depth, _ = spool.depth()
+    logger.info("Response ingestion spool at %s (%d responses pending)", SPOOL_PATH, depth)
+
+def enqueue(response_id, survey_id, answer_rows):
+    spool.append(response_id, survey_id, answer_rows)
+
+def stats():
+    """Spool depth and flush lag (age of the oldest unflushed response, in seconds)"""
+    if spool is None:
+        return {"mode": INGEST_MODE}
+    depth, oldest = spool.depth()
+    return {
+        "mode": INGEST_MODE,
+        "spool_depth": depth,
+        "flush_lag_seconds": time.time() - oldest if oldest else 0.0,
+        "flushed_total": flusher.flushed,
+        "flush_failures_total": flusher.failures,
+        "last_flush_seconds": flusher.last_flush_seconds
+    }
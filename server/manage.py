@@ -0,0 +1,194 @@
+"""
+Maintenance commands for the survey API.
+
+Usage (from the server directory):
+    python manage.py migrate [--status | --to VERSION]
+    python manage.py rebuild-stats [--survey SURVEY_ID]
+    python manage.py process-audio [--workers N]
+    python manage.py import SURVEY_ID FILE [--format csv|ndjson] [--offset N] [--batch-size N]
+    python manage.py archive [--survey SURVEY_ID] [--months N | --closed]
+"""
+import argparse
+import os
+import sys
+import time
+
+from database import init_db, get_db_connection
+from keys import parse_id, to_str
+
+
+def rebuild_stats(args):
+    """Recompute the analytics summary tables from the raw responses and answers"""
+    from analytics import rebuild_survey_stats
+
+    db = get_db_connection()
+    try:
+        if args.survey:
+            survey_key = parse_id(args.survey)
+            if survey_key is None:
+                print(f"Invalid survey id: {args.survey}")
+                return 1
+            survey_keys = [survey_key]
+        else:
+            cursor = db.cursor()
+            cursor.execute("SELECT id FROM surveys ORDER BY created_at, id")
+            survey_keys = [bytes(row[0]) for row in cursor.fetchall()]
+            cursor.close()
+
+        # One transaction per survey keeps lock time short
+        for i, survey_key in enumerate(survey_keys, 1):
+            rebuild_survey_stats(db, survey_key)
+            print(f"[{i}/{len(survey_keys)}] rebuilt stats for survey {to_str(survey_key)}")
+    finally:
+        db.close()
+    return 0
+
+
+def process_audio(args):
+    """Trim and measure every finished audio recording that hasn't been processed yet"""
+    from audio_worker import AudioProcessor
+
+    processor = AudioProcessor(args.workers)
+    pending = processor.submit_pending()
+    print(f"processing {pending} recordings with {args.workers} workers")
+    processor.close()
+
+    stats = processor.stats()
+    print(
+        f"{stats['processed_total']} processed, {stats['unsupported_total']} not PCM WAV, "
+        f"{stats['failed_total']} failed; {stats['audio_seconds_total']:.0f}s of audio trimmed to "
+        f"{stats['speech_seconds_total']:.0f}s"
+    )
+    return 1 if stats['failed_total'] else 0
+
+
+def import_responses(args):
+    """Bulk-load responses into a survey from a CSV or NDJSON file ('-' for stdin)"""
+    from bulk_import import IMPORT_BATCH_SIZE, READERS, InvalidImport, ResponseImporter, load_questions
+
+    survey_key = parse_id(args.survey)
+    if survey_key is None:
+        print(f"Invalid survey id: {args.survey}")
+        return 1
+    import_format = args.format or ('ndjson' if args.file.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+    source = sys.stdin if args.file == '-' else open(args.file, newline='', encoding='utf-8')
+    db = get_db_connection()
+    importer = ResponseImporter(db, survey_key, args.batch_size or IMPORT_BATCH_SIZE)
+    try:
+        cursor = db.cursor()
+        questions = load_questions(cursor, survey_key)
+        cursor.close()
+        if not questions:
+            print(f"Survey {args.survey} doesn't exist or has no questions")
+            return 1
+
+        start = time.monotonic()
+        for progress in importer.run(READERS[import_format](source, questions), args.offset):
+            elapsed = time.monotonic() - start
+            print(
+                f"offset {progress['offset']}: {progress['imported']} imported, {progress['skipped']} already present, "
+                f"{progress['invalid']} invalid ({progress['imported'] / max(elapsed, 1e-9):.0f} responses/s)"
+            )
+        for error in importer.errors:
+            print(f"record {error['record']}: {error['error']}")
+        return 1 if importer.invalid else 0
+    except InvalidImport as e:
+        print(f"Can't import {args.file}: {e}")
+        return 1
+    except (Exception, KeyboardInterrupt) as e:
+        print(f"Import stopped ({e or type(e).__name__}); resume with --offset {importer.offset}")
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        db.close()
+
+
+def archive_responses(args):
+    """Move old responses (or all of a closed survey's) to compressed cold storage"""
+    from datetime import datetime
+    from archive import ARCHIVE_PATH, archive_cutoff, run_archival
+
+    survey_keys = None
+    if args.survey:
+        survey_key = parse_id(args.survey)
+        if survey_key is None:
+            print(f"Invalid survey id: {args.survey}")
+            return 1
+        survey_keys = [survey_key]
+    elif args.closed:
+        print("--closed needs --survey")
+        return 1
+
+    if args.closed:
+        cutoff = datetime.now()
+    else:
+        cutoff = archive_cutoff() if args.months is None else archive_cutoff(args.months)
+    result = run_archival(cutoff, survey_keys)
+    if result is None:
+        print("Another process is archiving, try again later")
+        return 1
+    archived, segments = result
+    print(f"archived {archived} responses created before {cutoff:%Y-%m-%d %H:%M} in {segments} segments under {ARCHIVE_PATH}")
+    return 0
+
+
+def migrate_schema(args):
+    """Apply pending schema migrations from sql/migrations (or list them with --status)"""
+    from database import db_config
+    from migrations import latest_version, migrate, migration_status
+
+    if args.status:
+        for version, name, state in migration_status(db_config):
+            print(f"{version:04d}_{name:<32} {state}")
+        return 0
+
+    applied = migrate(db_config, args.to)
+    for version, name in applied:
+        print(f"applied {version:04d}_{name}")
+    if not applied:
+        print(f"nothing to apply, the newest migration is {latest_version():04d}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Survey API maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    schema = commands.add_parser('migrate', help=migrate_schema.__doc__)
+    schema.add_argument('--status', action='store_true', help='list migrations and whether each is applied')
+    schema.add_argument('--to', type=int, help='stop after this version (default: the newest)')
+    schema.set_defaults(handler=migrate_schema)
+
+    rebuild = commands.add_parser('rebuild-stats', help=rebuild_stats.__doc__)
+    rebuild.add_argument('--survey', help='only rebuild this survey (default: all surveys)')
+    rebuild.set_defaults(handler=rebuild_stats)
+
+    process = commands.add_parser('process-audio', help=process_audio.__doc__)
+    process.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: one per CPU)')
+    process.set_defaults(handler=process_audio)
+
+    load = commands.add_parser('import', help=import_responses.__doc__)
+    load.add_argument('survey', help='survey id')
+    load.add_argument('file', help="CSV or NDJSON file, or '-' for stdin")
+    load.add_argument('--format', choices=['csv', 'ndjson'], help='default: ndjson for .ndjson/.jsonl files, else csv')
+    load.add_argument('--offset', type=int, default=0, help='records to skip, from an interrupted run')
+    load.add_argument('--batch-size', type=int, help='responses per transaction (default: IMPORT_BATCH_SIZE)')
+    load.set_defaults(handler=import_responses)
+
+    archive = commands.add_parser('archive', help=archive_responses.__doc__)
+    archive.add_argument('--survey', help='only archive this survey (default: all surveys)')
+    archive.add_argument('--months', type=int, help='archive responses older than this many months (default: ARCHIVE_AFTER_MONTHS)')
+    archive.add_argument('--closed', action='store_true', help="archive all of the survey's responses, up to now")
+    archive.set_defaults(handler=archive_responses)
+
+    args = parser.parse_args(argv)
+    if args.handler is not migrate_schema:
+        # The other commands need the schema the code expects
+        init_db()
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
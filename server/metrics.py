@@ -0,0 +1,264 @@
+"""
+In-process Prometheus metrics: request and query latency histograms, row
+counters and a slow-query log. Rendered in the Prometheus text format by
+render() for the /metrics endpoint.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this many seconds are logged with their SQL
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', 0.5))
+# Longest SQL text written to the slow-query log
+SLOW_QUERY_LOG_LENGTH = 500
+
+# Latency buckets in seconds, from sub-millisecond queries to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# "SELECT ... FROM questions" -> ("select", "questions"); keeps statement labels low-cardinality
+STATEMENT_PATTERN = re.compile(r'^\s*(\w+)\s+`?(\w+)?')
+TABLE_PATTERN = re.compile(r'\b(?:FROM|INTO|TABLE)\s+(?:IF NOT EXISTS\s+)?`?(\w+)', re.IGNORECASE)
+
+
+class Metric:
+    """Base for labelled metrics: subclasses yield (sample name, labels, value)"""
+
+    type_name = 'untyped'
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type_name}'
+        for sample_name, labels, value in self.samples():
+            yield f'{sample_name}{format_labels(labels)} {format_value(value)}'
+
+
+class Counter(Metric):
+    """Monotonic counter with optional labels"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram with optional labels"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': format_value(bound)}, cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class GaugeCollector:
+    """Gauges read at scrape time from a callable returning {name: value}"""
+
+    type_name = 'gauge'
+
+    def __init__(self, prefix, documentation, collect):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.collect = collect
+
+    def lines(self):
+        for name, value in sorted(self.collect().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f'# HELP {self.prefix}_{name} {self.documentation}'
+                yield f'# TYPE {self.prefix}_{name} gauge'
+                yield f'{self.prefix}_{name} {format_value(value)}'
+
+
+registry = []
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+
+request_duration = register(Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, per route',
+    labels=('endpoint', 'method', 'status')
+))
+query_duration = register(Histogram(
+    'db_query_duration_seconds', 'Time to execute a SQL statement, per statement kind and table',
+    labels=('statement', 'table')
+))
+query_rows = register(Counter(
+    'db_query_rows_total', 'Rows fetched or affected, per statement kind and table',
+    labels=('statement', 'table')
+))
+slow_queries = register(Counter(
+    'db_slow_queries_total', 'Statements slower than SLOW_QUERY_SECONDS',
+    labels=('statement', 'table')
+))
+read_routing = register(Counter(
+    'db_read_routing_total', 'Read-only connections handed out, by target and reason',
+    labels=('target', 'reason')
+))
+pool_wait = register(Histogram('db_pool_wait_seconds', 'Time spent waiting for a pooled connection'))
+rate_limited = register(Counter(
+    'http_rate_limited_total', 'Requests refused with 429, per endpoint and limit scope (ip, survey)',
+    labels=('endpoint', 'scope')
+))
+admission_rejected = register(Counter(
+    'http_admission_rejected_total', 'Requests shed with 503 by the concurrency limiter, by reason',
+    labels=('reason',)
+))
+auth_verify = register(Histogram(
+    'auth_verify_seconds', 'Time to verify an ID token, by outcome (cached, verified, rejected)',
+    labels=('result',)
+))
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.lines())
+    return '\n'.join(lines) + '\n'
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(sql):
+    """(statement kind, table) for a SQL string, e.g. ('select', 'questions')"""
+    match = STATEMENT_PATTERN.match(sql)
+    if not match:
+        return 'other', ''
+    kind = match.group(1).lower()
+    if kind == 'update':
+        return kind, (match.group(2) or '').lower()
+    table = TABLE_PATTERN.search(sql)
+    return kind, table.group(1).lower() if table else ''
+
+
+def record_statement(operation, elapsed, rows=0, labels=None):
+    """Observe one executed statement: duration, rows, and the slow-query log"""
+    labels = labels or statement_labels(operation)
+    query_duration.observe(elapsed, *labels)
+    if rows > 0:
+        query_rows.inc(rows, *labels)
+    if elapsed >= SLOW_QUERY_SECONDS:
+        slow_queries.inc(1, *labels)
+        logger.warning(
+            "Slow query (%.3fs): %s",
+            elapsed, ' '.join(operation.split())[:SLOW_QUERY_LOG_LENGTH]
+        )
+
+
+class InstrumentedCursor:
+    """
+    Wraps a MySQL cursor to time each statement and count the rows it returns
+    or affects. Anything else is passed through to the wrapped cursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._labels = ('other', '')
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._labels = statement_labels(operation)
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._labels = statement_labels(operation)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._record(operation, time.perf_counter() - start)
+
+    def _record(self, operation, elapsed):
+        # Statements without a result set report affected rows straight away
+        rows = self._cursor.rowcount if not self._cursor.with_rows else 0
+        record_statement(operation, elapsed, rows, self._labels)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            query_rows.inc(1, *self._labels)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        if rows:
+            query_rows.inc(len(rows), *self._labels)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if rows:
+            query_rows.inc(len(rows), *self._labels)
+        return rows
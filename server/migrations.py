@@ -0,0 +1,232 @@
+"""
+Versioned schema migrations.
+
+Each file in sql/migrations is one migration, named NNNN_description.sql and
+applied in version order by `python manage.py migrate`. Applied versions are
+recorded in `schema_migrations`, so every file runs once per database; at
+boot, init_db() only compares the recorded version with the newest file.
+
+MySQL commits DDL implicitly, so a migration that fails halfway stays half
+applied. Duplicate column and index errors are skipped, which makes re-running
+an additive migration (and adopting a database created before this runner
+existed) safe.
+"""
+import hashlib
+import logging
+import os
+import re
+
+import mysql.connector
+from mysql.connector import errorcode
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+# Held while migrating, so processes migrating at boot don't apply a file twice
+MIGRATION_LOCK_NAME = 'audio_survey.migrate'
+MIGRATION_LOCK_TIMEOUT = 60
+
+# Errors raised when re-running additive DDL (ADD COLUMN / CREATE INDEX) on an up-to-date schema
+IDEMPOTENT_DDL_ERRORS = {
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME
+}
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT UNSIGNED PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SCHEMA_VERSION_QUERY = "SELECT MAX(version) FROM schema_migrations"
+
+APPLIED_MIGRATIONS_QUERY = "SELECT version, checksum FROM schema_migrations"
+
+RECORD_MIGRATION_QUERY = """
+    INSERT INTO schema_migrations (version, name, checksum)
+    VALUES (%s, %s, %s)
+"""
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the newest migration shipped with the code"""
+
+
+def available_migrations():
+    """(version, name, path) of every migration file, oldest first"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_PATH):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_PATH, filename)))
+    return sorted(migrations)
+
+def latest_version():
+    migrations = available_migrations()
+    return migrations[-1][0] if migrations else 0
+
+def split_statements(script):
+    """
+    Split a SQL script on the semicolons that end statements, ignoring those
+    inside quoted strings, identifiers and comments. Comments are dropped.
+    """
+    statements = []
+    current = []
+    i = 0
+    while i < len(script):
+        char = script[i]
+        if char in "'\"`":
+            # Copy the quoted run, honouring backslash escapes and doubled quotes
+            end = i + 1
+            while end < len(script):
+                if script[end] == '\\' and char != '`':
+                    end += 2
+                    continue
+                if script[end] == char:
+                    if script[end + 1:end + 2] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(script[i:end + 1])
+            i = end + 1
+        elif script.startswith('--', i) or char == '#':
+            end = script.find('\n', i)
+            i = len(script) if end == -1 else end
+        elif script.startswith('/*', i):
+            end = script.find('*/', i + 2)
+            i = len(script) if end == -1 else end + 2
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+def connect(config):
+    """Connect to the configured database, creating it first if it doesn't exist yet"""
+    try:
+        return mysql.connector.connect(**config)
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_BAD_DB_ERROR:
+            raise
+    server_config = {key: value for key, value in config.items() if key != 'database'}
+    cnx = mysql.connector.connect(**server_config)
+    cursor = cnx.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{config['database']}`")
+    cursor.close()
+    cnx.close()
+    return mysql.connector.connect(**config)
+
+def schema_version(cursor):
+    """Newest applied migration, or 0 if the database has never been migrated"""
+    try:
+        cursor.execute(SCHEMA_VERSION_QUERY)
+        version = cursor.fetchall()[0][0]
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        return 0
+    return version or 0
+
+def check_schema(cnx):
+    """
+    Boot-time check: one query comparing the database's schema version with
+    the newest migration file. Raises SchemaOutOfDate if the database is behind.
+    """
+    cursor = cnx.cursor()
+    try:
+        current = schema_version(cursor)
+    finally:
+        cursor.close()
+    latest = latest_version()
+    if current < latest:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {current}, the code needs {latest}: run `python manage.py migrate`"
+        )
+    if current > latest:
+        # e.g. during a rollback to an older release; migrations only add to the schema
+        logger.warning("Database schema version %d is newer than this code's %d", current, latest)
+    return current
+
+def apply_migration(cnx, version, name, path):
+    with open(path, 'r') as file:
+        script = file.read()
+    cursor = cnx.cursor()
+    try:
+        for statement in split_statements(script):
+            try:
+                cursor.execute(statement)
+            except mysql.connector.Error as err:
+                if err.errno not in IDEMPOTENT_DDL_ERRORS:
+                    raise
+        cursor.execute(RECORD_MIGRATION_QUERY, (version, name, hashlib.sha256(script.encode('utf-8')).hexdigest()))
+        cnx.commit()
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def migrate(config, target=None):
+    """
+    Apply every migration newer than the database's version, up to target
+    (default: all). Returns the (version, name) of each migration applied.
+    """
+    cnx = connect(config)
+    cursor = cnx.cursor()
+    applied = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if not cursor.fetchall()[0][0]:
+            raise RuntimeError(f"Another process held the migration lock for {MIGRATION_LOCK_TIMEOUT}s")
+        try:
+            cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+            current = schema_version(cursor)
+            for version, name, path in available_migrations():
+                if version <= current or (target is not None and version > target):
+                    continue
+                logger.info("Applying migration %04d_%s", version, name)
+                apply_migration(cnx, version, name, path)
+                applied.append((version, name))
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        cnx.close()
+    return applied
+
+def migration_status(config):
+    """(version, name, state) per migration file; state is applied, pending or changed since applied"""
+    cnx = connect(config)
+    cursor = cnx.cursor()
+    try:
+        try:
+            cursor.execute(APPLIED_MIGRATIONS_QUERY)
+            checksums = dict(cursor.fetchall())
+        except mysql.connector.Error as err:
+            if err.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+            checksums = {}
+    finally:
+        cursor.close()
+        cnx.close()
+
+    status = []
+    for version, name, path in available_migrations():
+        if version not in checksums:
+            state = 'pending'
+        else:
+            with open(path, 'r') as file:
+                checksum = hashlib.sha256(file.read().encode('utf-8')).hexdigest()
+            state = 'applied' if checksum == checksums[version] else 'changed since applied'
+        status.append((version, name, state))
+    return status
@@ -0,0 +1,87 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+# Page sizes for keyset-paginated listings
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+def pack_position(position):
+    """Opaque URL-safe token for a JSON-serializable listing position"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii').rstrip('=')
+
+def unpack_position(token):
+    padded = token + '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+def unpack_id(hex_id):
+    row_id = bytes.fromhex(hex_id)
+    if len(row_id) != 16:
+        raise ValueError("Bad id in cursor")
+    return row_id
+
+def encode_cursor(created_at, row_id):
+    """
+    Build an opaque continuation token from the (created_at, id) position
+    of a row in a listing ordered by (created_at, id)
+    """
+    return pack_position([created_at.isoformat(), bytes(row_id).hex()])
+
+def decode_cursor(token):
+    """
+    Decode a continuation token back into (created_at, id).
+    Raises ValueError for tokens that weren't produced by encode_cursor.
+    """
+    try:
+        created_at, row_id = unpack_position(token)
+        return datetime.fromisoformat(created_at), unpack_id(row_id)
+    except (TypeError, ValueError, UnicodeError) as err:
+        raise ValueError("Invalid cursor") from err
+
+def encode_score_cursor(score, row_id):
+    """Continuation token for a listing ranked by (score DESC, id), such as search results"""
+    return pack_position([score, bytes(row_id).hex()])
+
+def decode_score_cursor(token):
+    """
+    Decode a token from encode_score_cursor back into (score, id).
+    Raises ValueError for tokens that weren't produced by encode_score_cursor.
+    """
+    try:
+        score, row_id = unpack_position(token)
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise ValueError("Bad score in cursor")
+        return float(score), unpack_id(row_id)
+    except (TypeError, ValueError, UnicodeError) as err:
+        raise ValueError("Invalid cursor") from err
+
+def parse_page_size(value):
+    """
+    Read a `limit` query parameter, clamped to MAX_PAGE_SIZE.
+    Raises ValueError for non-numeric or non-positive values.
+    """
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    page_size = int(value)
+    if page_size < 1:
+        raise ValueError("limit must be positive")
+    return min(page_size, MAX_PAGE_SIZE)
+
+def id_list_placeholders(ids):
+    """Placeholders for an `IN (...)` list of ids"""
+    return ", ".join(["%s"] * len(ids))
+
+def keyset_condition(position, descending=True):
+    """
+    SQL condition (and its params) selecting rows strictly past `position`
+    in a listing ordered by (created_at, id)
+    """
+    if position is None:
+        return "", []
+    created_at, row_id = position
+    operator = '<' if descending else '>'
+    return (
+        f"AND (created_at {operator} %s OR (created_at = %s AND id {operator} %s))",
+        [created_at, created_at, row_id]
+    )
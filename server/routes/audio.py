@@ -0,0 +1,338 @@
+from flask import Blueprint, request, jsonify, send_file
+from auth_helpers import auth_required
+from audio_store import ChunkRejected, UploadBusy, file_sha256, get_store, recording_extension
+from database import get_db_connection, get_read_connection
+from keys import new_id, parse_id, to_str
+import audio_worker
+import os
+import re
+
+audio_bp = Blueprint('audio', __name__)
+
+# Largest recording accepted, and largest single chunk request
+AUDIO_MAX_BYTES = int(os.getenv('AUDIO_MAX_BYTES', 100 * 1024 * 1024))
+AUDIO_MAX_CHUNK_BYTES = int(os.getenv('AUDIO_MAX_CHUNK_BYTES', 8 * 1024 * 1024))
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+SHA256_PATTERN = re.compile(r'^[0-9a-fA-F]{64}$')
+
+# The question must belong to the response's survey
+ANSWER_TARGET_QUERY = """
+    SELECT 1
+    FROM responses r
+    JOIN questions q ON q.survey_id = r.survey_id
+    WHERE r.id = %s AND q.id = %s
+"""
+
+UPLOAD_BY_ANSWER_QUERY = """
+    SELECT id, content_type, total_bytes, status
+    FROM audio_uploads
+    WHERE response_id = %s AND question_id = %s
+"""
+
+UPLOAD_QUERY = """
+    SELECT id, content_type, total_bytes, expected_sha256, sha256, status
+    FROM audio_uploads
+    WHERE id = %s
+"""
+
+INSERT_UPLOAD_QUERY = """
+    INSERT INTO audio_uploads (id, response_id, question_id, content_type, total_bytes, expected_sha256)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+COMPLETE_UPLOAD_QUERY = """
+    UPDATE audio_uploads
+    SET status = 'complete', sha256 = %s, completed_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND status = 'uploading'
+"""
+
+# Recordings are only served to the owner of the survey they were recorded for
+OWNED_RECORDING_QUERY = """
+    SELECT au.id, au.content_type, au.sha256, au.total_bytes, au.completed_at,
+        au.processing_status, au.duration_seconds, au.speech_seconds, au.speech_ratio,
+        au.rms_dbfs, au.processed_bytes, au.processed_at
+    FROM audio_uploads au
+    JOIN responses r ON r.id = au.response_id
+    JOIN surveys s ON s.id = r.survey_id
+    WHERE au.response_id = %s AND au.question_id = %s
+        AND au.status = 'complete' AND s.user_id = %s
+"""
+
+def upload_offset(upload_id, content_type, total_bytes, status):
+    store = get_store()
+    key = to_str(upload_id)
+    if status == 'complete' or store.finished(key, recording_extension(content_type)):
+        # A finished file whose row is still 'uploading' only needs the row updated
+        return total_bytes
+    return store.offset(key)
+
+def upload_state(upload_id, content_type, total_bytes, status):
+    return {
+        "upload_id": to_str(upload_id),
+        "offset": upload_offset(upload_id, content_type, total_bytes, status),
+        "total_bytes": total_bytes,
+        "upload_status": status,
+        "max_chunk_bytes": AUDIO_MAX_CHUNK_BYTES,
+        "status": "success"
+    }
+
+@audio_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start (or resume) the audio upload for one answer
+    Public endpoint - no authentication required, like submitting a response
+    Expected JSON format:
+    {
+        "response_id": "...",
+        "question_id": "...",
+        "content_type": "audio/webm",
+        "total_bytes": 123456,
+        "sha256": "<hex digest of the whole recording>"  (optional)
+    }
+    Returns the upload id and the offset to continue from
+    With RESPONSE_INGEST_MODE=spool, a response is only known here once it has
+    been flushed to MySQL: until then this returns 404, and clients should retry
+    """
+    data = request.get_json()
+    if not data or not all(field in data for field in ('response_id', 'question_id', 'content_type', 'total_bytes')):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    response_key = parse_id(data['response_id'])
+    question_key = parse_id(data['question_id'])
+    if response_key is None or question_key is None:
+        return jsonify({"error": "Response or question not found"}), 404
+
+    content_type = str(data['content_type'])
+    total_bytes = data['total_bytes']
+    expected_sha256 = data.get('sha256')
+    if not content_type.startswith('audio/'):
+        return jsonify({"error": "content_type must be an audio type"}), 400
+    if not isinstance(total_bytes, int) or not 0 < total_bytes <= AUDIO_MAX_BYTES:
+        return jsonify({"error": f"total_bytes must be between 1 and {AUDIO_MAX_BYTES}"}), 400
+    if expected_sha256 is not None and not SHA256_PATTERN.match(str(expected_sha256)):
+        return jsonify({"error": "sha256 must be a hex SHA-256 digest"}), 400
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute(UPLOAD_BY_ANSWER_QUERY, (response_key, question_key))
+        existing = cursor.fetchone()
+        if existing:
+            upload_id, existing_type, existing_total, status = existing
+            if status == 'complete':
+                return jsonify({"error": "A recording was already uploaded for this answer"}), 409
+            if existing_total != total_bytes or existing_type != content_type:
+                return jsonify({"error": "An upload with a different size or type is in progress for this answer"}), 409
+            # Resume the upload in progress
+            return jsonify(upload_state(bytes(upload_id), existing_type, existing_total, status)), 200
+
+        cursor.execute(ANSWER_TARGET_QUERY, (response_key, question_key))
+        if not cursor.fetchone():
+            return jsonify({"error": "Response or question not found"}), 404
+
+        upload_id = new_id()
+        cursor.execute(
+            INSERT_UPLOAD_QUERY,
+            (upload_id, response_key, question_key, content_type, total_bytes,
+             expected_sha256.lower() if expected_sha256 else None)
+        )
+        db.commit()
+        return jsonify(upload_state(upload_id, content_type, total_bytes, 'uploading')), 201
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({
+            "error": "Failed to start upload",
+            "message": str(e)
+        }), 500
+    finally:
+        cursor.close()
+        db.close()
+
+def fetch_upload(upload_key):
+    """The upload's row as a dict, or None"""
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(UPLOAD_QUERY, (upload_key,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        db.close()
+
+@audio_bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """
+    Current offset of an upload, to resume after a dropped connection
+    Public endpoint - no authentication required
+    """
+    upload_key = parse_id(upload_id)
+    upload = fetch_upload(upload_key) if upload_key else None
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(upload_state(upload_key, upload['content_type'], upload['total_bytes'], upload['status'])), 200
+
+@audio_bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Append one chunk of the recording
+    Public endpoint - no authentication required
+    Required headers:
+        Content-Range: bytes <first>-<last>/<total_bytes>   (first must equal the current offset)
+        Content-Length: <chunk size>                        (at most AUDIO_MAX_CHUNK_BYTES)
+    Optional header:
+        X-Chunk-SHA256: <hex digest of this chunk>
+    The body is streamed to disk, never held in memory. Returns the new offset;
+    the final chunk also verifies the whole recording's checksum.
+    """
+    upload_key = parse_id(upload_id)
+    upload = fetch_upload(upload_key) if upload_key else None
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    if upload['status'] == 'complete':
+        return jsonify({"error": "Upload already complete"}), 409
+
+    match = CONTENT_RANGE_PATTERN.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return jsonify({"error": "Missing or invalid Content-Range header"}), 400
+    first, last, total = (int(value) for value in match.groups())
+    length = last - first + 1
+    if total != upload['total_bytes'] or length <= 0 or last >= total:
+        return jsonify({"error": "Content-Range doesn't match the upload"}), 400
+    if request.content_length is None:
+        return jsonify({"error": "Content-Length required"}), 411
+    if request.content_length != length:
+        return jsonify({"error": "Content-Length doesn't match Content-Range"}), 400
+    if length > AUDIO_MAX_CHUNK_BYTES:
+        return jsonify({"error": f"Chunks are limited to {AUDIO_MAX_CHUNK_BYTES} bytes"}), 413
+
+    store = get_store()
+    key = to_str(upload_key)
+    extension = recording_extension(upload['content_type'])
+    if store.finished(key, extension):
+        # The last chunk was already received and moved into recordings, but
+        # marking the upload complete failed: only retry that. Writing the chunk
+        # again would start a new, empty part file and restart the upload.
+        sha256 = file_sha256(store.recording_path(key, extension))
+    else:
+        try:
+            offset = store.write_chunk(key, first, request.stream, length, request.headers.get('X-Chunk-SHA256'))
+        except UploadBusy:
+            return jsonify({"error": "Another chunk of this upload is being written"}), 409
+        except ChunkRejected as e:
+            return jsonify({"error": "Chunk rejected", "message": str(e), "offset": store.offset(key)}), 400
+        except ValueError as e:
+            # Out-of-order chunk: tell the client where to continue from
+            return jsonify({"error": "Unexpected chunk offset", "message": str(e), "offset": store.offset(key)}), 409
+
+        if offset < upload['total_bytes']:
+            return jsonify(upload_state(upload_key, upload['content_type'], upload['total_bytes'], 'uploading')), 200
+
+        sha256, _ = store.finish(key, extension)
+        if upload['expected_sha256'] and sha256 != upload['expected_sha256']:
+            os.remove(store.recording_path(key, extension))
+            return jsonify({
+                "error": "Recording checksum mismatch, upload restarted",
+                "offset": 0
+            }), 422
+
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute(COMPLETE_UPLOAD_QUERY, (sha256, upload_key))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        return jsonify({
+            "error": "Failed to complete upload",
+            "message": str(e)
+        }), 500
+    finally:
+        cursor.close()
+        db.close()
+
+    # Trim, measure and compact it in the background
+    if audio_worker.enabled():
+        audio_worker.submit(key, upload['content_type'])
+
+    return jsonify({
+        **upload_state(upload_key, upload['content_type'], upload['total_bytes'], 'complete'),
+        "sha256": sha256
+    }), 201
+
+def fetch_owned_recording(user_id, response_id, question_id):
+    """The recording's row if user_id owns its survey, or None"""
+    response_key = parse_id(response_id)
+    question_key = parse_id(question_id)
+    if response_key is None or question_key is None:
+        return None
+
+    db = get_read_connection(user_id)
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(OWNED_RECORDING_QUERY, (response_key, question_key, user_id))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        db.close()
+
+@audio_bp.route('/<response_id>/<question_id>', methods=['GET'])
+@auth_required
+def get_recording(response_id, question_id):
+    """
+    Play back the recording for one answer
+    Requires authentication and ownership of the response's survey
+    Once processed, the silence-trimmed mono WAV is served; add ?original=true
+    for the file as uploaded.
+    Supports Range requests (206 Partial Content) and ETag / If-None-Match,
+    and the file is sent with the server's sendfile support when available
+    """
+    try:
+        recording = fetch_owned_recording(request.user['user_id'], response_id, question_id)
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch recording",
+            "message": str(e)
+        }), 500
+
+    if not recording:
+        return jsonify({"error": "Recording not found or access denied"}), 404
+
+    store = get_store()
+    upload_id = to_str(recording['id'])
+    if recording['processing_status'] == 'processed' and request.args.get('original', '').lower() != 'true':
+        path, mimetype, etag = store.processed_path(upload_id), 'audio/wav', recording['sha256'] + '-trimmed'
+    else:
+        path = store.recording_path(upload_id, recording_extension(recording['content_type']))
+        mimetype, etag = recording['content_type'], recording['sha256']
+    return send_file(
+        os.path.abspath(path),
+        mimetype=mimetype,
+        conditional=True,
+        etag=etag,
+        max_age=3600
+    )
+
+@audio_bp.route('/<response_id>/<question_id>/metadata', methods=['GET'])
+@auth_required
+def get_recording_metadata(response_id, question_id):
+    """
+    Size, checksum and post-processing results of the recording for one answer
+    Requires authentication and ownership of the response's survey
+    processing_status is null until the recording has been processed
+    """
+    try:
+        recording = fetch_owned_recording(request.user['user_id'], response_id, question_id)
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch recording",
+            "message": str(e)
+        }), 500
+
+    if not recording:
+        return jsonify({"error": "Recording not found or access denied"}), 404
+
+    recording['id'] = to_str(recording['id'])
+    return jsonify({"recording": recording, "status": "success"}), 200
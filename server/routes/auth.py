@@ -1,47 +1,42 @@
 from flask import Blueprint, request, jsonify, redirect, url_for
-from google_auth import get_google_auth_url, exchange_code_for_token, verify_google_token
-from database import get_db_connection
+from google_auth import get_google_auth_url, exchange_code_for_token, verify_google_token, user_cache
+from database import get_db_connection, PoolTimeout
 import mysql.connector
-from uuid import UUID
 
 auth_bp = Blueprint('auth', __name__)
 
+# Row alias form needs MySQL 8.0.19+. Affected rows: 1 = inserted, 2 = updated, 0 = unchanged
+UPSERT_USER_QUERY = """
+    INSERT INTO users (google_user_id, email, name)
+    VALUES (%s, %s, %s) AS new
+    ON DUPLICATE KEY UPDATE email = new.email, name = new.name
+"""
+
 def get_or_create_user(user_info):
     """
-    Check if user exists in database, if not create them.
+    Create the user, or refresh their email and name, in a single statement.
     Returns tuple (user_data, is_new_user)
     """
     db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    cursor = db.cursor()
     
     try:
-        # Check if user exists
-        cursor.execute(
-            "SELECT google_user_id, email, name FROM users WHERE google_user_id = %s",
-            (user_info['user_id'],)
-        )
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
-            return existing_user, False
-            
-        # Create new user if they don't exist
         cursor.execute(
-            """
-            INSERT INTO users (google_user_id, email, name)
-            VALUES (%s, %s, %s)
-            """,
+            UPSERT_USER_QUERY,
             (user_info['user_id'], user_info['email'], user_info['name'])
         )
+        is_new_user = cursor.rowcount == 1
         db.commit()
         
-        # Get the newly created user
-        cursor.execute(
-            "SELECT google_user_id, email, name FROM users WHERE google_user_id = %s",
-            (user_info['user_id'],)
-        )
-        new_user = cursor.fetchone()
-        return new_user, True
+        # The cached profile may hold a stale email or name
+        user_cache.pop(user_info['user_id'])
+        
+        user_data = {
+            'google_user_id': user_info['user_id'],
+            'email': user_info['email'],
+            'name': user_info['name']
+        }
+        return user_data, is_new_user
         
     finally:
         cursor.close()
@@ -121,6 +116,9 @@ def register():
             "status": "success"
         }), 200
         
+    except PoolTimeout:
+        # Answered with a 503 and Retry-After by the app's error handler
+        raise
     except mysql.connector.Error as err:
         return jsonify({
             "error": "Database error occurred",
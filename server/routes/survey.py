@@ -1,21 +1,270 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from auth_helpers import auth_required
-from database import get_db_connection
-import uuid
+from admission import rate_limited, release_slot_on_close, READ_PER_IP, READ_PER_SURVEY, SUBMIT_PER_IP, SUBMIT_PER_SURVEY
+from idempotency import idempotent
+from database import get_db_connection, get_read_connection, mark_write, multi_row_values
+from cache import TTLCache
+from compression import PrecompressedBody, encoded_etag
+from analytics import record_responses, survey_stats
+from export import EXPORT_FORMATS, EXPORT_QUESTIONS_QUERY, ExportStream
+from archive import ARCHIVE_SEGMENTS_QUERY, archived_page, survey_segments
+from bulk_import import READERS, ImportStream, InvalidImport, ResponseImporter, load_questions
+import ingest
+from keys import new_id, parse_id, to_bytes, to_str
+from serialization import dumps_bytes
+from pagination import (
+    decode_cursor, decode_score_cursor, encode_cursor, encode_score_cursor, id_list_placeholders,
+    keyset_condition, parse_page_size
+)
+from search import SEARCH_ANSWERS_QUERY, SEARCH_QUERY_MAX_LENGTH, search_hits, search_params
+import hashlib
+import io
+import itertools
+import os
 
 survey_bp = Blueprint('survey', __name__)
 
+# Serialized public survey documents, keyed by survey id
+survey_cache = TTLCache(
+    maxsize=int(os.getenv('SURVEY_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('SURVEY_CACHE_TTL', 60))
+)
+# Cache-Control max-age for public survey documents, so a CDN can absorb reads
+SURVEY_MAX_AGE = int(os.getenv('SURVEY_CACHE_MAX_AGE', 60))
+# Question ids per survey, used to validate spooled submissions without a transaction
+survey_questions_cache = TTLCache(maxsize=survey_cache.maxsize, ttl=survey_cache.ttl)
+
+# Hot queries, kept at module level so check_query_plans.py can EXPLAIN them
+USER_SURVEYS_PAGE_QUERY = """
+    SELECT id, title, system_prompt, created_at, updated_at
+    FROM surveys
+    WHERE user_id = %s {keyset}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s
+"""
+
+SURVEY_QUESTIONS_QUERY = """
+    SELECT survey_id, id, question, elaborate
+    FROM questions
+    WHERE survey_id IN ({ids})
+    ORDER BY survey_id, created_at, id
+"""
+
+SURVEY_OWNER_QUERY = """
+    SELECT 1 FROM surveys
+    WHERE id = %s AND user_id = %s
+"""
+
+RESPONSES_PAGE_QUERY = """
+    SELECT id, created_at
+    FROM responses
+    WHERE survey_id = %s {keyset}
+    ORDER BY created_at {direction}, id {direction}
+    LIMIT %s
+"""
+
+RESPONSE_ANSWERS_QUERY = """
+    SELECT
+        a.response_id,
+        q.id as question_id,
+        q.question,
+        a.answer
+    FROM answers a
+    JOIN questions q ON q.id = a.question_id
+    WHERE a.response_id IN ({ids})
+    ORDER BY q.created_at ASC, q.id ASC
+"""
+
+# One row per survey: the wide survey columns are not repeated per question
+SURVEY_HEADER_QUERY = """
+    SELECT s.id, s.title, s.system_prompt, s.created_at, s.updated_at, u.name
+    FROM surveys s
+    JOIN users u ON u.google_user_id = s.user_id
+    WHERE s.id = %s
+"""
+
+SURVEY_QUESTION_KEYS_QUERY = """
+    SELECT q.id
+    FROM surveys s
+    LEFT JOIN questions q ON q.survey_id = s.id
+    WHERE s.id = %s
+"""
+
+INSERT_RESPONSE_QUERY = """
+    INSERT INTO responses (id, survey_id)
+    SELECT %s, id FROM surveys WHERE id = %s
+"""
+
+INSERT_ANSWERS_QUERY = """
+    INSERT INTO answers (id, response_id, question_id, answer)
+    SELECT v.id, %s, q.id, v.answer
+    FROM (VALUES {placeholders}) AS v (id, question_id, answer)
+    JOIN questions q
+        ON q.id = v.question_id AND q.survey_id = %s
+"""
+
+def invalidate_survey(survey_id):
+    """
+    Drop the cached document for a survey.
+    Must be called by any write that changes a survey or its questions.
+    """
+    survey_key = to_bytes(survey_id)
+    survey_cache.pop(to_str(survey_key))
+    survey_questions_cache.pop(survey_key)
+
+def survey_question_keys(survey_key):
+    """Set of question ids for a survey, or None if the survey doesn't exist"""
+    question_keys = survey_questions_cache.get(survey_key)
+    if question_keys is not None:
+        return question_keys
+    
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute(SURVEY_QUESTION_KEYS_QUERY, (survey_key,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        db.close()
+    
+    if not rows:
+        return None
+    question_keys = frozenset(bytes(row[0]) for row in rows if row[0] is not None)
+    survey_questions_cache.set(survey_key, question_keys)
+    return question_keys
+
+def answer_rows(answers, question_keys=None):
+    """
+    (answer_id, question_key, answer) rows for a submission's {question_id: answer}
+    map, skipping malformed ids and, if given, ids not in question_keys
+    """
+    rows = []
+    for question_id, answer in answers.items():
+        question_key = parse_id(question_id)
+        if question_key is not None and (question_keys is None or question_key in question_keys):
+            rows.append((new_id(), question_key, answer))
+    return rows
+
+def spool_survey_response(survey_key, answers):
+    """
+    Validate a submission against the survey's questions and append it to the
+    ingestion spool; the flusher writes it to MySQL later
+    """
+    question_keys = survey_question_keys(survey_key)
+    if question_keys is None:
+        return jsonify({"error": "Survey not found"}), 404
+    
+    response_id = new_id()
+    ingest.enqueue(response_id, survey_key, answer_rows(answers, question_keys))
+    return jsonify({
+        "message": "Response accepted",
+        "response_id": to_str(response_id),
+        "status": "accepted"
+    }), 202
+
+def archived_answer_entries(questions, answers):
+    """
+    Answers of an archived response, shaped and ordered like RESPONSE_ANSWERS_QUERY
+    rows, given the survey's EXPORT_QUESTIONS_QUERY rows (from any cursor)
+    """
+    entries = []
+    for row in questions:
+        question_id, question = row.values() if isinstance(row, dict) else row
+        if bytes(question_id) in answers:
+            entries.append({
+                'question_id': to_str(question_id),
+                'question': question,
+                'answer': answers[bytes(question_id)]
+            })
+    return entries
+
+def survey_entry(survey_row):
+    """Listing entry for a USER_SURVEYS_PAGE_QUERY row, questions to be filled in"""
+    survey_id, title, system_prompt, created_at, updated_at = survey_row
+    return {
+        'id': to_str(survey_id),
+        'title': title,
+        'system_prompt': system_prompt,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'questions': []
+    }
+
+def add_questions(surveys, question_rows):
+    """
+    Append SURVEY_QUESTIONS_QUERY rows to their survey's 'questions' list,
+    surveys being keyed by survey id bytes
+    """
+    for survey_id, question_id, question, elaborate in question_rows:
+        surveys[bytes(survey_id)]['questions'].append({
+            'id': to_str(question_id),
+            'question': question,
+            'elaborate': elaborate
+        })
+
+def fetch_survey_detail(cursor, survey_key):
+    """
+    (SURVEY_HEADER_QUERY row, SURVEY_QUESTIONS_QUERY rows) for a survey,
+    or None if it doesn't exist. Needs a tuple cursor.
+    """
+    cursor.execute(SURVEY_HEADER_QUERY, (survey_key,))
+    # fetchall, so the unbuffered cursor has no unread result left
+    survey_rows = cursor.fetchall()
+    if not survey_rows:
+        return None
+    cursor.execute(SURVEY_QUESTIONS_QUERY.format(ids='%s'), (survey_key,))
+    return survey_rows[0], cursor.fetchall()
+
+def survey_document(survey_row, question_rows):
+    """
+    Serialize a SURVEY_HEADER_QUERY row and the survey's SURVEY_QUESTIONS_QUERY
+    rows into a cacheable document: the JSON body (with its compressed variants)
+    and its ETag
+    """
+    survey_id, title, system_prompt, created_at, updated_at, owner_name = survey_row
+    survey = {
+        'id': to_str(survey_id),
+        'title': title,
+        'system_prompt': system_prompt,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'owner_name': owner_name,
+        'questions': []
+    }
+    add_questions({bytes(survey_id): survey}, question_rows)
+    
+    body = dumps_bytes({
+        "survey": survey,
+        "status": "success"
+    })
+    return {
+        'body': PrecompressedBody(body),
+        'etag': hashlib.sha256(body).hexdigest()
+    }
+
+def survey_document_response(document):
+    """Build a cacheable, conditional response from a cached survey document"""
+    body, encoding = document['body'].for_request(request)
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(encoded_etag(document['etag'], encoding))
+    response.cache_control.public = True
+    response.cache_control.max_age = SURVEY_MAX_AGE
+    return response.make_conditional(request)
+
 @survey_bp.route('', methods=['POST'])
 @auth_required
+@idempotent('user')
 def create_survey():
     """
     Create a new survey with questions
     Requires authentication
+    A retry with the same Idempotency-Key header replays the first result
     """
     data = request.get_json()
-    print("data", data)
     user_id = request.user['user_id']  # Added by auth_required decorator
-    print("user_id", user_id)
     if not data:
         return jsonify({"error": "Missing survey data"}), 400
     
@@ -30,41 +279,46 @@ def create_survey():
     cursor = db.cursor(dictionary=True)
     
     try:
-        # Start transaction
-        cursor.execute("START TRANSACTION")
-        
+        # The connection is not in autocommit mode, so the first statement opens the transaction
         # Create survey
-        survey_id = uuid.uuid4()
+        survey_id = new_id()
         cursor.execute(
             """
             INSERT INTO surveys (id, user_id, title, system_prompt)
-            VALUES (UUID_TO_BIN(%s), %s, %s, %s)
+            VALUES (%s, %s, %s, %s)
             """,
-            (str(survey_id), user_id, data['title'], data['system_prompt'])
+            (survey_id, user_id, data['title'], data['system_prompt'])
         )
         
-        # Create questions
-        for question in data['questions']:
-            question_id = uuid.uuid4()
-            cursor.execute(
-                """
-                INSERT INTO questions (id, survey_id, question, elaborate)
-                VALUES (UUID_TO_BIN(%s), UUID_TO_BIN(%s), %s, %s)
-                """,
+        # Create all questions in one multi-row insert
+        placeholders, params = multi_row_values(
+            "(%s, %s, %s, %s)",
+            [
                 (
-                    str(question_id),
-                    str(survey_id),
+                    new_id(),
+                    survey_id,
                     question['question'],
                     question['elaborate']
                 )
-            )
+                for question in data['questions']
+            ]
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO questions (id, survey_id, question, elaborate)
+            VALUES {placeholders}
+            """,
+            params
+        )
         
         # Commit transaction
         db.commit()
+        # The creator's next reads must see this survey even if the replica lags
+        mark_write(user_id)
         
         return jsonify({
             "message": "Survey created successfully",
-            "survey_id": str(survey_id),
+            "survey_id": to_str(survey_id),
             "status": "success"
         }), 201
         
@@ -83,62 +337,53 @@ def create_survey():
 @auth_required
 def get_user_surveys():
     """
-    Get all surveys for the authenticated user
+    Get the authenticated user's surveys, newest first
     Requires authentication
+    Query parameters:
+        limit  - page size (default DEFAULT_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        cursor - `next_cursor` from the previous page
     """
     # Get user's google_id from the auth token (added by auth_required decorator)
     google_user_id = request.user['user_id']
     
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        position = decode_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+    
+    db = get_read_connection(google_user_id)
+    # Tuple rows: no per-row dict for what can be thousands of question rows
+    cursor = db.cursor()
     
     try:
-        # Query to get all surveys for the user
+        # One page of the user's surveys, walking the (user_id, created_at, id) index
+        keyset, keyset_params = keyset_condition(position)
         cursor.execute(
-            """
-            SELECT 
-                BIN_TO_UUID(s.id) as id,
-                s.title,
-                s.system_prompt,
-                s.created_at,
-                s.updated_at,
-                BIN_TO_UUID(q.id) as question_id,
-                q.question,
-                q.elaborate
-            FROM surveys s
-            LEFT JOIN questions q ON q.survey_id = s.id
-            WHERE s.user_id = %s 
-            ORDER BY s.created_at DESC, q.created_at ASC
-            """,
-            (google_user_id,)
+            USER_SURVEYS_PAGE_QUERY.format(keyset=keyset),
+            [google_user_id] + keyset_params + [page_size + 1]
         )
-        
         rows = cursor.fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
         
-        # Group questions by survey
-        surveys = {}
-        for row in rows:
-            survey_id = row['id']
-            if survey_id not in surveys:
-                surveys[survey_id] = {
-                    'id': survey_id,
-                    'title': row['title'],
-                    'system_prompt': row['system_prompt'],
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at'],
-                    'questions': []
-                }
-            
-            # Add question if it exists (handle surveys with no questions)
-            if row['question_id']:
-                surveys[survey_id]['questions'].append({
-                    'id': row['question_id'],
-                    'question': row['question'],
-                    'elaborate': row['elaborate']
-                })
+        surveys = {bytes(row[0]): survey_entry(row) for row in rows}
+        
+        # Questions for the whole page in one query; survey columns aren't repeated per question
+        if surveys:
+            survey_keys = list(surveys)
+            cursor.execute(
+                SURVEY_QUESTIONS_QUERY.format(ids=id_list_placeholders(survey_keys)),
+                survey_keys
+            )
+            add_questions(surveys, cursor.fetchall())
         
         return jsonify({
             "surveys": list(surveys.values()),
+            "next_cursor": encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None,
             "status": "success"
         }), 200
         
@@ -155,22 +400,39 @@ def get_user_surveys():
 @auth_required
 def get_survey_responses(survey_id):
     """
-    Get responses for a specific survey
+    Get responses for a specific survey, newest first
     Requires authentication and survey ownership
+    Query parameters:
+        limit  - page size (default DEFAULT_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        cursor - `next_cursor` from the previous page, to continue to older responses
+        since  - `since_cursor` from an earlier call; returns only responses created
+                 after it, oldest first, so polling dashboards fetch just the delta
     """
     user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
     
-    db = get_db_connection()
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        since = decode_cursor(request.args['since']) if 'since' in request.args else None
+        position = decode_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+    
+    db = get_read_connection(user_id)
     cursor = db.cursor(dictionary=True)
     
     try:
         # First check if the user owns this survey
         cursor.execute(
-            """
-            SELECT 1 FROM surveys 
-            WHERE id = UUID_TO_BIN(%s) AND user_id = %s
-            """,
-            (survey_id, user_id)
+            SURVEY_OWNER_QUERY,
+            (survey_key, user_id)
         )
         
         if not cursor.fetchone():
@@ -178,45 +440,64 @@ def get_survey_responses(survey_id):
                 "error": "Survey not found or access denied"
             }), 404
         
-        # Get all responses with their answers
+        # One page of responses, walking the (survey_id, created_at, id) index
+        descending = since is None
+        keyset, keyset_params = keyset_condition(position if descending else since, descending)
         cursor.execute(
-            """
-            SELECT 
-                BIN_TO_UUID(r.id) as response_id,
-                r.created_at as response_date,
-                BIN_TO_UUID(q.id) as question_id,
-                q.question,
-                a.answer
-            FROM responses r
-            JOIN answers a ON a.response_id = r.id
-            JOIN questions q ON q.id = a.question_id
-            WHERE r.survey_id = UUID_TO_BIN(%s)
-            ORDER BY r.created_at DESC, q.created_at ASC
-            """,
-            (survey_id,)
+            RESPONSES_PAGE_QUERY.format(keyset=keyset, direction='DESC' if descending else 'ASC'),
+            [survey_key] + keyset_params + [page_size + 1]
         )
+        rows = [(bytes(row['id']), row['created_at'], None) for row in cursor.fetchall()]
         
-        rows = cursor.fetchall()
+        # Merge in archived responses that belong on this page, read back from cold storage
+        cursor.execute(ARCHIVE_SEGMENTS_QUERY, (survey_key,))
+        segments = survey_segments(cursor.fetchall())
+        if segments:
+            rows = archived_page(rows, segments, position if descending else since, descending, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
         
-        # Group answers by response
         responses = {}
-        for row in rows:
-            response_id = row['response_id']
-            if response_id not in responses:
-                responses[response_id] = {
-                    'id': response_id,
-                    'created_at': row['response_date'],
-                    'answers': []
-                }
-            
-            responses[response_id]['answers'].append({
-                'question_id': row['question_id'],
-                'question': row['question'],
-                'answer': row['answer']
-            })
+        for response_id, created_at, _ in rows:
+            responses[response_id] = {
+                'id': to_str(response_id),
+                'created_at': created_at,
+                'answers': []
+            }
+        
+        # Answers for the whole page's hot responses in one query
+        hot_keys = [response_id for response_id, _, answers in rows if answers is None]
+        if hot_keys:
+            cursor.execute(
+                RESPONSE_ANSWERS_QUERY.format(ids=id_list_placeholders(hot_keys)),
+                hot_keys
+            )
+            for row in cursor.fetchall():
+                responses[bytes(row['response_id'])]['answers'].append({
+                    'question_id': to_str(row['question_id']),
+                    'question': row['question'],
+                    'answer': row['answer']
+                })
+        if len(hot_keys) < len(rows):
+            cursor.execute(EXPORT_QUESTIONS_QUERY, (survey_key,))
+            questions = cursor.fetchall()
+            for response_id, _, answers in rows:
+                if answers is not None:
+                    responses[response_id]['answers'] = archived_answer_entries(questions, answers)
+        
+        last_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if rows else None
+        if descending:
+            next_cursor = last_cursor if has_more else None
+            # Newest response on the first page is where polling picks up
+            since_cursor = encode_cursor(rows[0][1], rows[0][0]) if rows and not position else None
+        else:
+            since_cursor = last_cursor or request.args['since']
+            next_cursor = since_cursor if has_more else None
         
         return jsonify({
             "responses": list(responses.values()),
+            "next_cursor": next_cursor,
+            "since_cursor": since_cursor,
             "status": "success"
         }), 200
         
@@ -229,70 +510,294 @@ def get_survey_responses(survey_id):
         cursor.close()
         db.close()
 
-@survey_bp.route('/<survey_id>', methods=['GET'])
-def get_survey(survey_id):
+@survey_bp.route('/<survey_id>/export', methods=['GET'])
+@auth_required
+def export_survey_responses(survey_id):
     """
-    Get details of a specific survey including owner's name and all questions
-    Public endpoint - no authentication required
+    Stream all responses for a survey as CSV (one column per question) or NDJSON
+    Requires authentication and survey ownership
+    Query parameters:
+        format - csv (default) or ndjson
+    """
+    user_id = request.user['user_id']
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({
+            "error": f"Unsupported export format, expected one of: {', '.join(EXPORT_FORMATS)}"
+        }), 400
+    
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+    
+    db = get_read_connection(user_id)
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            SURVEY_OWNER_QUERY,
+            (survey_key, user_id)
+        )
+        owned = cursor.fetchone()
+        cursor.close()
+    except Exception as e:
+        db.close()
+        return jsonify({
+            "error": "Failed to export survey responses",
+            "message": str(e)
+        }), 500
+    
+    if not owned:
+        db.close()
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+    
+    # The stream owns the connection from here on and closes it when the response ends
+    return release_slot_on_close(Response(
+        ExportStream(db, survey_key, export_format),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="survey-{to_str(survey_key)}.{export_format}"'
+        }
+    ))
+
+@survey_bp.route('/<survey_id>/import', methods=['POST'])
+@auth_required
+def import_survey_responses(survey_id):
     """
+    Bulk-load historical responses from a streamed CSV or NDJSON body (see bulk_import.py)
+    Requires authentication and survey ownership
+    Query parameters:
+        format - csv or ndjson (default: from the Content-Type, else csv)
+        offset - records to skip, to resume an interrupted import
+    Streams NDJSON progress: one line per committed batch, then a summary
+    """
+    user_id = request.user['user_id']
+    import_format = request.args.get('format') or {
+        mimetype: name for name, mimetype in EXPORT_FORMATS.items()
+    }.get(request.mimetype, 'csv')
+    if import_format not in READERS:
+        return jsonify({
+            "error": f"Unsupported import format, expected one of: {', '.join(READERS)}"
+        }), 400
+    
+    try:
+        offset = int(request.args.get('offset', 0))
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid offset",
+            "message": str(e)
+        }), 400
+    
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+    
     db = get_db_connection()
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            SURVEY_OWNER_QUERY,
+            (survey_key, user_id)
+        )
+        owned = cursor.fetchone()
+        questions = load_questions(cursor, survey_key) if owned else None
+        cursor.close()
+        db.commit()
+        
+        if not owned:
+            db.close()
+            return jsonify({
+                "error": "Survey not found or access denied"
+            }), 404
+        
+        # Reading the first record checks the CSV header before anything is streamed back
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        records = READERS[import_format](lines, questions)
+        records = itertools.chain(list(itertools.islice(records, 1)), records)
+    except InvalidImport as e:
+        db.close()
+        return jsonify({
+            "error": "Invalid import file",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        db.close()
+        return jsonify({
+            "error": "Failed to import survey responses",
+            "message": str(e)
+        }), 500
+    
+    # The stream owns the connection from here on, reads the rest of the request
+    # body as it goes, and closes the connection when the response ends
+    return release_slot_on_close(Response(
+        ImportStream(db, ResponseImporter(db, survey_key), records, offset),
+        mimetype=EXPORT_FORMATS['ndjson']
+    ))
+
+@survey_bp.route('/<survey_id>/search', methods=['GET'])
+@auth_required
+def search_survey_answers(survey_id):
+    """
+    Full-text search over a survey's answers, best matches first
+    Requires authentication and survey ownership
+    Query parameters:
+        q      - words to search for
+        limit  - page size (default DEFAULT_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        cursor - `next_cursor` from the previous page
+    """
+    user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+    
+    query = request.args.get('q', '').strip()
+    if not query or len(query) > SEARCH_QUERY_MAX_LENGTH:
+        return jsonify({
+            "error": f"q must be 1 to {SEARCH_QUERY_MAX_LENGTH} characters"
+        }), 400
+    
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        position = decode_score_cursor(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid pagination parameters",
+            "message": str(e)
+        }), 400
+    
+    db = get_read_connection(user_id)
     cursor = db.cursor(dictionary=True)
     
     try:
-        # Get survey details with owner's name and questions
         cursor.execute(
-            """
-            SELECT 
-                BIN_TO_UUID(s.id) as id,
-                s.title,
-                s.system_prompt,
-                s.created_at,
-                s.updated_at,
-                u.name as owner_name,
-                BIN_TO_UUID(q.id) as question_id,
-                q.question,
-                q.elaborate
-            FROM surveys s
-            JOIN users u ON u.google_user_id = s.user_id
-            LEFT JOIN questions q ON q.survey_id = s.id
-            WHERE s.id = UUID_TO_BIN(%s)
-            ORDER BY q.created_at ASC
-            """,
-            (survey_id,)
+            SURVEY_OWNER_QUERY,
+            (survey_key, user_id)
         )
         
+        if not cursor.fetchone():
+            return jsonify({
+                "error": "Survey not found or access denied"
+            }), 404
+        
+        keyset, params = search_params(query, survey_key, position, page_size + 1)
+        cursor.execute(SEARCH_ANSWERS_QUERY.format(keyset=keyset), params)
         rows = cursor.fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        
+        return jsonify({
+            "hits": search_hits(rows, query),
+            "next_cursor": encode_score_cursor(rows[-1]['score'], rows[-1]['id']) if has_more else None,
+            "status": "success"
+        }), 200
         
-        if not rows:
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to search survey answers",
+            "message": str(e)
+        }), 500
+    finally:
+        cursor.close()
+        db.close()
+
+@survey_bp.route('/<survey_id>/stats', methods=['GET'])
+@auth_required
+def get_survey_stats(survey_id):
+    """
+    Get response analytics for a survey: total and per-day response counts and
+    answer distributions for closed (non-elaborate) questions
+    Served from summary tables, so the cost doesn't grow with the number of responses
+    Requires authentication and survey ownership
+    """
+    user_id = request.user['user_id']
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found or access denied"
+        }), 404
+    
+    db = get_read_connection(user_id)
+    cursor = db.cursor()
+    
+    try:
+        cursor.execute(
+            SURVEY_OWNER_QUERY,
+            (survey_key, user_id)
+        )
+        
+        if not cursor.fetchone():
             return jsonify({
-                "error": "Survey not found"
+                "error": "Survey not found or access denied"
             }), 404
-            
-        # Process the results to group questions under the survey
-        survey = {
-            'id': rows[0]['id'],
-            'title': rows[0]['title'],
-            'system_prompt': rows[0]['system_prompt'],
-            'created_at': rows[0]['created_at'],
-            'updated_at': rows[0]['updated_at'],
-            'owner_name': rows[0]['owner_name'],
-            'questions': []
-        }
-        
-        # Add questions if they exist
-        for row in rows:
-            if row['question_id']:  # Check if there are questions
-                survey['questions'].append({
-                    'id': row['question_id'],
-                    'question': row['question'],
-                    'elaborate': row['elaborate']
-                })
         
         return jsonify({
-            "survey": survey,
+            "stats": survey_stats(cursor, survey_key),
             "status": "success"
         }), 200
         
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to fetch survey stats",
+            "message": str(e)
+        }), 500
+    finally:
+        cursor.close()
+        db.close()
+
+@survey_bp.route('/<survey_id>', methods=['GET'])
+@rate_limited(('ip', READ_PER_IP), ('survey', READ_PER_SURVEY))
+def get_survey(survey_id):
+    """
+    Get details of a specific survey including owner's name and all questions
+    Public endpoint - no authentication required
+    Served from a read-through cache with ETag / If-None-Match support
+    """
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({
+            "error": "Survey not found"
+        }), 404
+    
+    cache_key = to_str(survey_key)
+    document = survey_cache.get(cache_key)
+    if document:
+        return survey_document_response(document)
+
+    db = get_read_connection()
+    cursor = db.cursor()
+    
+    try:
+        # Survey with owner's name, then its questions
+        detail = fetch_survey_detail(cursor, survey_key)
+        
+        if detail is None and db.replica:
+            # Possibly created moments ago and not replicated yet: ask the primary
+            cursor.close()
+            db.close()
+            db = get_db_connection()
+            cursor = db.cursor()
+            detail = fetch_survey_detail(cursor, survey_key)
+        
+        if detail is None:
+            return jsonify({
+                "error": "Survey not found"
+            }), 404
+            
+        document = survey_document(*detail)
+        survey_cache.set(cache_key, document)
+        return survey_document_response(document)
+        
     except Exception as e:
         return jsonify({
             "error": "Failed to fetch survey details",
@@ -303,10 +808,16 @@ def get_survey(survey_id):
         db.close()
 
 @survey_bp.route('/<survey_id>', methods=['POST'])
+@idempotent('survey')
+@rate_limited(('ip', SUBMIT_PER_IP), ('survey', SUBMIT_PER_SURVEY))
 def submit_survey_response(survey_id):
     """
     Submit a new response for a survey
     Public endpoint - no authentication required
+    A retry with the same Idempotency-Key header replays the first result
+    instead of recording the response twice
+    With RESPONSE_INGEST_MODE=spool the response is durably spooled and
+    acknowledged with 202; a background flusher writes it to MySQL
     Expected JSON format:
     {
         "answers": {
@@ -319,63 +830,52 @@ def submit_survey_response(survey_id):
     if not data or 'answers' not in data:
         return jsonify({"error": "Missing answers data"}), 400
     
+    survey_key = parse_id(survey_id)
+    if survey_key is None:
+        return jsonify({"error": "Survey not found"}), 404
+    
+    if ingest.enabled():
+        try:
+            return spool_survey_response(survey_key, data['answers'])
+        except Exception as e:
+            return jsonify({
+                "error": "Failed to submit response",
+                "message": str(e)
+            }), 500
+    
     db = get_db_connection()
     cursor = db.cursor(dictionary=True)
     
     try:
-        # Start transaction
-        cursor.execute("START TRANSACTION")
-        
-        # First verify the survey exists
+        # Create the response; inserting from surveys doubles as the existence check
+        response_id = new_id()
         cursor.execute(
-            "SELECT 1 FROM surveys WHERE id = UUID_TO_BIN(%s)",
-            (survey_id,)
+            INSERT_RESPONSE_QUERY,
+            (response_id, survey_key)
         )
-        if not cursor.fetchone():
+        if cursor.rowcount == 0:
+            db.rollback()
             return jsonify({"error": "Survey not found"}), 404
         
-        # Create a new response
-        response_id = uuid.uuid4()
-        cursor.execute(
-            """
-            INSERT INTO responses (id, survey_id)
-            VALUES (UUID_TO_BIN(%s), UUID_TO_BIN(%s))
-            """,
-            (str(response_id), survey_id)
-        )
-        
-        # Get all valid question IDs for this survey
-        cursor.execute(
-            """
-            SELECT BIN_TO_UUID(id) as id
-            FROM questions
-            WHERE survey_id = UUID_TO_BIN(%s)
-            """,
-            (survey_id,)
-        )
-        valid_questions = {row['id'] for row in cursor.fetchall()}
-        
-        # Insert answers
-        for question_id, answer in data['answers'].items():
-            # Skip if question doesn't belong to this survey
-            if question_id not in valid_questions:
-                print("Question ID not in valid questions:", question_id)
-                continue
-                
+        # Insert all answers in one statement; the join against questions
+        # skips answers to questions that don't belong to this survey
+        rows = answer_rows(data['answers'])
+        if rows:
+            placeholders, params = multi_row_values("ROW(%s, %s, %s)", rows)
             cursor.execute(
-                """
-                INSERT INTO answers (id, response_id, question_id, answer)
-                VALUES (UUID_TO_BIN(%s), UUID_TO_BIN(%s), UUID_TO_BIN(%s), %s)
-                """,
-                (str(uuid.uuid4()), str(response_id), question_id, answer)
+                INSERT_ANSWERS_QUERY.format(placeholders=placeholders),
+                [response_id] + params + [survey_key]
             )
         
+        # Keep the analytics summaries in step with the raw tables
+        record_responses(cursor, [response_id])
+        
         # Commit transaction
         db.commit()
         
         return jsonify({
             "message": "Response submitted successfully",
-            "response_id": str(response_id),
+            "response_id": to_str(response_id),
             "status": "success"
         }), 201
         
@@ -1,20 +1,57 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 from auth_helpers import auth_required
+from database import get_db_connection
+from google_auth import user_cache
 
 user_bp = Blueprint('user', __name__)
 
+USER_PROFILE_QUERY = """
+    SELECT google_user_id, email, name, created_at
+    FROM users
+    WHERE google_user_id = %s
+"""
+
 @user_bp.route('', methods=['GET'])
 @auth_required
 def get_user_info():
     """
     Get user information
     Requires authentication
+    Served from the user profile cache, falling back to the database
     """
-    # Mock response - would be replaced with actual user lookup
+    user_id = request.user['user_id']
+    profile = user_cache.get(user_id)
+    
+    if profile is None:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        
+        try:
+            cursor.execute(USER_PROFILE_QUERY, (user_id,))
+            row = cursor.fetchone()
+        except Exception as e:
+            return jsonify({
+                "error": "Failed to fetch user",
+                "message": str(e)
+            }), 500
+        finally:
+            cursor.close()
+            db.close()
+        
+        if not row:
+            return jsonify({
+                "error": "User not registered"
+            }), 404
+        
+        profile = {
+            "user_id": row['google_user_id'],
+            "email": row['email'],
+            "name": row['name'],
+            "created_at": row['created_at']
+        }
+        user_cache.set(user_id, profile)
+    
     return jsonify({
-        "user_id": "mock-user-id",
-        "email": "user@example.com",
-        "name": "Sample User",
-        "created_at": "2023-01-01T00:00:00Z",
+        **profile,
         "status": "success"
-    }), 200 
\ No newline at end of file
+    }), 200
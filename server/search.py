@@ -0,0 +1,114 @@
+"""
+Full-text search over a survey's answers.
+
+Backed by the FULLTEXT index on answers.answer (migration 0003), which InnoDB
+keeps up to date as responses are committed, so the submit path needs no
+extra work. Hits are ranked by MySQL's natural-language relevance and paged
+with a (score, answer id) keyset cursor; snippets are cut around the first
+matching word in Python.
+"""
+import os
+import re
+
+from keys import to_str
+
+# Longest accepted search string
+SEARCH_QUERY_MAX_LENGTH = int(os.getenv('SEARCH_QUERY_MAX_LENGTH', 200))
+# Characters of answer text around the first match returned per hit
+SNIPPET_LENGTH = int(os.getenv('SEARCH_SNIPPET_LENGTH', 160))
+# Words shorter than InnoDB's innodb_ft_min_token_size (default 3) aren't indexed
+MIN_TERM_LENGTH = 3
+
+WORD_PATTERN = re.compile(r'\w+')
+
+SEARCH_MATCH = "MATCH(a.answer) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+
+# The fulltext index yields the matching answers; the survey filter goes
+# through the questions primary key. Ranking needs a sort of the matches.
+SEARCH_ANSWERS_QUERY = f"""
+    SELECT
+        a.id,
+        a.response_id,
+        a.question_id,
+        q.question,
+        a.answer,
+        r.created_at,
+        {SEARCH_MATCH} AS score
+    FROM answers a
+    JOIN questions q ON q.id = a.question_id
+    JOIN responses r ON r.id = a.response_id
+    WHERE {SEARCH_MATCH} AND q.survey_id = %s {{keyset}}
+    ORDER BY score DESC, a.id ASC
+    LIMIT %s
+"""
+
+
+def search_params(query, survey_key, position, page_size):
+    """(keyset SQL, params) for SEARCH_ANSWERS_QUERY, continuing after position = (score, answer id)"""
+    keyset, keyset_params = "", []
+    if position is not None:
+        score, answer_id = position
+        keyset = f"AND ({SEARCH_MATCH} < %s OR ({SEARCH_MATCH} = %s AND a.id > %s))"
+        keyset_params = [query, score, query, score, answer_id]
+    return keyset, [query, query, survey_key] + keyset_params + [page_size]
+
+
+def query_terms(query):
+    """Distinct lowercased words of a search string that the index can match"""
+    return sorted({word.lower() for word in WORD_PATTERN.findall(query) if len(word) >= MIN_TERM_LENGTH})
+
+
+def term_pattern(terms):
+    """Regex matching any of terms as a whole word, or None"""
+    if not terms:
+        return None
+    return re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE)
+
+
+def snippet(text, pattern, length=SNIPPET_LENGTH):
+    """
+    Up to `length` characters of text around the first match of pattern,
+    with '…' where text was cut, and the [start, end) offsets of every
+    match inside the snippet. Returns (snippet, highlights).
+    """
+    text = text or ''
+    first = pattern.search(text) if pattern else None
+    start = 0
+    if first and len(text) > length:
+        # Some context before the match, starting on a word boundary
+        start = max(0, first.start() - length // 4)
+        if start:
+            space = text.find(' ', start, first.start())
+            start = space + 1 if space != -1 else start
+        start = min(start, max(0, len(text) - length))
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    prefix = '…' if start else ''
+    suffix = '…' if end < len(text) else ''
+    body = text[start:end]
+    highlights = [
+        [match.start() + len(prefix), match.end() + len(prefix)]
+        for match in (pattern.finditer(body) if pattern else ())
+    ]
+    return prefix + body + suffix, highlights
+
+
+def search_hits(rows, query):
+    """JSON hits for one page of SEARCH_ANSWERS_QUERY rows"""
+    pattern = term_pattern(query_terms(query))
+    hits = []
+    for row in rows:
+        text, highlights = snippet(row['answer'], pattern)
+        hits.append({
+            'response_id': to_str(row['response_id']),
+            'question_id': to_str(row['question_id']),
+            'question': row['question'],
+            'snippet': text,
+            'highlights': highlights,
+            'score': row['score'],
+            'created_at': row['created_at']
+        })
+    return hits
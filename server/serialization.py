@@ -0,0 +1,64 @@
+"""
+JSON serialization for API responses.
+
+With orjson installed (and JSON_SERIALIZER left at 'auto'), jsonify and
+current_app.json use it instead of the stdlib encoder. Output keeps Flask's
+conventions: sorted keys, datetimes as HTTP dates, UUIDs and Decimals as
+strings. Non-ASCII text is written as UTF-8 rather than \\u escapes.
+"""
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 'auto' (orjson when installed), 'orjson' or 'stdlib'
+JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'auto')
+
+if JSON_SERIALIZER == 'orjson' and orjson is None:
+    raise RuntimeError("JSON_SERIALIZER=orjson but orjson isn't installed")
+USE_ORJSON = orjson is not None and JSON_SERIALIZER != 'stdlib'
+
+if orjson is not None:
+    # Datetimes and dataclasses go through Flask's default() so they serialize
+    # exactly as they do with the stdlib encoder; UUIDs already match
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_bytes(obj, sort_keys=True, default=DefaultJSONProvider.default):
+    """Serialize obj to compact UTF-8 JSON bytes with the configured serializer"""
+    if USE_ORJSON:
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+    return json.dumps(obj, default=default, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProviderMixin:
+    """
+    dumps()/loads() for a Flask or Quart JSON provider, using orjson when
+    enabled. Calls orjson can't express (other separators, an encoder class,
+    indents other than Flask's debug indent of 2) fall back to the stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if not USE_ORJSON or set(kwargs) - {'indent', 'separators', 'sort_keys', 'ensure_ascii', 'default'} \
+                or kwargs.get('indent') not in (None, 2) or kwargs.get('separators') not in (None, (',', ':')):
+            return super().dumps(obj, **kwargs)
+        option = ORJSON_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if USE_ORJSON and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+class FastJSONProvider(FastJSONProviderMixin, DefaultJSONProvider):
+    """Flask JSON provider using orjson when enabled"""
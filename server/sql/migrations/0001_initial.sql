@@ -1,5 +1,4 @@
-CREATE DATABASE IF NOT EXISTS audio_survey;
-USE audio_survey;
+-- Users, surveys and their questions, responses and answers
 
 CREATE TABLE IF NOT EXISTS users (
     google_user_id VARCHAR(255) PRIMARY KEY,
@@ -42,9 +41,12 @@ CREATE TABLE IF NOT EXISTS answers (
     response_id BINARY(16) NOT NULL,
     question_id BINARY(16) NOT NULL,
     answer TEXT,
+    -- Document id for the FULLTEXT index (0003). Declaring it here lets InnoDB
+    -- build that index without rebuilding the table to add a hidden one
+    FTS_DOC_ID BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY FTS_DOC_ID_INDEX (FTS_DOC_ID),
     FOREIGN KEY (response_id) REFERENCES responses(id),
     FOREIGN KEY (question_id) REFERENCES questions(id)
 );
-
@@ -0,0 +1,9 @@
+-- Secondary indexes for the hot queries in routes/survey.py (checked by check_query_plans.py).
+-- Re-running these against an existing database is a no-op (duplicate key names are skipped).
+CREATE INDEX idx_surveys_user_created ON surveys (user_id, created_at, id);
+
+CREATE INDEX idx_questions_survey_created ON questions (survey_id, created_at, id);
+
+CREATE INDEX idx_responses_survey_created ON responses (survey_id, created_at, id);
+
+CREATE INDEX idx_answers_response_question ON answers (response_id, question_id);
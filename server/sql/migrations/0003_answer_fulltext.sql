@@ -0,0 +1,7 @@
+-- Full-text search over answers (see search.py); InnoDB updates it as responses commit.
+-- Writes to answers are blocked while the index is built (reads continue). Tables
+-- created by 0001 carry FTS_DOC_ID, so that is only the index build; an answers
+-- table from before that column existed is rebuilt as well. Apply it with
+-- `python manage.py migrate` before starting the new release, in a quiet period
+-- for large databases, never at boot.
+CREATE FULLTEXT INDEX ft_answers_answer ON answers (answer) ALGORITHM=INPLACE LOCK=SHARED;
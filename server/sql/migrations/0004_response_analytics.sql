@@ -0,0 +1,16 @@
+-- Incrementally maintained response analytics (see analytics.py); rebuild with `python manage.py rebuild-stats`
+CREATE TABLE IF NOT EXISTS survey_daily_stats (
+    survey_id BINARY(16) NOT NULL,
+    day DATE NOT NULL,
+    response_count INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (survey_id, day),
+    FOREIGN KEY (survey_id) REFERENCES surveys(id)
+);
+
+CREATE TABLE IF NOT EXISTS question_answer_stats (
+    question_id BINARY(16) NOT NULL,
+    answer_value VARCHAR(64) NOT NULL,
+    answer_count INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (question_id, answer_value),
+    FOREIGN KEY (question_id) REFERENCES questions(id)
+);
@@ -0,0 +1,17 @@
+-- Chunked respondent audio uploads, one recording per answer (see routes/audio.py).
+-- Bytes live on disk under AUDIO_STORAGE_PATH; the offset of an upload in progress is its file size.
+CREATE TABLE IF NOT EXISTS audio_uploads (
+    id BINARY(16) PRIMARY KEY,
+    response_id BINARY(16) NOT NULL,
+    question_id BINARY(16) NOT NULL,
+    content_type VARCHAR(100) NOT NULL,
+    total_bytes BIGINT UNSIGNED NOT NULL,
+    expected_sha256 CHAR(64) NULL,
+    sha256 CHAR(64) NULL,
+    status ENUM('uploading', 'complete') NOT NULL DEFAULT 'uploading',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP NULL,
+    UNIQUE KEY uq_audio_uploads_answer (response_id, question_id),
+    FOREIGN KEY (response_id) REFERENCES responses(id),
+    FOREIGN KEY (question_id) REFERENCES questions(id)
+);
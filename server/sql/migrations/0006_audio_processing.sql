@@ -0,0 +1,9 @@
+-- Results of the background post-processing (see audio_worker.py); NULL until a recording is processed
+ALTER TABLE audio_uploads
+    ADD COLUMN processing_status ENUM('processed', 'unsupported', 'failed') NULL,
+    ADD COLUMN duration_seconds FLOAT NULL,
+    ADD COLUMN speech_seconds FLOAT NULL,
+    ADD COLUMN speech_ratio FLOAT NULL,
+    ADD COLUMN rms_dbfs FLOAT NULL,
+    ADD COLUMN processed_bytes BIGINT UNSIGNED NULL,
+    ADD COLUMN processed_at TIMESTAMP NULL;
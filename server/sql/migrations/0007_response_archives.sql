@@ -0,0 +1,21 @@
+-- Segments of old responses moved to cold storage (see archive.py): one gzipped NDJSON
+-- file per survey and month under ARCHIVE_STORAGE_PATH, path relative to it
+CREATE TABLE IF NOT EXISTS response_archives (
+    id BINARY(16) PRIMARY KEY,
+    survey_id BINARY(16) NOT NULL,
+    path VARCHAR(255) NOT NULL,
+    response_count INT UNSIGNED NOT NULL,
+    first_created_at TIMESTAMP NOT NULL,
+    last_created_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_response_archives_survey_created (survey_id, first_created_at),
+    FOREIGN KEY (survey_id) REFERENCES surveys(id)
+);
+
+-- Ids of the archived responses and their segment, so bulk import can tell that a
+-- response already exists without opening segments (see bulk_import.py)
+CREATE TABLE IF NOT EXISTS archived_response_ids (
+    id BINARY(16) PRIMARY KEY,
+    archive_id BINARY(16) NOT NULL,
+    FOREIGN KEY (archive_id) REFERENCES response_archives(id)
+);